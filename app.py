@@ -1,18 +1,21 @@
 from flask import Flask, render_template, Response, request, jsonify
-from multiprocessing import Process, Queue, Value, Manager, freeze_support
+from multiprocessing import Process, Pipe, Value, freeze_support
+import threading
 import time
-import requests
 import torch
-import queue
 import cv2
-import numpy as np
-import urllib.request
-from ultralytics import YOLO
-import base64
 import os
 from werkzeug.utils import secure_filename
-import threading
-import pandas as pd  # ✅ added for reading CSV
+from frame_ring import FrameRing
+from mjpeg_broadcast import MjpegBroadcaster, DEFAULT_QUALITY
+from frame_grabber import FrameGrabber
+from count_aggregator import CountAggregator
+from signal_controller import SignalController
+from plate_index import PlateIndex
+from plate_store import PlateStore
+from detector_backend import load_detector
+from motion_gate import MotionGate
+from cascade_pipeline import load_cascade
 
 app = Flask(__name__)
 app.config['UPLOAD_FOLDER'] = 'uploads'
@@ -24,12 +27,13 @@ print(f"Using device: {device}")
 # Global variables
 CAMERAS = {}
 ESP_IPS = {}
-frame_queues = {}
-result_queues = {}
+raw_rings = {}        # road -> FrameRing written by the camera process
+annotated_rings = {}  # road -> FrameRing written by the inference process
+broadcasters = {}     # road -> MjpegBroadcaster shared by all /video_feed viewers
 processes = {}
 running_flag = None
-vehicle_counts = None
-vehicle_fps = None
+aggregator = CountAggregator()  # per-road count / fps / grab stats, read lock-free by the routes
+signal_controller = None        # SignalController while monitoring in 'cam' mode
 current_base_url = "http://192.168.137"
 current_subnets = {
     "A": "252",
@@ -39,33 +43,55 @@ current_subnets = {
 }
 
 
-def camera_process(road, url, frame_queue, result_queue, running_flag, input_type='ip'):
-    print(f"Camera process started for road {road}")
-    try:
-        model = YOLO("yolov8n.pt")
-        model.to(device)
-    except Exception as e:
-        print(f"Error loading YOLO model for road {road}: {e}")
-        return
+GRAB_STATS_INTERVAL = 5.0
+VEHICLE_MODEL = "yolov8n.pt"
+DETECTOR_BACKEND = "auto"  # "torch", "onnx", "onnx-int8", "openvino" or "auto" (torch on CUDA, else ONNX Runtime)
+PLATE_MODEL = None  # e.g. "numberplate_training_960_12n2.pt": also find plates inside the vehicle boxes (cascade)
+MOTION_SENSITIVITY = "medium"  # "high", "medium", "low" or None to run YOLO on every frame
+DEFAULT_VIDEO_FPS = 25.0  # pace for video files that don't report a usable frame rate
 
-    start_time = time.time()
-    frame_count = 0
-    cap = None
 
-    if input_type == 'video':
+def camera_process(road, url, raw_ring_name, result_conn, running_flag, input_type='ip'):
+    """Grab frames for one road and publish them into its shared-memory ring."""
+    print(f"Camera process started for road {road}")
+    raw_ring = FrameRing(raw_ring_name)
+    cap = None
+    grabber = None
+    grab_id = 0
+    last_stats = time.time()
+
+    if input_type == 'ip':
+        # Keep-alive session / MJPEG stream on its own thread; we only pick up the newest frame
+        grabber = FrameGrabber(url, name=f"road {road}").start()
+    elif input_type == 'video':
         cap = cv2.VideoCapture(url)
         if not cap.isOpened():
             print(f"Error: Could not open video file {url}")
             return
+        # Play the clip in real time: nothing else paces this loop, and counts / green
+        # times assume frames arrive at the clip's own rate
+        fps = cap.get(cv2.CAP_PROP_FPS)
+        frame_interval = 1.0 / (fps if 0 < fps <= 240 else DEFAULT_VIDEO_FPS)
+        next_frame_due = time.time()
 
     while running_flag.value:
         try:
             frame = None
             if input_type == 'ip':
-                img_resp = urllib.request.urlopen(url)
-                imgnp = np.array(bytearray(img_resp.read()), dtype=np.uint8)
-                frame = cv2.imdecode(imgnp, -1)
+                grab_id, frame = grabber.read(grab_id)
+                if frame is None:
+                    time.sleep(0.005)
+                if time.time() - last_stats >= GRAB_STATS_INTERVAL:
+                    last_stats = time.time()
+                    result_conn.send({'road': road, 'grab_stats': grabber.stats()})
             elif input_type == 'video':
+                wait = next_frame_due - time.time()
+                if wait > 0:
+                    time.sleep(wait)
+                    next_frame_due += frame_interval
+                else:
+                    # Running late (slow decode, suspended process): carry on from now, no burst
+                    next_frame_due = max(next_frame_due + frame_interval, time.time() - frame_interval)
                 ret, frame = cap.read()
                 if not ret:
                     cap.set(cv2.CAP_PROP_POS_FRAMES, 0)
@@ -75,87 +101,135 @@ def camera_process(road, url, frame_queue, result_queue, running_flag, input_typ
                         continue
 
             if frame is not None:
-                car_count = 0
-                frame_with_boxes = frame.copy()
-                try:
-                    results = model(frame, stream=True)
-                    for r in results:
-                        boxes = r.boxes.cpu().numpy()
-                        for box in boxes:
-                            try:
-                                cls = int(box.cls[0]) if hasattr(box.cls, '__len__') else int(box.cls)
-                                if cls in [2, 6, 7, 8]:
-                                    car_count += 1
-                                    xyxy = box.xyxy
-                                    if len(xyxy.shape) > 1:
-                                        xyxy = xyxy[0]
-                                    x1, y1, x2, y2 = map(int, xyxy)
-                                    cv2.rectangle(frame_with_boxes, (x1, y1), (x2, y2), (0, 255, 0), 2)
-                                    cv2.putText(frame_with_boxes, 'car', (x1, y1 - 10),
-                                                cv2.FONT_HERSHEY_SIMPLEX, 0.9, (0, 255, 0), 2)
-                            except:
-                                continue
-                except:
-                    frame_with_boxes = frame.copy()
-                    car_count = 0
-
-                cv2.putText(frame_with_boxes, f"Total Vehicles: {car_count}", (10, 30),
-                            cv2.FONT_HERSHEY_SIMPLEX, 1, (0, 255, 0), 2)
-
-                frame_count += 1
-                fps = 0.0
-                if time.time() - start_time >= 1.0:
-                    fps = frame_count / (time.time() - start_time)
-                    frame_count = 0
-                    start_time = time.time()
-
-                result_queue.put({
-                    'road': road,
-                    'frame': frame_with_boxes,
-                    'vehicle_count': car_count,
-                    'fps': fps,
-                    'update_shared': True
-                })
+                # Written in place; the inference worker always picks up the newest slot
+                raw_ring.write(frame)
 
         except Exception as e:
             print(f"Error in camera process {road}: {str(e)}")
             time.sleep(1)
 
 
-def result_consumer():
-    global result_queues, vehicle_counts, vehicle_fps, running_flag
-    while running_flag.value:
-        for road, q in result_queues.items():
-            try:
-                result = q.get(timeout=0.5)
-                if result.get('update_shared', False):
-                    vehicle_counts[road] = result['vehicle_count']
-                    vehicle_fps[road] = result['fps']
-            except queue.Empty:
-                continue
+def annotate_vehicles(frame, result):
+    """
+    Draw vehicle boxes from one frame's Detections (or CascadeResult, plus its plate
+    boxes) and return (annotated_frame, vehicle_count).
+    """
+    frame_with_boxes = frame.copy()
+    car_count = 0
+    try:
+        plates = getattr(result, 'plates', None)
+        if plates is not None:
+            result = result.vehicles
+            for xyxy in plates.xyxy:
+                x1, y1, x2, y2 = map(int, xyxy)
+                cv2.rectangle(frame_with_boxes, (x1, y1), (x2, y2), (0, 255, 255), 2)
+        for xyxy, cls in zip(result.xyxy, result.cls):
+            if int(cls) in [2, 6, 7, 8]:
+                car_count += 1
+                x1, y1, x2, y2 = map(int, xyxy)
+                cv2.rectangle(frame_with_boxes, (x1, y1), (x2, y2), (0, 255, 0), 2)
+                cv2.putText(frame_with_boxes, 'car', (x1, y1 - 10),
+                            cv2.FONT_HERSHEY_SIMPLEX, 0.9, (0, 255, 0), 2)
+    except Exception:
+        frame_with_boxes = frame.copy()
+        car_count = 0
+
+    cv2.putText(frame_with_boxes, f"Total Vehicles: {car_count}", (10, 30),
+                cv2.FONT_HERSHEY_SIMPLEX, 1, (0, 255, 0), 2)
+    return frame_with_boxes, car_count
+
+
+def inference_process(ring_names, result_conn, running_flag):
+    """
+    Single YOLO worker: batch the latest frame of every road into one model call.
+    Roads whose frame hasn't changed are left out of the batch and reuse their last result.
+    """
+    print(f"Inference process started for roads {list(ring_names.keys())}")
+    try:
+        if PLATE_MODEL:
+            # Vehicle pass at the usual counting size, plate model only on the vehicle crops
+            model = load_cascade(VEHICLE_MODEL, PLATE_MODEL, backend=DETECTOR_BACKEND, vehicle_imgsz=640,
+                                 device=device)
+        else:
+            model = load_detector(VEHICLE_MODEL, backend=DETECTOR_BACKEND, imgsz=640, device=device)
+    except Exception as e:
+        print(f"Error loading YOLO model: {e}")
+        return
 
+    raw = {road: FrameRing(names[0]) for road, names in ring_names.items()}
+    annotated = {road: FrameRing(names[1]) for road, names in ring_names.items()}
+    last_seq = {road: 0 for road in ring_names}
+    fps_start = {road: time.time() for road in ring_names}
+    fps_frames = {road: 0 for road in ring_names}
+    fps_value = {road: 0.0 for road in ring_names}
+    gates = {road: MotionGate(sensitivity=MOTION_SENSITIVITY) for road in ring_names} if MOTION_SENSITIVITY else {}
+    last_motion_report = time.time()
 
-def timer_process(vehicle_counts, running_flag):
     while running_flag.value:
-        for road in CAMERAS.keys():
-            if not running_flag.value:
-                break
-            vehicle_count = vehicle_counts.get(road, 0)
-            trigger_green_light(road, vehicle_count)
-            green_time = max(vehicle_count * 4, 10)
-            time.sleep(green_time + 5.5)
+        try:
+            # Collect whatever roads have a new frame; idle roads drop out of the batch
+            roads, frames = [], []
+            for road, ring in raw.items():
+                seq, frame = ring.latest(last_seq[road])
+                if frame is not None:
+                    last_seq[road] = seq
+                    frames.append(frame)
+                    roads.append(road)
+
+            if not frames:
+                time.sleep(0.005)
+                continue
 
+            # Only frames with motion go to YOLO; static roads redraw their previous boxes
+            moving = [i for i, (road, frame) in enumerate(zip(roads, frames))
+                      if road not in gates or gates[road].check(frame)]
+            results = [gates[road].last_result if road in gates else None for road in roads]
+            if moving:
+                try:
+                    for i, result in zip(moving, model([frames[i] for i in moving])):
+                        results[i] = result
+                        if roads[i] in gates:
+                            gates[roads[i]].update(result)
+                except Exception as e:
+                    print(f"Error in batched inference: {e}")
+                    # The gates already took these frames as their reference; reset them so
+                    # the next frame of each road is sent to YOLO instead of judged static
+                    for i in moving:
+                        results[i] = None
+                        if roads[i] in gates:
+                            gates[roads[i]].reset()
+
+            now = time.time()
+            if gates and now - last_motion_report >= GRAB_STATS_INTERVAL:
+                for road, gate in gates.items():
+                    result_conn.send({'road': road, 'motion_stats': gate.stats()})
+                last_motion_report = now
+            for road, frame, result in zip(roads, frames, results):
+                if result is None:
+                    frame_with_boxes, car_count = frame.copy(), 0
+                else:
+                    frame_with_boxes, car_count = annotate_vehicles(frame, result)
+
+                fps_frames[road] += 1
+                if now - fps_start[road] >= 1.0:
+                    fps_value[road] = fps_frames[road] / (now - fps_start[road])
+                    fps_frames[road] = 0
+                    fps_start[road] = now
+
+                annotated[road].write(frame_with_boxes)
+
+                message = {
+                    'road': road,
+                    'vehicle_count': car_count,
+                    'fps': fps_value[road]
+                }
+                if result is not None and hasattr(result, 'plates'):
+                    message['plate_boxes'] = result.plates.xyxy.astype(int).tolist()
+                result_conn.send(message)
 
-def trigger_green_light(road, vehicle_count):
-    try:
-        green_time = max(vehicle_count * 4, 10)
-        esp_ip = ESP_IPS.get(road)
-        if esp_ip:
-            response = requests.get(f"{esp_ip}/{green_time}")
-            if response.status_code != 200:
-                print(f"Road {road}: Failed to trigger green light")
-    except Exception as e:
-        print(f"Road {road}: Error triggering green light - {str(e)}")
+        except Exception as e:
+            print(f"Error in inference process: {str(e)}")
+            time.sleep(1)
 
 
 @app.route('/')
@@ -170,25 +244,38 @@ def health():
 
 @app.route('/debug_counts')
 def debug_counts():
+    snapshot = aggregator.snapshot()
     return jsonify({
         "running_flag": running_flag.value if running_flag else None,
-        "vehicle_counts": dict(vehicle_counts) if vehicle_counts else {},
-        "vehicle_fps": dict(vehicle_fps) if vehicle_fps else {},
+        "vehicle_counts": {road: entry['count'] for road, entry in snapshot.items()},
+        "vehicle_fps": {road: entry['fps'] for road, entry in snapshot.items()},
+        "grab_stats": {road: entry['grab_stats'] for road, entry in snapshot.items() if 'grab_stats' in entry},
+        "motion_stats": {road: entry['motion_stats'] for road, entry in snapshot.items() if 'motion_stats' in entry},
+        "plate_boxes": {road: entry['plate_boxes'] for road, entry in snapshot.items() if 'plate_boxes' in entry},
         "processes": list(processes.keys()) if processes else [],
-        "frame_queues": list(frame_queues.keys()) if frame_queues else [],
-        "result_queues": list(result_queues.keys()) if result_queues else []
+        "frame_rings": {road: ring.seq for road, ring in annotated_rings.items()},
+        "aggregated_messages": aggregator.messages
     })
 
 
+@app.route('/signal_timing')
+def signal_timing():
+    if signal_controller is None:
+        return jsonify({"status": "Signal controller not running"})
+    return jsonify(signal_controller.timing_report())
+
+
 @app.route('/vehicle_count')
 def vehicle_count():
     if not running_flag or not running_flag.value:
         return jsonify({})
+    snapshot = aggregator.snapshot()
     counts = {}
     for road in ['A', 'B', 'C', 'D']:
+        entry = snapshot.get(road, {})
         counts[road] = {
-            'count': vehicle_counts.get(road, 0),
-            'fps': vehicle_fps.get(road, 0.0)
+            'count': entry.get('count', 0),
+            'fps': entry.get('fps', 0.0)
         }
     return jsonify(counts)
 
@@ -207,38 +294,53 @@ def upload_videos():
 
 @app.route('/stop_monitoring')
 def stop_monitoring():
-    global running_flag, processes, vehicle_counts, vehicle_fps
+    global running_flag, processes, signal_controller
     if running_flag and running_flag.value:
         running_flag.value = False
+        if signal_controller is not None:
+            signal_controller.stop()
+            signal_controller = None
         for process in processes.values():
             if process.is_alive():
                 process.terminate()
                 process.join(timeout=2)
         processes.clear()
-        if vehicle_counts: vehicle_counts.clear()
-        if vehicle_fps: vehicle_fps.clear()
+        close_rings()
+        aggregator.stop()
+        aggregator.reset()
         return jsonify({"status": "Monitoring stopped"}), 200
     return jsonify({"status": "Monitoring not running"}), 200
 
 
+def close_rings():
+    """Free the shared-memory frame rings created for the current monitoring session."""
+    for broadcaster in broadcasters.values():
+        broadcaster.stop()
+    broadcasters.clear()
+    for ring in list(raw_rings.values()) + list(annotated_rings.values()):
+        ring.close()
+    raw_rings.clear()
+    annotated_rings.clear()
+
+
 @app.route('/video_feed/<road>')
 def video_feed(road):
     if road not in CAMERAS:
         return "Camera not found", 404
+    if road not in annotated_rings:
+        return "Camera not running", 503
 
-    def gen():
-        while running_flag and running_flag.value:
-            if road in result_queues:
-                try:
-                    result = result_queues[road].get(timeout=1)
-                    ret, buffer = cv2.imencode('.jpg', result['frame'])
-                    if ret:
-                        frame_bytes = buffer.tobytes()
-                        yield (b'--frame\r\nContent-Type: image/jpeg\r\n\r\n' + frame_bytes + b'\r\n')
-                except queue.Empty:
-                    continue
+    # Optional ?quality=1-100&width=<px>; viewers asking for the same variant share one encode
+    quality = max(10, min(request.args.get('quality', DEFAULT_QUALITY, type=int), 100))
+    width = request.args.get('width', type=int)
+    if width is not None and width <= 0:
+        width = None
+
+    broadcaster = broadcasters.get(road)
+    if broadcaster is None:
+        broadcaster = broadcasters[road] = MjpegBroadcaster(annotated_rings[road])
 
-    return Response(gen(), mimetype='multipart/x-mixed-replace; boundary=frame')
+    return Response(broadcaster.stream(quality, width), mimetype='multipart/x-mixed-replace; boundary=frame')
 
 
 @app.route('/cam')
@@ -254,7 +356,7 @@ def demo():
 
 
 def start_monitoring_internal(mode):
-    global running_flag, frame_queues, result_queues, processes, vehicle_counts, vehicle_fps, CAMERAS, ESP_IPS, current_base_url, current_subnets
+    global running_flag, raw_rings, annotated_rings, processes, signal_controller, CAMERAS, ESP_IPS, current_base_url, current_subnets
 
     CAMERAS.clear()
     ESP_IPS.clear()
@@ -272,43 +374,45 @@ def start_monitoring_internal(mode):
             CAMERAS[road] = os.path.join(video_dir, video_files[i]) if i < len(video_files) else None
 
     if running_flag is None:
-        manager = Manager()
-        running_flag = manager.Value('b', False)
-        vehicle_counts = manager.dict()
-        vehicle_fps = manager.dict()
+        # Plain shared-memory flag: workers poll it every frame, so avoid a Manager proxy
+        running_flag = Value('b', False)
 
     if not running_flag.value:
         running_flag.value = True
-        frame_queues.clear()
-        result_queues.clear()
+        close_rings()
         processes.clear()
-        vehicle_counts.clear()
-        vehicle_fps.clear()
-
-        for road in CAMERAS.keys():
-            vehicle_counts[road] = 0
-            vehicle_fps[road] = 0.0
+        aggregator.stop()
+        aggregator.reset(CAMERAS.keys())
 
         for road, url in CAMERAS.items():
             if url is None:
                 continue
-            frame_queue = Queue(maxsize=2)
-            result_queue = Queue(maxsize=2)
-            frame_queues[road] = frame_queue
-            result_queues[road] = result_queue
+            raw_rings[road] = FrameRing(create=True)
+            annotated_rings[road] = FrameRing(create=True)
+            recv_conn, send_conn = Pipe(duplex=False)
+            aggregator.add_source(recv_conn)
             input_type = 'video' if mode == 'demo' else 'ip'
             p = Process(target=camera_process,
-                        args=(road, url, frame_queue, result_queue, running_flag, input_type))
+                        args=(road, url, raw_rings[road].name, send_conn, running_flag, input_type))
             p.start()
+            send_conn.close()  # child holds its own copy; lets the aggregator see EOF when it exits
             processes[road] = p
 
-        consumer_thread = threading.Thread(target=result_consumer, daemon=True)
-        consumer_thread.start()
+        if raw_rings:
+            ring_names = {road: (raw_rings[road].name, annotated_rings[road].name) for road in raw_rings}
+            recv_conn, send_conn = Pipe(duplex=False)
+            aggregator.add_source(recv_conn)
+            infer_p = Process(target=inference_process,
+                              args=(ring_names, send_conn, running_flag))
+            infer_p.start()
+            send_conn.close()
+            processes['inference'] = infer_p
+
+        aggregator.start()
 
         if mode == 'cam':
-            timer_p = Process(target=timer_process, args=(vehicle_counts, running_flag))
-            timer_p.start()
-            processes['timer'] = timer_p
+            # Runs in-process so it reads the aggregator snapshot directly
+            signal_controller = SignalController(CAMERAS.keys(), ESP_IPS, aggregator.get_count).start()
 
 
 @app.route('/update_config', methods=['POST'])
@@ -329,6 +433,33 @@ def update_config():
 # 🔍 VEHICLE SEARCH FEATURE (C:/carnumberplate-main/plate_log.csv)
 # ======================================================
 CSV_PATH = r"C:/carnumberplate-main/plate_log.csv"
+DB_PATH = r"C:/carnumberplate-main/plate_events.db"
+plate_index = PlateIndex(CSV_PATH)  # legacy CSV log, used until it has been imported into the store
+plate_store = None                  # opened on first search once the plate store exists
+plate_store_lock = threading.Lock()
+
+
+def lookup_plate(plate):
+    """
+    Search the SQLite plate store, or the legacy CSV log if no store exists yet. None if neither.
+    A CSV log that hasn't been imported into the store yet is imported first, so its history
+    doesn't disappear from the search.
+    """
+    global plate_store
+    with plate_store_lock:
+        if plate_store is None and os.path.exists(DB_PATH):
+            plate_store = PlateStore(DB_PATH)
+        if plate_store is not None and plate_index.exists() and not plate_store.is_imported(CSV_PATH):
+            try:
+                plate_store.import_csv(CSV_PATH)
+            except Exception as e:
+                print(f"Error importing {CSV_PATH} into the plate store: {e}")
+                return plate_index.lookup(plate)
+    if plate_store is not None:
+        return plate_store.search(plate)
+    if plate_index.exists():
+        return plate_index.lookup(plate)
+    return None
 
 
 @app.route('/search')
@@ -338,33 +469,17 @@ def search_page():
 
 @app.route('/search_plate')
 def search_plate():
-    """Search for vehicle info from CSV and return details (supports multiple records)"""
+    """Search for vehicle info in the plate store and return details (supports multiple records)"""
     plate = request.args.get('plate', '').strip().upper()
     if not plate:
         return jsonify({"status": "error", "message": "No plate number provided"}), 400
 
-    if not os.path.exists(CSV_PATH):
-        return jsonify({"status": "error", "message": "CSV file not found"}), 404
-
     try:
-        df = pd.read_csv(CSV_PATH, header=None)
-        df.columns = ["plate_number", "entry_time", "exit_time", "location"]
-        df["plate_number"] = df["plate_number"].astype(str).str.upper()
-
-        matches = df[df["plate_number"] == plate]
-
-        if not matches.empty:
-            records = []
-            for _, row in matches.iterrows():
-                entry_date = row["entry_time"].split(" ")[0] if " " in row["entry_time"] else row["entry_time"]
-                records.append({
-                    "plate_number": row["plate_number"],
-                    "entry_time": row["entry_time"],
-                    "exit_time": row["exit_time"],
-                    "date": entry_date,
-                    "location": row["location"]
-                })
+        records = lookup_plate(plate)
+        if records is None:
+            return jsonify({"status": "error", "message": "Plate log not found"}), 404
 
+        if records:
             return jsonify({
                 "status": "found",
                 "count": len(records),
@@ -1,19 +1,33 @@
 import cv2
 import pytesseract
-import pandas as pd
 import numpy as np
 import os
 import re
-import torch
+import atexit
 from datetime import datetime
-from ultralytics import YOLO  # ✅ Ultralytics YOLOv8–v12 models
+from plate_store import PlateStore
+from plate_writer import PlateWriter
+from plate_tracker import PlateTracker
+from ocr_pool import get_pool, recognize_tiled
+from roi import load_roi
+from motion_gate import MotionGate
+from plate_recognizer import CrnnRecognizer
+from detector_backend import load_detector  # ✅ Ultralytics YOLOv8–v12 models (torch / ONNX Runtime / OpenVINO)
 
 # --------------------------
 # CONFIGURATION
 # --------------------------
-CSV_PATH = "plate_log.csv"
+DB_PATH = "plate_events.db"
 PLATE_SAVE_DIR = "plates_captured"
 MODEL_PATH = r"C:/carnumberplate-main/numberplate_training_960_12n2.pt"
+DETECTOR_BACKEND = "auto"  # "torch", "onnx", "onnx-int8", "openvino" or "auto" (torch on CUDA, else ONNX Runtime)
+DETECTOR_IMGSZ = None  # None = training size (960); pick a smaller one from quantize_detector.py's report for CPU gates
+TILED_OCR = True  # several plates in a frame -> one OCR pass over a tiled page
+ROI_FILE = None  # gate-lane points from setplatearea.py (e.g. "gate1.txt"); None = whole frame
+ROI_RECTIFY = False  # warp the lane quadrilateral upright instead of cropping its bounding box
+MOTION_SENSITIVITY = "medium"  # "high", "medium", "low" or None to run YOLO on every frame
+PLATE_OCR = "tesseract"  # "tesseract" or "crnn" (ONNX model from train_recognizer.py)
+CRNN_MODEL = "plate_crnn.onnx"
 
 # Path to your Tesseract executable
 pytesseract.pytesseract.tesseract_cmd = r"C:/Program Files/Tesseract-OCR/tesseract.exe"
@@ -22,29 +36,19 @@ pytesseract.pytesseract.tesseract_cmd = r"C:/Program Files/Tesseract-OCR/tessera
 os.makedirs(PLATE_SAVE_DIR, exist_ok=True)
 
 # --------------------------
-# LOAD YOLO MODEL (GPU ENABLED)
+# LOAD YOLO MODEL (GPU, OR ONNX RUNTIME / OPENVINO ON CPU)
 # --------------------------
 print("[INFO] Loading YOLOv8/YOLOv12 model...")
 
-model = YOLO(MODEL_PATH)
-
-if torch.cuda.is_available():
-    model.to('cuda')
-    device_name = torch.cuda.get_device_name(0)
-    print(f"[INFO] Model loaded on GPU: {device_name}")
-else:
-    model.to('cpu')
-    print("[WARNING] CUDA not available. Using CPU (slower).")
+model = load_detector(MODEL_PATH, backend=DETECTOR_BACKEND, imgsz=DETECTOR_IMGSZ)
 
 print("[INFO] Model loaded successfully!")
 
 # --------------------------
-# CREATE CSV IF NOT EXISTS
+# PLATE EVENT STORE
 # --------------------------
-if not os.path.exists(CSV_PATH) or os.stat(CSV_PATH).st_size == 0:
-    df = pd.DataFrame(columns=["Plate Number", "Entry Time", "Exit Time", "Location"])
-    df.to_csv(CSV_PATH, index=False)
-    print("[INFO] Created new CSV file with headers.")
+plate_store = PlateStore(DB_PATH)
+atexit.register(plate_store.close)
 
 
 # --------------------------
@@ -96,63 +100,86 @@ def save_plate_image_and_label(plate_img, plate_number, box, frame_shape):
     print(f"[INFO] Saved: {image_path} + label {label_path}")
 
 
+# Tracks plates across frames so OCR only runs on new plates or sharper crops
+plate_tracker = PlateTracker()
+plate_roi = load_roi(ROI_FILE, rectify=ROI_RECTIFY)
+plate_gate = MotionGate(sensitivity=MOTION_SENSITIVITY) if MOTION_SENSITIVITY else None
+plate_crnn = CrnnRecognizer(CRNN_MODEL) if PLATE_OCR == "crnn" else None
+
+
 def detect_number_plate(frame):
-    """Detect number plates using YOLOv12 model and OCR."""
-    results = model(frame, verbose=False, device=0 if torch.cuda.is_available() else 'cpu')
+    """Detect number plates using YOLOv12 model and OCR (skipped while the scene is static)."""
+    # Detect on the gate lane only; the motion gate watches the same pixels
+    view = plate_roi.crop(frame) if plate_roi is not None else frame
+    if plate_gate is None:
+        return _detect_number_plate(frame, view)
+    if plate_gate.check(view):
+        plate_gate.update(_detect_number_plate(frame, view))
+    return plate_gate.last_result
+
+
+def _detect_number_plate(frame, view):
+    # Boxes found in the lane view are mapped back to full-frame coordinates
+    results = model(view)
     detected_plates = []
 
-    for result in results:
-        boxes = result.boxes.xyxy.cpu().numpy().astype(int)  # [x1, y1, x2, y2]
-        for (x1, y1, x2, y2) in boxes:
-            plate_img = frame[y1:y2, x1:x2]
-
+    boxes = np.concatenate([result.xyxy for result in results]) if results else np.zeros((0, 4))
+    if plate_roi is not None:
+        boxes = plate_roi.to_frame(boxes)
+    boxes = [tuple(int(v) for v in b) for b in boxes]
+    tracks = plate_tracker.update(boxes)
+
+    pending = []
+    for (x1, y1, x2, y2), track in zip(boxes, tracks):
+        plate_img = frame[y1:y2, x1:x2]
+        if plate_img.size == 0:
+            continue
+
+        if plate_tracker.needs_ocr(track, plate_img):
+            if plate_crnn is not None:
+                pending.append((track, plate_img))  # the CRNN was trained on raw colour crops
+                continue
             # Preprocess for OCR
             gray_plate = cv2.cvtColor(plate_img, cv2.COLOR_BGR2GRAY)
             gray_plate = cv2.bilateralFilter(gray_plate, 11, 17, 17)
             _, thresh = cv2.threshold(gray_plate, 120, 255, cv2.THRESH_BINARY)
+            pending.append((track, thresh))
+
+    # CRNN: all crops in one forward pass. Tesseract: several crops share one tiled page,
+    # a single crop is read as one line
+    crops = [crop for _, crop in pending]
+    if plate_crnn is not None:
+        results = plate_crnn.recognize_batch(crops) if crops else []
+    elif TILED_OCR and len(crops) > 1:
+        results = recognize_tiled(crops)
+    else:
+        results = get_pool(psm=7).recognize_batch(crops) if crops else []
+    for (track, _), result in zip(pending, results):
+        text = normalize_text(result.text)
+        plate_tracker.add_reading(track, text if looks_like_plate(text) else None, max(result.confidence, 0.01))
 
-            # OCR with Tesseract
-            text = pytesseract.image_to_string(thresh, config='--oem 3 --psm 7')
-            text = normalize_text(text)
-
-            if looks_like_plate(text):
-                detected_plates.append((text, (x1, y1, x2, y2), plate_img))
+    for (x1, y1, x2, y2), track in zip(boxes, tracks):
+        text = track.text
+        if text:
+            detected_plates.append((text, (x1, y1, x2, y2), frame[y1:y2, x1:x2]))
 
     return detected_plates
 
 
-def log_or_update_csv(plate_number, location="Camera-1"):
-    """Log plate in CSV or update its exit time."""
-    now = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+def log_plate_sighting(plate_number, location="Camera-1", plate_img=None, box=None, frame_shape=None):
+    """Hand a plate sighting (and its crop) to the background writer; never touches disk here."""
     plate_number = plate_number.upper()
 
     if not looks_like_plate(plate_number):
         return
 
-    if not os.path.exists(CSV_PATH) or os.stat(CSV_PATH).st_size == 0:
-        df = pd.DataFrame(columns=["Plate Number", "Entry Time", "Exit Time", "Location"])
-        df.to_csv(CSV_PATH, index=False)
-    else:
-        try:
-            df = pd.read_csv(CSV_PATH)
-        except pd.errors.EmptyDataError:
-            df = pd.DataFrame(columns=["Plate Number", "Entry Time", "Exit Time", "Location"])
-            df.to_csv(CSV_PATH, index=False)
-
-    if plate_number not in df["Plate Number"].values:
-        new_row = pd.DataFrame([{
-            "Plate Number": plate_number,
-            "Entry Time": now,
-            "Exit Time": now,
-            "Location": location
-        }])
-        df = pd.concat([df, new_row], ignore_index=True)
-        print(f"[INFO] New Entry logged: {plate_number} at {now}")
-    else:
-        df.loc[df["Plate Number"] == plate_number, "Exit Time"] = now
-        print(f"[INFO] Exit time updated: {plate_number} at {now}")
+    plate_writer.submit(plate_number, location, plate_img, box, frame_shape)
+
 
-    df.to_csv(CSV_PATH, index=False)
+# Background writer: saves crops/labels and logs sightings in batches.
+# Registered after plate_store.close so it is flushed first at exit.
+plate_writer = PlateWriter(plate_store, save_image=save_plate_image_and_label)
+atexit.register(plate_writer.close)
 
 
 # --------------------------
@@ -184,14 +211,18 @@ if __name__ == "__main__":
                 cv2.putText(frame, plate_text, (x1, y1 - 10),
                             cv2.FONT_HERSHEY_SIMPLEX, 1, (0, 255, 0), 3)
 
-                log_or_update_csv(plate_text, location)
-                save_plate_image_and_label(plate_img, plate_text, box, frame.shape)
+                log_plate_sighting(plate_text, location, plate_img, box, frame.shape)
 
+            stats = plate_writer.stats()
+            cv2.putText(frame, f"Write queue: {stats['queue_depth']}  dropped: {stats['dropped']}", (10, 30),
+                        cv2.FONT_HERSHEY_SIMPLEX, 1, (0, 255, 255), 2)
             cv2.imshow("Vehicle Number Plate Detection", cv2.resize(frame, (1280, 720)))
             if cv2.waitKey(1) & 0xFF == ord('q'):
                 break
 
         cap.release()
+        if plate_gate is not None:
+            print(f"[INFO] Motion gate: {plate_gate.stats()}")
         cv2.destroyAllWindows()
 
     # ------------------ MODE 2: VIDEO FILE ------------------
@@ -217,14 +248,18 @@ if __name__ == "__main__":
                 cv2.putText(frame, plate_text, (x1, y1 - 10),
                             cv2.FONT_HERSHEY_SIMPLEX, 1, (0, 255, 0), 3)
 
-                log_or_update_csv(plate_text, location)
-                save_plate_image_and_label(plate_img, plate_text, box, frame.shape)
+                log_plate_sighting(plate_text, location, plate_img, box, frame.shape)
 
+            stats = plate_writer.stats()
+            cv2.putText(frame, f"Write queue: {stats['queue_depth']}  dropped: {stats['dropped']}", (10, 30),
+                        cv2.FONT_HERSHEY_SIMPLEX, 1, (0, 255, 255), 2)
             cv2.imshow("Vehicle Number Plate Detection", cv2.resize(frame, (1280, 720)))
             if cv2.waitKey(1) & 0xFF == ord('q'):
                 break
 
         cap.release()
+        if plate_gate is not None:
+            print(f"[INFO] Motion gate: {plate_gate.stats()}")
         cv2.destroyAllWindows()
 
     # ------------------ MODE 3: IMAGE FILE ------------------
@@ -251,8 +286,7 @@ if __name__ == "__main__":
                 cv2.putText(frame, plate_text, (x1, y1 - 10),
                             cv2.FONT_HERSHEY_SIMPLEX, 1, (0, 255, 0), 3)
 
-                log_or_update_csv(plate_text, location)
-                save_plate_image_and_label(plate_img, plate_text, box, frame.shape)
+                log_plate_sighting(plate_text, location, plate_img, box, frame.shape)
 
             cv2.imshow("Detected Number Plate", cv2.resize(frame, (1280, 720)))
             cv2.waitKey(0)
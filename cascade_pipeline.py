@@ -0,0 +1,189 @@
+import time
+import numpy as np
+from detector_backend import Detections, load_detector, nms
+
+# --------------------------
+# TWO-STAGE CASCADE: VEHICLES FIRST, PLATES INSIDE THEM
+# --------------------------
+# Running the vehicle model and the high-resolution plate model on every full
+# frame costs two big inferences per frame. The cascade runs the vehicle model
+# once, crops every vehicle (classes 2, 6, 7, 8 as in app.py) from the
+# full-resolution frame, and runs the plate model only on those crops in one
+# batch. PLATE_IMGSZ = None uses the plate model's training size (960 for
+# numberplate_training_960_12n2.pt); the letterbox scales each crop so its
+# longer side is that size, so a vehicle crop (usually a few hundred px) is
+# upscaled and its plate gets more pixels than in a 960px full frame. Plate
+# boxes are mapped back to frame coordinates and de-duplicated across
+# overlapping vehicles with NMS.
+#
+# VEHICLE_IMGSZ is app.py's counting size (640). A smaller size is faster but
+# misses small and distant vehicles; the benchmark below prints vehicles per
+# frame for both pipelines, so check the counts there before lowering it.
+
+VEHICLE_CLASSES = (2, 6, 7, 8)
+VEHICLE_IMGSZ = 640
+PLATE_IMGSZ = None       # None = the plate model's training size
+CROP_PAD = 0.08          # padding around each vehicle box, fraction of its size
+MIN_VEHICLE = 32         # px; smaller vehicles are counted but not searched for plates
+MAX_CROP_BATCH = 16
+PLATE_NMS_IOU = 0.5
+
+
+class CascadeResult:
+    def __init__(self, vehicles, plates, owners):
+        self.vehicles = vehicles   # Detections in frame pixels
+        self.plates = plates       # Detections in frame pixels
+        self.owners = owners       # index into vehicles for every plate
+
+    @property
+    def vehicle_count(self):
+        return len(self.vehicles)
+
+
+class CascadeDetector:
+    def __init__(self, vehicle_detector, plate_detector, crop_pad=CROP_PAD, min_vehicle=MIN_VEHICLE,
+                 max_batch=MAX_CROP_BATCH):
+        self.vehicle_detector = vehicle_detector
+        self.plate_detector = plate_detector
+        self.crop_pad = crop_pad
+        self.min_vehicle = min_vehicle
+        self.max_batch = max_batch
+
+        # Stats
+        self.frames = 0
+        self.crops = 0
+        self.vehicle_time = 0.0
+        self.plate_time = 0.0
+        self.crop_pixels = 0
+        self.frame_pixels = 0
+
+    def __call__(self, frames):
+        """Frame or list of frames -> list of CascadeResult."""
+        frames = frames if isinstance(frames, list) else [frames]
+        if not frames:
+            return []
+
+        start = time.perf_counter()
+        vehicles = self.vehicle_detector(frames)
+        self.vehicle_time += time.perf_counter() - start
+
+        crops, origins = [], []   # origins: (frame index, vehicle index, x offset, y offset)
+        for fi, (frame, det) in enumerate(zip(frames, vehicles)):
+            h, w = frame.shape[:2]
+            self.frame_pixels += h * w
+            for vi, (x1, y1, x2, y2) in enumerate(det.xyxy):
+                bw, bh = x2 - x1, y2 - y1
+                if bw < self.min_vehicle or bh < self.min_vehicle:
+                    continue
+                cx1, cy1 = int(max(0, x1 - bw * self.crop_pad)), int(max(0, y1 - bh * self.crop_pad))
+                cx2, cy2 = int(min(w, x2 + bw * self.crop_pad)), int(min(h, y2 + bh * self.crop_pad))
+                crops.append(frame[cy1:cy2, cx1:cx2])
+                origins.append((fi, vi, cx1, cy1))
+                self.crop_pixels += (cx2 - cx1) * (cy2 - cy1)
+
+        start = time.perf_counter()
+        plate_dets = []
+        for i in range(0, len(crops), self.max_batch):
+            plate_dets.extend(self.plate_detector(crops[i:i + self.max_batch]))
+        self.plate_time += time.perf_counter() - start
+        self.frames += len(frames)
+        self.crops += len(crops)
+
+        found = [[] for _ in frames]
+        for (fi, vi, ox, oy), det in zip(origins, plate_dets):
+            offset = np.array([ox, oy, ox, oy], dtype=np.float32)
+            for xyxy, conf, cls in zip(det.xyxy, det.conf, det.cls):
+                found[fi].append((xyxy + offset, conf, cls, vi))
+
+        results = []
+        for fi, det in enumerate(vehicles):
+            if not found[fi]:
+                results.append(CascadeResult(det, Detections.empty(), np.zeros(0, int)))
+                continue
+            boxes = np.array([f[0] for f in found[fi]], dtype=np.float32)
+            conf = np.array([f[1] for f in found[fi]], dtype=np.float32)
+            keep = nms(boxes, conf, PLATE_NMS_IOU)
+            plates = Detections(boxes[keep], conf[keep], np.array([f[2] for f in found[fi]])[keep])
+            results.append(CascadeResult(det, plates, np.array([f[3] for f in found[fi]])[keep]))
+        return results
+
+    def stats(self):
+        n = max(self.frames, 1)
+        return {
+            "frames": self.frames,
+            "crops_per_frame": round(self.crops / n, 2),
+            "vehicle_ms": round(self.vehicle_time / n * 1000, 2),
+            "plate_ms": round(self.plate_time / n * 1000, 2),
+            "plate_pixel_fraction": round(self.crop_pixels / max(self.frame_pixels, 1), 3),
+        }
+
+
+def load_cascade(vehicle_weights, plate_weights, backend="auto", vehicle_imgsz=VEHICLE_IMGSZ,
+                 plate_imgsz=PLATE_IMGSZ, vehicle_classes=VEHICLE_CLASSES, device=None, **kwargs):
+    vehicle = load_detector(vehicle_weights, backend=backend, imgsz=vehicle_imgsz, classes=list(vehicle_classes),
+                            device=device)
+    plate = load_detector(plate_weights, backend=backend, imgsz=plate_imgsz, device=device)
+    return CascadeDetector(vehicle, plate, **kwargs)
+
+
+# --------------------------
+# BENCHMARK: cascade vs two full-frame models
+# --------------------------
+if __name__ == "__main__":
+    import argparse
+    import cv2
+
+    ap = argparse.ArgumentParser(description="Vehicle -> plate cascade vs two full-frame detectors")
+    ap.add_argument("--source", required=True, help="Video file")
+    ap.add_argument("--vehicle-model", default="yolov8n.pt")
+    ap.add_argument("--plate-model", default="numberplate_training_960_12n2.pt")
+    ap.add_argument("--backend", default="auto")
+    ap.add_argument("--vehicle-imgsz", type=int, default=VEHICLE_IMGSZ)
+    ap.add_argument("--plate-imgsz", type=int, default=PLATE_IMGSZ, help="Default: the plate model's training size")
+    ap.add_argument("--full-imgsz", type=int, default=960, help="Input size of the full-frame baseline")
+    ap.add_argument("--frames", type=int, default=200)
+    args = ap.parse_args()
+
+    cap = cv2.VideoCapture(args.source)
+    frames = []
+    while len(frames) < args.frames:
+        ok, frame = cap.read()
+        if not ok:
+            break
+        frames.append(frame)
+    cap.release()
+    if not frames:
+        print(f"[ERROR] Could not read frames from {args.source}")
+        raise SystemExit(1)
+
+    full_vehicle = load_detector(args.vehicle_model, backend=args.backend, imgsz=args.full_imgsz,
+                                 classes=list(VEHICLE_CLASSES))
+    full_plate = load_detector(args.plate_model, backend=args.backend, imgsz=args.full_imgsz)
+    full_vehicle(frames[0]), full_plate(frames[0])  # warm-up
+    start = time.perf_counter()
+    full_counts = full_plates = 0
+    for frame in frames:
+        full_counts += len(full_vehicle(frame)[0])
+        full_plates += len(full_plate(frame)[0])
+    full_ms = (time.perf_counter() - start) / len(frames) * 1000
+
+    cascade = load_cascade(args.vehicle_model, args.plate_model, backend=args.backend,
+                           vehicle_imgsz=args.vehicle_imgsz, plate_imgsz=args.plate_imgsz)
+    plate_imgsz = cascade.plate_detector.imgsz
+    cascade(frames[0])  # warm-up
+    cascade.frames = cascade.crops = cascade.crop_pixels = cascade.frame_pixels = 0
+    cascade.vehicle_time = cascade.plate_time = 0.0
+    start = time.perf_counter()
+    casc_counts = casc_plates = 0
+    for frame in frames:
+        result = cascade(frame)[0]
+        casc_counts += result.vehicle_count
+        casc_plates += len(result.plates)
+    casc_ms = (time.perf_counter() - start) / len(frames) * 1000
+
+    n = len(frames)
+    print(f"[INFO] Full frame ({args.full_imgsz}px x2): {full_ms:7.1f} ms/frame, "
+          f"{full_counts / n:.2f} vehicles, {full_plates / n:.2f} plates per frame")
+    print(f"[INFO] Cascade ({args.vehicle_imgsz}px + crops @ {plate_imgsz}px): {casc_ms:7.1f} ms/frame, "
+          f"{casc_counts / n:.2f} vehicles, {casc_plates / n:.2f} plates per frame")
+    print(f"[INFO] Cascade stats: {cascade.stats()}")
@@ -0,0 +1,89 @@
+import threading
+from multiprocessing.connection import wait
+
+# --------------------------
+# EVENT-DRIVEN VEHICLE COUNT AGGREGATION
+# --------------------------
+# Producers (inference + camera processes) send small dicts over one-way Pipes.
+# A single thread blocks on all of them with multiprocessing.connection.wait and
+# handles whichever is ready, so a quiet road never delays the others.
+#
+# Readers get the current snapshot without locking: every update builds a new
+# dict and swaps the reference, and the published dict is never mutated again.
+
+
+class CountAggregator:
+    def __init__(self):
+        self._snapshot = {}
+        self._conns = []
+        self._conns_lock = threading.Lock()
+        self._thread = None
+        self._running = False
+        self.messages = 0
+
+    def add_source(self, conn):
+        """Register the receiving end of a producer Pipe."""
+        with self._conns_lock:
+            self._conns.append(conn)
+
+    def start(self):
+        self._running = True
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._running = False
+        if self._thread is not None:
+            self._thread.join(timeout=1.0)
+            self._thread = None
+        with self._conns_lock:
+            for conn in self._conns:
+                conn.close()
+            self._conns = []
+
+    def reset(self, roads=()):
+        """Start a fresh snapshot with zeroed entries for the given roads."""
+        self._snapshot = {road: {'count': 0, 'fps': 0.0} for road in roads}
+
+    def snapshot(self):
+        """Current {road: {'count', 'fps', ...}} mapping. Treat it as read-only."""
+        return self._snapshot
+
+    def get_count(self, road, default=0):
+        return self._snapshot.get(road, {}).get('count', default)
+
+    def _run(self):
+        while self._running:
+            with self._conns_lock:
+                conns = list(self._conns)
+            if not conns:
+                break
+            for conn in wait(conns, timeout=0.5):
+                try:
+                    msg = conn.recv()
+                except (EOFError, OSError):
+                    # Producer exited; stop watching its pipe
+                    with self._conns_lock:
+                        if conn in self._conns:
+                            self._conns.remove(conn)
+                    continue
+                self._apply(msg)
+
+    def _apply(self, msg):
+        road = msg.get('road')
+        if road is None:
+            return
+        entry = dict(self._snapshot.get(road, {'count': 0, 'fps': 0.0}))
+        if 'vehicle_count' in msg:
+            entry['count'] = msg['vehicle_count']
+            entry['fps'] = msg.get('fps', entry['fps'])
+        if 'plate_boxes' in msg:
+            entry['plate_boxes'] = msg['plate_boxes']
+        if 'grab_stats' in msg:
+            entry['grab_stats'] = msg['grab_stats']
+        if 'motion_stats' in msg:
+            entry['motion_stats'] = msg['motion_stats']
+        snapshot = dict(self._snapshot)
+        snapshot[road] = entry
+        self._snapshot = snapshot
+        self.messages += 1
@@ -0,0 +1,377 @@
+import ast
+import json
+import os
+import shutil
+import time
+import cv2
+import numpy as np
+
+# --------------------------
+# PLUGGABLE YOLO DETECTOR BACKEND
+# --------------------------
+# Every box we deploy on is CPU-only, where the PyTorch path is the slowest way
+# to run the Ultralytics weights. load_detector() gives app.py, appp.py and
+# main1.py one interface over:
+#
+#   * "torch"    -> Ultralytics YOLO as before (uses CUDA when available)
+#   * "onnx"     -> ONNX Runtime, CPU execution provider, tuned thread counts
+#   * "onnx-int8"-> ONNX Runtime on the static-INT8 model from quantize_detector.py
+#   * "openvino" -> OpenVINO CPU plugin, latency hint
+#   * "auto"     -> torch with CUDA, else the first CPU runtime that is installed
+#
+# The .pt file is exported to ONNX once (dynamic batch and image size) and
+# cached in EXPORT_DIR next to the weights with a small JSON sidecar holding
+# the class names and training image size; the export is redone only when the
+# weights are newer than the cache. Letterbox and NMS run vectorised in NumPy.
+# Every backend returns Detections in original frame pixels.
+
+EXPORT_DIR = "onnx_cache"
+INT8_SUFFIX = "_int8"
+DEFAULT_CONF = 0.25
+DEFAULT_IOU = 0.45
+MAX_DET = 300
+PAD_VALUE = 114
+DEFAULT_THREADS = max(1, (os.cpu_count() or 2) // 2)  # physical cores on hyper-threaded CPUs
+
+try:
+    import onnxruntime as ort
+except ImportError:
+    ort = None
+
+try:
+    import openvino as ov
+except ImportError:
+    ov = None
+
+
+class Detections:
+    """Boxes for one frame: xyxy (N, 4) float32, conf (N,) float32, cls (N,) int."""
+
+    def __init__(self, xyxy, conf, cls):
+        self.xyxy = xyxy
+        self.conf = conf
+        self.cls = cls
+
+    def __len__(self):
+        return len(self.xyxy)
+
+    @classmethod
+    def empty(cls):
+        return cls(np.zeros((0, 4), np.float32), np.zeros(0, np.float32), np.zeros(0, int))
+
+
+# --------------------------
+# Pre / post-processing
+# --------------------------
+def letterbox(frames, imgsz):
+    """
+    Resize every frame to fit imgsz x imgsz keeping aspect ratio and pad the rest.
+    Returns (NCHW float32 batch in 0..1, [(ratio, pad_x, pad_y), ...]).
+    """
+    batch = np.full((len(frames), imgsz, imgsz, 3), PAD_VALUE, dtype=np.uint8)
+    meta = []
+    for i, frame in enumerate(frames):
+        h, w = frame.shape[:2]
+        ratio = min(imgsz / h, imgsz / w)
+        nw, nh = int(round(w * ratio)), int(round(h * ratio))
+        px, py = (imgsz - nw) // 2, (imgsz - nh) // 2
+        if (nw, nh) != (w, h):
+            frame = cv2.resize(frame, (nw, nh), interpolation=cv2.INTER_LINEAR)
+        batch[i, py:py + nh, px:px + nw] = frame
+        meta.append((ratio, px, py))
+    # BGR HWC uint8 -> RGB CHW float in one pass over the whole batch
+    blob = batch[..., ::-1].transpose(0, 3, 1, 2).astype(np.float32)
+    blob *= 1.0 / 255.0
+    return np.ascontiguousarray(blob), meta
+
+
+def nms(boxes, scores, iou_threshold):
+    """Greedy NMS over (N, 4) xyxy boxes; returns kept indices, best score first."""
+    x1, y1, x2, y2 = boxes.T
+    areas = (x2 - x1) * (y2 - y1)
+    order = np.argsort(-scores)
+    keep = []
+    while order.size:
+        i = order[0]
+        keep.append(i)
+        if order.size == 1:
+            break
+        rest = order[1:]
+        w = np.clip(np.minimum(x2[i], x2[rest]) - np.maximum(x1[i], x1[rest]), 0, None)
+        h = np.clip(np.minimum(y2[i], y2[rest]) - np.maximum(y1[i], y1[rest]), 0, None)
+        inter = w * h
+        iou = inter / (areas[i] + areas[rest] - inter + 1e-7)
+        order = rest[iou <= iou_threshold]
+    return np.asarray(keep, dtype=int)
+
+
+def postprocess(output, meta, shapes, conf=DEFAULT_CONF, iou=DEFAULT_IOU, classes=None, max_det=MAX_DET):
+    """Decode raw YOLOv8-style output (B, 4 + nc, anchors) into Detections per frame."""
+    results = []
+    for pred, (ratio, px, py), (h, w) in zip(output, meta, shapes):
+        pred = pred.T                                  # (anchors, 4 + nc)
+        scores = pred[:, 4:]
+        cls = scores.argmax(axis=1)
+        best = scores[np.arange(len(scores)), cls]
+        mask = best >= conf
+        if classes is not None:
+            mask &= np.isin(cls, classes)
+        if not mask.any():
+            results.append(Detections.empty())
+            continue
+        xywh, best, cls = pred[mask, :4], best[mask], cls[mask]
+
+        boxes = np.empty_like(xywh)
+        boxes[:, :2] = xywh[:, :2] - xywh[:, 2:] / 2
+        boxes[:, 2:] = xywh[:, :2] + xywh[:, 2:] / 2
+
+        # Class-aware NMS in one call: shift each class into its own coordinate range
+        offsets = cls[:, None] * 7680.0
+        keep = nms(boxes + offsets, best, iou)[:max_det]
+        boxes, best, cls = boxes[keep], best[keep], cls[keep]
+
+        # Undo the letterbox
+        boxes -= np.array([px, py, px, py], dtype=boxes.dtype)
+        boxes /= ratio
+        boxes[:, [0, 2]] = boxes[:, [0, 2]].clip(0, w)
+        boxes[:, [1, 3]] = boxes[:, [1, 3]].clip(0, h)
+        results.append(Detections(boxes.astype(np.float32), best.astype(np.float32), cls.astype(int)))
+    return results
+
+
+# --------------------------
+# ONNX export cache
+# --------------------------
+def export_onnx(weights, cache_dir=None):
+    """Export Ultralytics weights to ONNX once; returns (onnx_path, info dict)."""
+    if weights.lower().endswith(".onnx"):
+        return weights, _read_sidecar(weights)
+
+    stem = os.path.splitext(os.path.basename(weights))[0]
+    cache_dir = cache_dir or os.path.join(os.path.dirname(os.path.abspath(weights)), EXPORT_DIR)
+    target = os.path.join(cache_dir, f"{stem}.onnx")
+    weights_mtime = os.path.getmtime(weights) if os.path.exists(weights) else 0.0
+    if os.path.exists(target) and os.path.getmtime(target) >= weights_mtime:
+        return target, _read_sidecar(target)
+
+    from ultralytics import YOLO
+    print(f"[INFO] Exporting {weights} to ONNX (one-time)...")
+    model = YOLO(weights)
+    imgsz = model.overrides.get("imgsz", 640)
+    imgsz = imgsz[0] if isinstance(imgsz, (list, tuple)) else imgsz
+    exported = model.export(format="onnx", imgsz=imgsz, dynamic=True, simplify=True)
+
+    # Several processes may export at once: write under per-process temp names and rename into
+    # place (atomic), sidecar first, so a reader never sees a partial model
+    os.makedirs(cache_dir, exist_ok=True)
+    tmp = f"{target}.{os.getpid()}.tmp"
+    shutil.move(exported, tmp)
+    info = {"names": {int(k): v for k, v in model.names.items()}, "imgsz": int(imgsz), "source": weights}
+    with open(tmp + ".json", "w") as f:
+        json.dump(info, f, indent=2)
+    os.replace(tmp + ".json", target + ".json")
+    os.replace(tmp, target)
+    print(f"[INFO] Cached ONNX model: {target}")
+    return target, info
+
+
+def int8_path(onnx_path):
+    """Where quantize_detector.py writes the INT8 model for an FP32 ONNX export."""
+    root, ext = os.path.splitext(onnx_path)
+    return onnx_path if root.endswith(INT8_SUFFIX) else root + INT8_SUFFIX + ext
+
+
+def _read_sidecar(onnx_path):
+    try:
+        with open(onnx_path + ".json") as f:
+            info = json.load(f)
+        info["names"] = {int(k): v for k, v in info.get("names", {}).items()}
+        return info
+    except (OSError, ValueError):
+        return {}
+
+
+# --------------------------
+# Backends
+# --------------------------
+class TorchDetector:
+    backend = "torch"
+
+    def __init__(self, weights, imgsz=None, conf=DEFAULT_CONF, iou=DEFAULT_IOU, classes=None, device=None):
+        import torch
+        from ultralytics import YOLO
+        self.model = YOLO(weights)
+        self.device = device or ("cuda" if torch.cuda.is_available() else "cpu")
+        self.model.to(self.device)
+        size = imgsz or self.model.overrides.get("imgsz", 640)
+        self.imgsz = size[0] if isinstance(size, (list, tuple)) else size
+        self.names = self.model.names
+        self.conf, self.iou, self.classes = conf, iou, classes
+
+    def __call__(self, frames, conf=None):
+        frames = frames if isinstance(frames, list) else [frames]
+        results = self.model(frames, imgsz=self.imgsz, conf=conf or self.conf, iou=self.iou,
+                             classes=self.classes, device=self.device, verbose=False)
+        out = []
+        for r in results:
+            b = r.boxes.cpu().numpy()
+            out.append(Detections(b.xyxy.astype(np.float32), b.conf.astype(np.float32), b.cls.astype(int)))
+        return out
+
+
+class OnnxDetector:
+    backend = "onnx"
+
+    def __init__(self, weights, imgsz=None, conf=DEFAULT_CONF, iou=DEFAULT_IOU, classes=None,
+                 threads=DEFAULT_THREADS, cache_dir=None):
+        self.path, info = export_onnx(weights, cache_dir)
+        self.imgsz = imgsz or info.get("imgsz", 640)
+        self.names = info.get("names", {})
+        self.conf, self.iou, self.classes = conf, iou, classes
+        self._load(threads)
+        if not self.names:
+            self.names = self._names_from_metadata()
+
+    def _load(self, threads):
+        opts = ort.SessionOptions()
+        opts.intra_op_num_threads = threads
+        opts.inter_op_num_threads = 1
+        opts.execution_mode = ort.ExecutionMode.ORT_SEQUENTIAL
+        opts.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        self.session = ort.InferenceSession(self.path, opts, providers=["CPUExecutionProvider"])
+        self.input_name = self.session.get_inputs()[0].name
+
+    def _names_from_metadata(self):
+        # Ultralytics stores the class names in the ONNX metadata as a dict literal
+        names = self.session.get_modelmeta().custom_metadata_map.get("names")
+        return ast.literal_eval(names) if names else {}
+
+    def _infer(self, blob):
+        return self.session.run(None, {self.input_name: blob})[0]
+
+    def __call__(self, frames, conf=None):
+        frames = frames if isinstance(frames, list) else [frames]
+        if not frames:
+            return []
+        blob, meta = letterbox(frames, self.imgsz)
+        output = self._infer(blob)
+        return postprocess(output, meta, [f.shape[:2] for f in frames],
+                           conf=conf or self.conf, iou=self.iou, classes=self.classes)
+
+
+class OnnxInt8Detector(OnnxDetector):
+    backend = "onnx-int8"
+
+    def _load(self, threads):
+        quantized = int8_path(self.path)
+        if os.path.exists(quantized):
+            self.path = quantized
+        else:
+            print(f"[WARNING] No INT8 model at {quantized} (run quantize_detector.py); using FP32")
+        super()._load(threads)
+
+
+class OpenVinoDetector(OnnxDetector):
+    backend = "openvino"
+
+    def _load(self, threads):
+        core = ov.Core()
+        model = core.read_model(self.path)
+        # Fix the spatial size, keep the batch dynamic for app.py's multi-road batches
+        model.reshape({model.inputs[0]: ov.PartialShape([-1, 3, self.imgsz, self.imgsz])})
+        self.compiled = core.compile_model(model, "CPU", {
+            "PERFORMANCE_HINT": "LATENCY",
+            "INFERENCE_NUM_THREADS": threads,
+        })
+        self.output = self.compiled.output(0)
+
+    def _names_from_metadata(self):
+        return {}
+
+    def _infer(self, blob):
+        return self.compiled([blob])[self.output]
+
+
+BACKENDS = {"torch": TorchDetector, "onnx": OnnxDetector, "onnx-int8": OnnxInt8Detector,
+            "openvino": OpenVinoDetector}
+
+
+def resolve_backend(backend="auto"):
+    if backend != "auto":
+        return backend
+    try:
+        import torch
+        if torch.cuda.is_available():
+            return "torch"
+    except ImportError:
+        pass
+    if ort is not None:
+        return "onnx"
+    if ov is not None:
+        return "openvino"
+    return "torch"
+
+
+def load_detector(weights, backend="auto", **kwargs):
+    """
+    Load a YOLO detector. Call it with a frame or a list of frames; it returns a
+    list of Detections. kwargs: imgsz, conf, iou, classes, plus threads/cache_dir
+    (onnx, openvino) or device (torch).
+    """
+    backend = resolve_backend(backend)
+    if backend == "torch":
+        for key in ("threads", "cache_dir"):
+            kwargs.pop(key, None)
+    else:
+        kwargs.pop("device", None)
+    detector = BACKENDS[backend](weights, **kwargs)
+    print(f"[INFO] Detector {os.path.basename(weights)}: backend={detector.backend}, imgsz={detector.imgsz}")
+    return detector
+
+
+# --------------------------
+# BENCHMARK: CPU latency per backend
+# --------------------------
+if __name__ == "__main__":
+    import argparse
+
+    ap = argparse.ArgumentParser(description="CPU latency: torch vs ONNX Runtime vs OpenVINO")
+    ap.add_argument("--weights", default="yolov8n.pt")
+    ap.add_argument("--image", default="a1.jpg", help="Test frame (a synthetic one is used if missing)")
+    ap.add_argument("--imgsz", type=int, default=None)
+    ap.add_argument("--runs", type=int, default=30)
+    ap.add_argument("--batch", type=int, default=1)
+    ap.add_argument("--threads", type=int, default=DEFAULT_THREADS)
+    ap.add_argument("--backends", nargs="+", default=["torch", "onnx", "openvino"])
+    args = ap.parse_args()
+
+    frame = cv2.imread(args.image)
+    if frame is None:
+        frame = np.random.randint(0, 255, (720, 1280, 3), dtype=np.uint8)
+    frames = [frame] * args.batch
+
+    reference, reference_name = None, None
+    for name in args.backends:
+        if (name.startswith("onnx") and ort is None) or (name == "openvino" and ov is None):
+            print(f"[WARNING] {name}: runtime not installed, skipped")
+            continue
+        kwargs = {"imgsz": args.imgsz}
+        if name == "torch":
+            kwargs["device"] = "cpu"
+        else:
+            kwargs["threads"] = args.threads
+        det = load_detector(args.weights, backend=name, **kwargs)
+        det(frames)  # warm-up
+        start = time.perf_counter()
+        for _ in range(args.runs):
+            results = det(frames)
+        ms = (time.perf_counter() - start) / (args.runs * len(frames)) * 1000
+
+        agree = ""
+        if reference is None:
+            reference, reference_name = results[0], name
+        elif len(reference) and len(results[0]):
+            from plate_tracker import box_iou
+            matched = (box_iou(reference.xyxy, results[0].xyxy).max(axis=1) >= 0.9).sum()
+            agree = f", {matched}/{len(reference)} boxes match {reference_name}"
+        print(f"[INFO] {name:9s}: {ms:7.2f} ms/frame, {len(results[0])} boxes{agree}")
@@ -0,0 +1,218 @@
+import time
+import cv2
+
+# --------------------------
+# FAST HAAR CASCADE: COARSE SCAN + LOCAL TRACKING
+# --------------------------
+# detectMultiScale over a full-resolution frame spends most of its time on
+# the largest pyramid levels, which only find the smallest plates. This
+# wrapper splits the work:
+#
+#   full scan (every rescan_every frames) - run the cascade on the frame
+#   downscaled so that a min_plate_width plate still fills the cascade
+#   window (the downscaled image's pyramid is the top of the full-resolution
+#   one) with relaxed minNeighbors, then confirm every candidate at full
+#   resolution with the normal minNeighbors, in a small window around it
+#   and with the size limited to near the candidate's
+#
+#   frames in between - search only around the previous boxes (padded for
+#   motion, size within SIZE_RANGE of the last box). A plate that is not
+#   found again is dropped until the next full scan.
+#
+# New plates show up at the next full scan, i.e. within rescan_every frames.
+# Plates narrower than min_plate_width (usually unreadable anyway) are not
+# searched for.
+
+SCALE_FACTOR = 1.1
+MIN_NEIGHBORS = 5
+MIN_SIZE = (50, 20)
+MIN_PLATE_WIDTH = 100    # px at full resolution; sets how far the full scan downscales
+RESCAN_EVERY = 10        # frames between full scans
+REFINE_PAD = 0.2         # search margin around a coarse hit, fraction of its width
+TRACK_PAD = 0.4          # search margin around last frame's box (covers motion), fraction of its width
+SIZE_RANGE = (0.75, 1.35)
+COARSE_NEIGHBORS = 2     # minNeighbors of the downscaled scan; hits are confirmed at full resolution
+DEDUPE_IOU = 0.3
+
+
+def _iou(a, b):
+    ax, ay, aw, ah = a
+    bx, by, bw, bh = b
+    iw = max(0, min(ax + aw, bx + bw) - max(ax, bx))
+    ih = max(0, min(ay + ah, by + bh) - max(ay, by))
+    inter = iw * ih
+    union = aw * ah + bw * bh - inter
+    return inter / union if union else 0.0
+
+
+class FastPlateCascade:
+    def __init__(self, cascade, scale_factor=SCALE_FACTOR, min_neighbors=MIN_NEIGHBORS, min_size=MIN_SIZE,
+                 min_plate_width=MIN_PLATE_WIDTH, rescan_every=RESCAN_EVERY, refine_pad=REFINE_PAD,
+                 track_pad=TRACK_PAD, coarse_neighbors=COARSE_NEIGHBORS):
+        self.cascade = cascade
+        self.scale_factor = scale_factor
+        self.min_neighbors = min_neighbors
+        self.coarse_neighbors = min(coarse_neighbors, min_neighbors)
+        self.min_size = tuple(min_size)
+        self.rescan_every = max(1, rescan_every)
+        self.refine_pad = refine_pad
+        self.track_pad = track_pad
+        win_w, win_h = cascade.getOriginalWindowSize()
+        self.window = (win_w, win_h)
+        self.scale = min(1.0, win_w / float(min_plate_width))
+        self.boxes = []
+        self._since_scan = None
+
+        # Stats
+        self.frames = 0
+        self.full_scans = 0
+        self.scan_time = 0.0
+        self.track_time = 0.0
+
+    def reset(self):
+        self.boxes = []
+        self._since_scan = None
+
+    def detect(self, gray):
+        """Grey frame -> [(x, y, w, h)] like detectMultiScale."""
+        start = time.perf_counter()
+        if self._since_scan is None or self._since_scan + 1 >= self.rescan_every:
+            self.boxes = self._full_scan(gray)
+            self._since_scan = 0
+            self.full_scans += 1
+            self.scan_time += time.perf_counter() - start
+        else:
+            self.boxes = self._track(gray)
+            self._since_scan += 1
+            self.track_time += time.perf_counter() - start
+        self.frames += 1
+        return list(self.boxes)
+
+    def _full_scan(self, gray):
+        s = self.scale
+        small = cv2.resize(gray, None, fx=s, fy=s, interpolation=cv2.INTER_AREA) if s < 1.0 else gray
+        min_size = (max(self.window[0], int(self.min_size[0] * s)), max(self.window[1], int(self.min_size[1] * s)))
+        hits = self.cascade.detectMultiScale(small, scaleFactor=self.scale_factor, minNeighbors=self.coarse_neighbors,
+                                             minSize=min_size)
+        boxes = []
+        for (x, y, w, h) in hits:
+            coarse = (int(x / s), int(y / s), int(w / s), int(h / s))
+            refined = self._search(gray, coarse, self.refine_pad)
+            if refined:
+                boxes.append(max(refined, key=lambda b: _iou(b, coarse)))
+        return self._dedupe(boxes)
+
+    def _track(self, gray):
+        boxes = []
+        for prev in self.boxes:
+            found = self._search(gray, prev, self.track_pad)
+            if found:
+                boxes.append(max(found, key=lambda b: _iou(b, prev)))
+        return self._dedupe(boxes)
+
+    def _search(self, gray, box, pad):
+        """Full-resolution cascade in a padded window around box, sizes near the box's."""
+        x, y, w, h = box
+        frame_h, frame_w = gray.shape[:2]
+        margin = w * pad   # plates are ~3x wider than tall; a height-based margin loses vertical motion
+        x1, y1 = max(0, int(x - margin)), max(0, int(y - margin))
+        x2, y2 = min(frame_w, int(x + w + margin)), min(frame_h, int(y + h + margin))
+        lo, hi = SIZE_RANGE
+        min_size = (max(self.min_size[0], self.window[0], int(w * lo)), max(self.min_size[1], self.window[1], int(h * lo)))
+        max_size = (int(w * hi) + 1, int(h * hi) + 1)
+        if x2 - x1 < min_size[0] or y2 - y1 < min_size[1]:
+            return []
+        hits = self.cascade.detectMultiScale(gray[y1:y2, x1:x2], scaleFactor=self.scale_factor,
+                                             minNeighbors=self.min_neighbors, minSize=min_size, maxSize=max_size)
+        return [(int(hx + x1), int(hy + y1), int(hw), int(hh)) for (hx, hy, hw, hh) in hits]
+
+    @staticmethod
+    def _dedupe(boxes):
+        kept = []
+        for box in sorted(boxes, key=lambda b: b[2] * b[3], reverse=True):
+            if all(_iou(box, k) < DEDUPE_IOU for k in kept):
+                kept.append(box)
+        return kept
+
+    def stats(self):
+        n = max(self.frames, 1)
+        tracked = self.frames - self.full_scans
+        return {
+            "frames": self.frames,
+            "full_scans": self.full_scans,
+            "scan_ms": round(self.scan_time / max(self.full_scans, 1) * 1000, 2),
+            "track_ms": round(self.track_time / max(tracked, 1) * 1000, 2),
+            "ms_per_frame": round((self.scan_time + self.track_time) / n * 1000, 2),
+        }
+
+
+# --------------------------
+# BENCHMARK: full-resolution scan every frame vs fast mode
+# --------------------------
+if __name__ == "__main__":
+    import argparse
+
+    ap = argparse.ArgumentParser(description="Haar plate cascade: full scan per frame vs downscaled scan + tracking")
+    ap.add_argument("--source", nargs="+", default=["a1.jpg", "a2.jpg", "a3.jpg", "a4.jpg"],
+                    help="A video file, or still frames that are turned into a slow drive-by clip")
+    ap.add_argument("--frames", type=int, default=120)
+    ap.add_argument("--width", type=int, default=1280, help="Frame width the stills are resized to")
+    ap.add_argument("--rescan-every", type=int, default=RESCAN_EVERY)
+    ap.add_argument("--min-plate-width", type=int, default=MIN_PLATE_WIDTH)
+    args = ap.parse_args()
+
+    frames, cuts = [], {0}
+    if len(args.source) == 1 and not args.source[0].lower().endswith((".jpg", ".jpeg", ".png")):
+        cap = cv2.VideoCapture(args.source[0])
+        while len(frames) < args.frames:
+            ok, frame = cap.read()
+            if not ok:
+                break
+            frames.append(cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY))
+        cap.release()
+    else:
+        stills = [cv2.imread(p, cv2.IMREAD_GRAYSCALE) for p in args.source]
+        stills = [cv2.resize(s, (args.width, int(s.shape[0] * args.width / s.shape[1]))) for s in stills if s is not None]
+        # Every still becomes its own short clip (a cut in between) in which the view
+        # drifts and zooms in slowly, like a car rolling towards the gate camera
+        per_still = max(1, args.frames // max(len(stills), 1))
+        for still in stills:
+            cuts.add(len(frames))
+            h, w = still.shape
+            for i in range(per_still):
+                zoom = 1.0 + 0.004 * i
+                m = cv2.getRotationMatrix2D((w / 2, h / 2), 0, zoom)
+                m[:, 2] += (1.5 * i - 20, 0.8 * i - 10)
+                frames.append(cv2.warpAffine(still, m, (w, h), borderMode=cv2.BORDER_REPLICATE))
+    if not frames:
+        print(f"[ERROR] Could not read frames from {args.source}")
+        raise SystemExit(1)
+
+    cascade = cv2.CascadeClassifier(cv2.data.haarcascades + "haarcascade_russian_plate_number.xml")
+
+    start = time.perf_counter()
+    baseline = [cascade.detectMultiScale(f, scaleFactor=SCALE_FACTOR, minNeighbors=MIN_NEIGHBORS, minSize=MIN_SIZE)
+                for f in frames]
+    full_fps = len(frames) / (time.perf_counter() - start)
+
+    fast = FastPlateCascade(cascade, rescan_every=args.rescan_every, min_plate_width=args.min_plate_width)
+    start = time.perf_counter()
+    found = []
+    for i, f in enumerate(frames):
+        if i in cuts:
+            fast.reset()
+        found.append(fast.detect(f))
+    fast_fps = len(frames) / (time.perf_counter() - start)
+
+    # Boxes of the full scan (at least min_plate_width wide) that fast mode also returned
+    wanted = [[tuple(b) for b in boxes if b[2] >= args.min_plate_width] for boxes in baseline]
+    hit = sum(any(_iou(b, f) >= 0.5 for f in got) for boxes, got in zip(wanted, found) for b in boxes)
+    total = sum(len(boxes) for boxes in wanted)
+
+    h, w = frames[0].shape
+    print(f"[INFO] {len(frames)} frames of {w}x{h}")
+    print(f"[INFO] Full scan every frame : {full_fps:7.1f} fps, {sum(map(len, baseline)) / len(frames):.2f} boxes/frame")
+    print(f"[INFO] Fast (rescan every {args.rescan_every:>2}): {fast_fps:7.1f} fps, "
+          f"{sum(map(len, found)) / len(frames):.2f} boxes/frame, "
+          f"{hit}/{total} full-scan plates >= {args.min_plate_width}px found")
+    print(f"[INFO] Fast stats: {fast.stats()}")
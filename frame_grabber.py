@@ -0,0 +1,190 @@
+import threading
+import time
+import requests
+import numpy as np
+import cv2
+
+# --------------------------
+# PERSISTENT-CONNECTION FRAME GRABBER (ESP32 cameras)
+# --------------------------
+# Keeps one HTTP keep-alive session (snapshot URLs such as /cam.jpg) or one open
+# MJPEG stream per camera. Frames are fetched and decoded on a background thread
+# and only the newest one is kept, so inference never waits on the network.
+
+CONNECT_TIMEOUT = 3.0
+READ_TIMEOUT = 5.0
+RETRY_DELAY = 1.0
+STREAM_CHUNK = 4096
+SNAPSHOT_MAX_FPS = 15  # don't hammer the ESP32 faster than it can produce snapshots
+
+
+class FrameGrabber:
+    def __init__(self, url, name=None, max_fps=SNAPSHOT_MAX_FPS):
+        self.url = url
+        self.name = name or url
+        self.min_interval = 1.0 / max_fps if max_fps else 0.0
+        self.session = requests.Session()
+        self._lock = threading.Lock()
+        self._frame = None
+        self._frame_id = 0
+        self._read_id = 0
+        self._running = False
+        self._thread = None
+
+        # Stats
+        self.grabbed = 0
+        self.dropped = 0      # decoded frames replaced before anyone read them
+        self.errors = 0
+        self.last_latency = 0.0
+        self._latency_sum = 0.0
+
+    def start(self):
+        self._running = True
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._running = False
+        if self._thread is not None:
+            self._thread.join(timeout=READ_TIMEOUT)
+        self.session.close()
+
+    def read(self, after_id=0):
+        """Return (frame_id, frame) for the newest frame newer than after_id, or (after_id, None)."""
+        with self._lock:
+            if self._frame is None or self._frame_id <= after_id:
+                return after_id, None
+            self._read_id = self._frame_id
+            return self._frame_id, self._frame
+
+    def stats(self):
+        avg = self._latency_sum / self.grabbed if self.grabbed else 0.0
+        return {
+            "grabbed": self.grabbed,
+            "dropped": self.dropped,
+            "errors": self.errors,
+            "last_latency_ms": round(self.last_latency * 1000, 1),
+            "avg_latency_ms": round(avg * 1000, 1),
+        }
+
+    # --------------------------
+    # Background thread
+    # --------------------------
+    def _run(self):
+        while self._running:
+            try:
+                start = time.time()
+                resp = self.session.get(self.url, stream=True, timeout=(CONNECT_TIMEOUT, READ_TIMEOUT))
+                resp.raise_for_status()
+                if resp.headers.get("Content-Type", "").startswith("multipart/"):
+                    self._read_stream(resp)
+                else:
+                    self._publish(resp.content, start)
+                    resp.close()
+                    wait = self.min_interval - (time.time() - start)
+                    if wait > 0:
+                        time.sleep(wait)
+            except Exception as e:
+                self.errors += 1
+                print(f"[WARNING] Grabber {self.name}: {e}")
+                time.sleep(RETRY_DELAY)
+
+    def _read_stream(self, resp):
+        """Cut JPEGs out of a multipart MJPEG stream by their SOI/EOI markers."""
+        buf = b""
+        start = None  # arrival time of the current frame's first bytes
+        # read1 returns as soon as any bytes arrive; iter_content would wait for a full chunk
+        read1 = getattr(resp.raw, "read1", None)
+        chunks = iter(lambda: read1(STREAM_CHUNK), b"") if read1 else resp.iter_content(STREAM_CHUNK)
+        for chunk in chunks:
+            if not self._running:
+                break
+            buf += chunk
+            while True:
+                soi = buf.find(b"\xff\xd8")
+                if soi != -1 and start is None:
+                    start = time.time()
+                eoi = buf.find(b"\xff\xd9", soi + 2) if soi != -1 else -1
+                if soi == -1 or eoi == -1:
+                    break
+                self._publish(buf[soi:eoi + 2], start)
+                buf = buf[eoi + 2:]
+                start = None
+        resp.close()
+
+    def _publish(self, jpeg, start):
+        frame = cv2.imdecode(np.frombuffer(jpeg, dtype=np.uint8), cv2.IMREAD_COLOR)
+        if frame is None:
+            self.errors += 1
+            return
+        latency = time.time() - start
+        with self._lock:
+            if self._frame is not None and self._read_id < self._frame_id:
+                self.dropped += 1
+            self._frame = frame
+            self._frame_id += 1
+        self.grabbed += 1
+        self.last_latency = latency
+        self._latency_sum += latency
+
+
+# --------------------------
+# LOCAL STAND-IN CAMERA (for testing without an ESP32)
+# --------------------------
+def serve_standin_camera(port=8081, fps=20):
+    """Serve /cam.jpg snapshots and a /stream MJPEG feed of a synthetic frame on localhost."""
+    from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+    def make_jpeg():
+        img = np.zeros((480, 640, 3), dtype=np.uint8)
+        cv2.putText(img, time.strftime("%H:%M:%S") + f".{int(time.time() * 1000) % 1000:03d}",
+                    (40, 240), cv2.FONT_HERSHEY_SIMPLEX, 2, (0, 255, 0), 3)
+        return cv2.imencode(".jpg", img)[1].tobytes()
+
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"  # keep-alive
+        disable_nagle_algorithm = True
+
+        def do_GET(self):
+            if self.path.startswith("/stream"):
+                self.send_response(200)
+                self.send_header("Content-Type", "multipart/x-mixed-replace; boundary=frame")
+                self.end_headers()
+                try:
+                    while True:
+                        jpeg = make_jpeg()
+                        self.wfile.write(b"--frame\r\nContent-Type: image/jpeg\r\n\r\n" + jpeg + b"\r\n")
+                        time.sleep(1.0 / fps)
+                except (BrokenPipeError, ConnectionResetError):
+                    return
+            else:
+                jpeg = make_jpeg()
+                self.send_response(200)
+                self.send_header("Content-Type", "image/jpeg")
+                self.send_header("Content-Length", str(len(jpeg)))
+                self.end_headers()
+                self.wfile.write(jpeg)
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer(("127.0.0.1", port), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+if __name__ == "__main__":
+    server = serve_standin_camera()
+    for path in ("/cam.jpg", "/stream"):
+        grabber = FrameGrabber(f"http://127.0.0.1:8081{path}").start()
+        last_id, reads = 0, 0
+        end = time.time() + 3
+        while time.time() < end:
+            last_id, frame = grabber.read(last_id)
+            if frame is not None:
+                reads += 1
+            time.sleep(0.1)  # simulate slow inference
+        grabber.stop()
+        print(f"[INFO] {path}: read {reads} frames, stats {grabber.stats()}")
+    server.shutdown()
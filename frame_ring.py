@@ -0,0 +1,104 @@
+import numpy as np
+import cv2
+from multiprocessing import shared_memory
+
+# --------------------------
+# SHARED-MEMORY FRAME RING
+# --------------------------
+# Layout of the shared block:
+#   header : int64[4]            -> [latest_seq, slots, max_h, max_w]
+#   meta   : int64[slots, 3]     -> per slot [seq, h, w]
+#   data   : uint8[slots, max_h, max_w, 3]
+#
+# The producer writes the next slot in place and only then publishes the new
+# sequence number, so readers never see a half-written "latest" frame. A reader
+# re-checks the slot's sequence after copying to detect that it was lapped.
+
+HEADER_LEN = 4
+META_LEN = 3
+DEFAULT_SLOTS = 4
+DEFAULT_MAX_SHAPE = (720, 1280)
+
+
+class FrameRing:
+    def __init__(self, name=None, create=False, slots=DEFAULT_SLOTS, max_shape=DEFAULT_MAX_SHAPE):
+        """Create a new ring (create=True) or attach to an existing one by name."""
+        if create:
+            max_h, max_w = max_shape
+            size = (HEADER_LEN + slots * META_LEN) * 8 + slots * max_h * max_w * 3
+            self.shm = shared_memory.SharedMemory(name=name, create=True, size=size)
+            header = np.ndarray((HEADER_LEN,), dtype=np.int64, buffer=self.shm.buf)
+            header[:] = [0, slots, max_h, max_w]
+        else:
+            self.shm = shared_memory.SharedMemory(name=name)
+
+        self.owner = create
+        self.name = self.shm.name
+        self._header = np.ndarray((HEADER_LEN,), dtype=np.int64, buffer=self.shm.buf)
+        self.slots = int(self._header[1])
+        self.max_h = int(self._header[2])
+        self.max_w = int(self._header[3])
+        self._meta = np.ndarray((self.slots, META_LEN), dtype=np.int64,
+                                buffer=self.shm.buf, offset=HEADER_LEN * 8)
+        self._data = np.ndarray((self.slots, self.max_h, self.max_w, 3), dtype=np.uint8,
+                                buffer=self.shm.buf, offset=(HEADER_LEN + self.slots * META_LEN) * 8)
+
+    @property
+    def seq(self):
+        """Sequence number of the newest published frame (0 = nothing written yet)."""
+        return int(self._header[0])
+
+    def write(self, frame):
+        """Copy a BGR frame into the next slot and publish it. Returns the new sequence number."""
+        h, w = frame.shape[:2]
+        if h > self.max_h or w > self.max_w:
+            scale = min(self.max_h / h, self.max_w / w)
+            frame = cv2.resize(frame, (int(w * scale), int(h * scale)), interpolation=cv2.INTER_AREA)
+            h, w = frame.shape[:2]
+        if frame.ndim == 2:
+            frame = cv2.cvtColor(frame, cv2.COLOR_GRAY2BGR)
+
+        seq = self.seq + 1
+        slot = seq % self.slots
+        self._meta[slot, 0] = -1  # mark slot as being written
+        self._data[slot, :h, :w] = frame[:, :, :3]
+        self._meta[slot, 1] = h
+        self._meta[slot, 2] = w
+        self._meta[slot, 0] = seq
+        self._header[0] = seq
+        return seq
+
+    def latest(self, after_seq=0, copy=True):
+        """
+        Return (seq, frame) for the newest frame newer than after_seq, or (after_seq, None).
+        With copy=False the frame is a view into shared memory; check still_valid(seq)
+        after using it if the producer may have lapped the ring in the meantime.
+        """
+        for _ in range(3):
+            seq = self.seq
+            if seq <= after_seq:
+                return after_seq, None
+            slot = seq % self.slots
+            meta_seq, h, w = (int(v) for v in self._meta[slot])
+            if meta_seq != seq:
+                continue
+            view = self._data[slot, :h, :w]
+            frame = view.copy() if copy else view
+            if self.still_valid(seq):
+                return seq, frame
+        return after_seq, None
+
+    def still_valid(self, seq):
+        """True while the slot holding `seq` has not been overwritten by a newer frame."""
+        return int(self._meta[seq % self.slots, 0]) == seq
+
+    def close(self):
+        """Detach from the shared block; the creating side also frees it."""
+        self._header = self._meta = self._data = None
+        self.shm.close()
+        if self.owner:
+            try:
+                self.shm.unlink()
+            except FileNotFoundError:
+                pass
+
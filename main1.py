@@ -1,13 +1,26 @@
 import cv2
-import pandas as pd
-from ultralytics import YOLO
 import numpy as np
 import pytesseract
-from datetime import datetime
+from datetime import datetime, timedelta
+from functools import partial
 import os
-from difflib import SequenceMatcher
 import csv
+import json
+import time
+import argparse
+import zlib
+from multiprocessing import Pool, freeze_support
 import re
+from plate_store import PlateStore, format_time
+from plate_tracker import PlateTracker
+from plate_matcher import PlateMatcher
+from plate_expiry import ExpiryHeap
+from plate_grammar import PlateDecoder
+from ocr_pool import OcrPool, PLATE_WHITELIST
+from plate_recognizer import CrnnRecognizer
+from detector_backend import export_onnx, load_detector, resolve_backend
+from roi import load_roi
+from video_pipeline import Pipeline, format_stats
 
 
 pytesseract.pytesseract.tesseract_cmd = r'C:\Program Files\Tesseract-OCR\tesseract.exe'
@@ -15,154 +28,404 @@ pytesseract.pytesseract.tesseract_cmd = r'C:\Program Files\Tesseract-OCR\tessera
 MODEL_PATH = r"C:\carnumberplate-main\runs\freedomown_yolov86\weights\best.pt"
 CLASS_FILE = r"C:\carnumberplate-main\coco1.txt"
 VIDEO_DIR = r'C:\carnumberplate-main\images'
-OUTPUT_FILE = r'C:\carnumberplate-main\car_plate_data.csv'
+DB_PATH = r'C:\carnumberplate-main\plate_events.db'
 PROCESSED_DIR = r'C:\carnumberplate-main\processed_videos'
+MANIFEST_FILE = "batch_manifest.jsonl"   # in PROCESSED_DIR: one line per finished video (resume + merge)
+MERGED_CSV = "batch_plates.csv"          # in PROCESSED_DIR: all visits, sorted by video then entry
 
 CONF_THRESHOLD = 0.2
-EXIT_THRESHOLD = 5.0  
+DETECTOR_IMGSZ = None  # None = training size
+DETECTOR_BACKEND = "auto"  # "torch", "onnx", "onnx-int8", "openvino" or "auto" (torch on CUDA, else ONNX Runtime)
+ROI_FILE = None  # gate-lane points from setplatearea.py; None = <video name>.txt next to the video if present
+ROI_RECTIFY = False  # warp the lane quadrilateral upright instead of cropping its bounding box
+PLATE_OCR = "tesseract"  # "tesseract" or "crnn" (ONNX model from train_recognizer.py)
+CRNN_MODEL = "plate_crnn.onnx"
+GRAMMAR_VOTE_CONFIDENCE = 0.8  # grammar decodes at or above this count double in the plate vote
+EXIT_THRESHOLD = 5.0     # seconds of *video* time without a sighting before a plate has left
+CLIP_START = None        # "YYYY-mm-dd HH:MM:SS" for every clip; None = from the file name, else file mtime - duration
+FRAME_STEP = 1           # process every Nth frame (skipped frames are grabbed, not decoded)
+
+THREADS_PER_WORKER = 2   # detector / OpenCV threads in each worker process
+WORKERS = max(1, (os.cpu_count() or 2) // THREADS_PER_WORKER)
+VIDEO_EXTS = ('.mp4', '.avi')
 
 INDIAN_PLATE_PATTERN = re.compile(r'^[A-Z]{2}[0-9]{1,2}[A-Z]{1,2}[0-9]{4}$')
+NAME_TIME_PATTERN = re.compile(r'(\d{8})[_-]?(\d{6})')   # e.g. video_20250910_105621.mp4
 
 
 def clean_text(raw):
     return ''.join(ch for ch in raw if ch.isalnum()).upper()
 
-def correct_ocr(text):
-    mapping = {'O': '0', 'I': '1', 'L': '1', 'Z': '2', 'S': '5', 'B': '8', 'G': '6'}
-    return ''.join(mapping.get(c, c) for c in text)
-
 def is_valid_indian_plate(s):
     return bool(INDIAN_PLATE_PATTERN.match(s))
 
-def similar(a, b):
-    return SequenceMatcher(None, a, b).ratio()
-
-def find_matching_plate(candidate, plates_info):
-    for plate in plates_info.keys():
-        if candidate in plate or plate in candidate:
-            return plate
-    best, best_score = None, 0.0
-    for plate in plates_info.keys():
-        score = similar(candidate, plate)
-        if score > best_score:
-            best_score = score
-            best = plate
-    return best if best_score >= 0.6 else None
-
-# ----------------- SETUP -----------------
-os.makedirs(PROCESSED_DIR, exist_ok=True)
-model = YOLO(MODEL_PATH)
-with open(CLASS_FILE, 'r') as f:
-    class_list = [line.strip() for line in f.readlines()]
-
-# Initialize CSV
-if not os.path.exists(OUTPUT_FILE) or os.path.getsize(OUTPUT_FILE) == 0:
-    with open(OUTPUT_FILE, 'w', newline='') as f:
-        writer = csv.writer(f)
-        writer.writerow(["NumberPlate", "EntryTime", "ExitTime"])
-
-plates_info = {}
 
-# --
-video_files = [f for f in os.listdir(VIDEO_DIR) if f.lower().endswith(('.mp4', '.avi'))]
-
-for video_file in video_files:
-    VIDEO_PATH = os.path.join(VIDEO_DIR, video_file)
-    print(f"\nProcessing video: {VIDEO_PATH}")
+# ----------------- WORKER SETUP (one model per process) -----------------
+model = None
+class_list = []
+ocr = None
+init_error = None
+
+
+def init_worker(threads=THREADS_PER_WORKER):
+    """
+    Pool initializer: cap this worker's threads and load its own detector and OCR pool.
+    Never raises - Pool would respawn the worker forever - the error fails each video instead.
+    """
+    global model, class_list, ocr, init_error
+    try:
+        cv2.setNumThreads(threads)
+        try:
+            import torch
+            torch.set_num_threads(threads)
+        except ImportError:
+            pass
+        model = load_detector(MODEL_PATH, backend=DETECTOR_BACKEND, imgsz=DETECTOR_IMGSZ, conf=CONF_THRESHOLD,
+                              threads=threads)
+        with open(CLASS_FILE, 'r') as f:
+            class_list = [line.strip() for line in f.readlines()]
+        if PLATE_OCR == "crnn":
+            ocr = CrnnRecognizer(CRNN_MODEL, threads=threads)
+        else:
+            ocr = OcrPool(psm=7, whitelist=PLATE_WHITELIST, workers=1)
+    except Exception as e:
+        init_error = f"worker setup failed: {type(e).__name__}: {e}"
+
+
+# ----------------- VIDEO TIME -----------------
+def clip_start_time(video_path, duration, override=None):
+    """
+    Wall-clock time of a clip's first frame: the configured start, else a
+    YYYYMMDD_HHMMSS stamp in the file name, else the file's mtime minus its duration.
+    """
+    if override:
+        return datetime.strptime(override, "%Y-%m-%d %H:%M:%S")
+    match = NAME_TIME_PATTERN.search(os.path.basename(video_path))
+    if match:
+        try:
+            return datetime.strptime(match.group(1) + match.group(2), "%Y%m%d%H%M%S")
+        except ValueError:
+            pass
+    return datetime.fromtimestamp(os.path.getmtime(video_path)) - timedelta(seconds=duration)
+
+
+def frame_offset(cap, index, fps, last_offset):
+    """Seconds since the clip start for the frame just read: container timestamp, else index / fps."""
+    msec = cap.get(cv2.CAP_PROP_POS_MSEC)
+    if msec > 0 or index == 0:
+        offset = msec / 1000.0
+        if offset >= last_offset:
+            return offset
+    return index / fps if fps > 0 else last_offset
+
+
+# ----------------- ONE VIDEO -----------------
+def process_video(video_path, clip_start=CLIP_START, frame_step=FRAME_STEP):
+    """Detect, read and time plates in one video. Returns a manifest record (never raises)."""
+    video_file = os.path.basename(video_path)
+    st = os.stat(video_path)
+    record = {"video": video_file, "size": st.st_size, "mtime": st.st_mtime,
+              "settings": {"clip_start": clip_start, "frame_step": frame_step}}
+    if init_error is not None:
+        record["error"] = init_error
+        return record
+    try:
+        start = time.time()
+        frames, visits, stats, out_path = _process_video(video_path, clip_start, frame_step)
+        record.update({"frames": frames, "seconds": round(time.time() - start, 2), "output": out_path,
+                       "visits": visits, "stats": stats})
+    except Exception as e:
+        record["error"] = f"{type(e).__name__}: {e}"
+    return record
+
+
+def prepare_ocr_crop(crop):
+    """Upscale small plates and binarise for Tesseract."""
+    if crop.shape[1] < 200:
+        scale = 200 / crop.shape[1]
+        crop = cv2.resize(crop, None, fx=scale, fy=scale, interpolation=cv2.INTER_CUBIC)
+
+    gray = cv2.cvtColor(crop, cv2.COLOR_BGR2GRAY)
+    gray = cv2.bilateralFilter(gray, 11, 17, 17)
+    clahe = cv2.createCLAHE(clipLimit=2.0, tileGridSize=(8,8))
+    gray = clahe.apply(gray)
+    _, thresh = cv2.threshold(gray, 0, 255, cv2.THRESH_BINARY + cv2.THRESH_OTSU)
+    return thresh
+
+
+def _process_video(VIDEO_PATH, clip_start=CLIP_START, frame_step=FRAME_STEP):
+    """
+    decode -> detect -> OCR/track -> encode, one thread per stage with bounded queues
+    in between (video_pipeline.Pipeline), so decoding, inference, Tesseract and encoding overlap.
+    Entry/exit times come from the frame timestamps, so they don't depend on processing speed.
+    """
+    video_file = os.path.basename(VIDEO_PATH)
     cap = cv2.VideoCapture(VIDEO_PATH)
+    if not cap.isOpened():
+        raise IOError(f"could not open {VIDEO_PATH}")
 
     fourcc = cv2.VideoWriter_fourcc(*'mp4v')
     out_path = os.path.join(PROCESSED_DIR, f"processed_{video_file}")
     fps = cap.get(cv2.CAP_PROP_FPS)
     frame_w = int(cap.get(cv2.CAP_PROP_FRAME_WIDTH))
     frame_h = int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT))
-    out = cv2.VideoWriter(out_path, fourcc, fps, (frame_w, frame_h))
-
-    while True:
-        ret, frame = cap.read()
-        if not ret:
-            break
-
-        current_time = datetime.now()
-        current_frame_detected = set()
-        displayed_plate = None
-
-        # ----------------- YOLO DETECTION -----------------
-        results = model.predict(frame, conf=CONF_THRESHOLD, verbose=False)
-        boxes = results[0].boxes
-
-        if boxes is not None and len(boxes) > 0:
-            for box in boxes:
-                x1, y1, x2, y2 = map(int, box.xyxy[0])
-                cls = int(box.cls[0])
-                cls_name = class_list[cls] if cls < len(class_list) else str(cls)
-
-                if cls_name.lower() not in ['license_plate', 'plate']:
-                    continue
-
-                crop = frame[y1:y2, x1:x2]
-                if crop.size == 0:
-                    continue
-
-                if crop.shape[1] < 200:
-                    scale = 200 / crop.shape[1]
-                    crop = cv2.resize(crop, None, fx=scale, fy=scale, interpolation=cv2.INTER_CUBIC)
-
-                gray = cv2.cvtColor(crop, cv2.COLOR_BGR2GRAY)
-                gray = cv2.bilateralFilter(gray, 11, 17, 17)
-                clahe = cv2.createCLAHE(clipLimit=2.0, tileGridSize=(8,8))
-                gray = clahe.apply(gray)
-                _, thresh = cv2.threshold(gray, 0, 255, cv2.THRESH_BINARY + cv2.THRESH_OTSU)
-
-                custom_config = r'--oem 3 --psm 7 -c tessedit_char_whitelist=ABCDEFGHIJKLMNOPQRSTUVWXYZ0123456789'
-                raw_text = pytesseract.image_to_string(thresh, config=custom_config)
-                text = clean_text(raw_text)
-                text = correct_ocr(text)
-                if not text:
-                    continue
+    out = cv2.VideoWriter(out_path, fourcc, fps / frame_step if fps > 0 else fps, (frame_w, frame_h))
+    total_frames = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
+    start_time = clip_start_time(VIDEO_PATH, total_frames / fps if fps > 0 else 0.0, clip_start)
+    tracker = PlateTracker()
+    roi = load_roi(ROI_FILE or os.path.splitext(VIDEO_PATH)[0] + ".txt", rectify=ROI_RECTIFY)
+    plates_info = {}   # plates in view: plate -> {"entry", "last_seen"}
+    visits = []        # finished [plate, entry, exit]
+    matcher = PlateMatcher()   # fuzzy (OCR-confusion aware) lookup over plates_info's keys
+    expiry = ExpiryHeap(timedelta(seconds=EXIT_THRESHOLD))
+    decoder = PlateDecoder()   # position-aware O/0, B/8, ... correction against the plate grammar
+
+    def finish(plate, exit_time):
+        # A finished visit leaves plates_info and the matcher; seeing the plate again opens a new one
+        info = plates_info.pop(plate)
+        matcher.remove(plate)
+        visits.append([plate, format_time(info["entry"]), format_time(exit_time)])
+
+    # ----------------- DECODE (+ frame timestamp) -----------------
+    def decode():
+        index, offset = 0, 0.0
+        while True:
+            if index % frame_step:
+                if not cap.grab():
+                    break
+                index += 1
+                continue
+            ret, frame = cap.read()
+            if not ret:
+                break
+            offset = frame_offset(cap, index, fps, offset)
+            index += 1
+            yield frame, start_time + timedelta(seconds=offset)
+
+    # ----------------- YOLO DETECTION (+ OCR requests) -----------------
+    def detect(item):
+        frame, frame_time = item
+        # Detect on the gate lane only, then map boxes back to full-frame coordinates
+        detections = model(roi.crop(frame) if roi is not None else frame)[0]
+        det_boxes = roi.to_frame(detections.xyxy) if roi is not None else detections.xyxy
+
+        plate_boxes = []
+        for xyxy, cls in zip(det_boxes, detections.cls):
+            cls = int(cls)
+            cls_name = class_list[cls] if cls < len(class_list) else str(cls)
+            if cls_name.lower() in ['license_plate', 'plate']:
+                plate_boxes.append(tuple(map(int, xyxy)))
+
+        # Track, and queue OCR only for new plates / sharper crops; it runs while we detect the next frame
+        tracks = tracker.update(plate_boxes)
+        pending = []
+        for (x1, y1, x2, y2), track in zip(plate_boxes, tracks):
+            crop = frame[y1:y2, x1:x2]
+            if crop.size == 0:
+                continue
+            if tracker.needs_ocr(track, crop):
+                pending.append((track, ocr.submit(crop if PLATE_OCR == "crnn" else prepare_ocr_crop(crop))))
+        return frame, frame_time, plate_boxes, tracks, pending
+
+    # ----------------- OCR RESULTS + ENTRY / EXIT -----------------
+    def read_plates(item):
+        frame, current_time, plate_boxes, tracks, pending = item
+
+        results = [future.result() for _, future in pending]
+        for (track, _), result, (plate, confidence) in zip(pending, results, decoder.decode_batch(results)):
+            # Only near-certain decodes count double; a decode that needed swaps or skips counts once
+            if plate is not None:
+                weight = 2.0 if confidence >= GRAMMAR_VOTE_CONFIDENCE else 1.0
+                tracker.add_reading(track, plate, weight * max(confidence, 0.01))
+            else:
+                tracker.add_reading(track, clean_text(result.text), max(result.confidence, 0.01))
+
+        for (x1, y1, x2, y2), track in zip(plate_boxes, tracks):
+            text = track.text
+            if not text:
+                continue
 
-                matched = find_matching_plate(text, plates_info)
-                if is_valid_indian_plate(text) and matched is None:
-                    canonical = text
-                    plates_info[canonical] = {"entry": current_time, "exit": None,
-                                              "last_seen": current_time, "saved": False}
-                    print(f"[ENTRY] {canonical} at {plates_info[canonical]['entry']}")
-                elif matched:
-                    canonical = matched
-                    plates_info[canonical]["last_seen"] = current_time
-                else:
-                    continue
+            matched = matcher.match(text)
+            if is_valid_indian_plate(text) and matched is None:
+                canonical = text
+                plates_info[canonical] = {"entry": current_time, "last_seen": current_time}
+                matcher.add(canonical)
+                print(f"[ENTRY] {video_file}: {canonical} at {plates_info[canonical]['entry']}")
+            elif matched:
+                canonical = matched
+                plates_info[canonical]["last_seen"] = current_time
+            else:
+                continue
 
-                current_frame_detected.add(canonical)
-                displayed_plate = canonical
+            expiry.touch(canonical, current_time)
 
-                # ----------------- DRAW RECTANGLE + TEXT -----------------
-                cv2.rectangle(frame, (x1, y1), (x2, y2), (0, 255, 0), 2)
-                cv2.putText(frame, canonical, (x1, y1 - 10),
-                            cv2.FONT_HERSHEY_SIMPLEX, 1, (0, 255, 0), 3)
+            # ----------------- DRAW RECTANGLE + TEXT -----------------
+            cv2.rectangle(frame, (x1, y1), (x2, y2), (0, 255, 0), 2)
+            cv2.putText(frame, canonical, (x1, y1 - 10),
+                        cv2.FONT_HERSHEY_SIMPLEX, 1, (0, 255, 0), 3)
 
         # ----------------- CHECK EXIT -----------------
-        now = datetime.now()
-        for plate, info in list(plates_info.items()):
-            if plate in current_frame_detected:
-                continue
-            last_seen = info.get("last_seen", info.get("entry"))
-            if info["exit"] is None:
-                elapsed = (now - last_seen).total_seconds()
-                if elapsed >= EXIT_THRESHOLD:
-                    plates_info[plate]["exit"] = now
-                    print(f"[EXIT] {plate} at {plates_info[plate]['exit']}")
-                    if not plates_info[plate].get("saved", False):
-                        with open(OUTPUT_FILE, 'a', newline='') as f:
-                            writer = csv.writer(f)
-                            writer.writerow([plate, plates_info[plate]['entry'], plates_info[plate]['exit']])
-                        plates_info[plate]["saved"] = True
-
+        # Only plates whose last sighting is EXIT_THRESHOLD old come off the heap, so this
+        # costs O(expired log n) per frame however many plates the video has seen
+        for plate, _ in expiry.expired(current_time):
+            finish(plate, current_time)
+            print(f"[EXIT] {video_file}: {plate} at {current_time}")
+        return frame
+
+    # ----------------- ENCODE -----------------
+    def encode(frame):
         out.write(frame)
 
-    cap.release()
-    out.release()
-    print(f"Processed video saved to: {out_path}")
-
-print("\nAll videos processed. Data saved to:", OUTPUT_FILE)
- 
\ No newline at end of file
+    pipeline = Pipeline(decode(), [("detect", detect), ("ocr", read_plates), ("encode", encode)])
+    try:
+        stats = pipeline.run()
+    finally:
+        cap.release()
+        out.release()
+    print(format_stats(stats).replace("[INFO] Pipeline", f"[INFO] {video_file}"))
+    decoded = decoder.stats()
+    print(f"[INFO] {video_file}: plate grammar recovered {decoded['recovered']} readings "
+          f"the global O/0 mapping would reject ({decoded['recovered_per_call']} per OCR call)")
+
+    # Plates still in view when the clip ends leave at their last sighting
+    for plate, last_seen in expiry.drain():
+        finish(plate, last_seen)
+    visits.sort(key=lambda v: (v[1], v[0]))
+    return stats["items"], visits, {"tracker": tracker.stats(), "matcher": matcher.stats(),
+                                    "decoder": decoded, "pipeline": stats}, out_path
+
+
+# ----------------- RESUME + DETERMINISTIC MERGE -----------------
+def load_manifest(path):
+    """video file name -> latest successful record."""
+    records = {}
+    if os.path.exists(path):
+        with open(path, encoding="utf-8") as f:
+            for line in f:
+                try:
+                    rec = json.loads(line)
+                except ValueError:
+                    continue  # torn last line after a crash
+                if "error" not in rec:
+                    records[rec["video"]] = rec
+    return records
+
+
+def is_done(record, video_path, settings):
+    if record is None:
+        return False
+    st = os.stat(video_path)
+    return (record["size"] == st.st_size and record["mtime"] == st.st_mtime
+            and record.get("settings") == settings)
+
+
+def append_manifest(path, record):
+    with open(path, "a", encoding="utf-8") as f:
+        f.write(json.dumps(record) + "\n")
+        f.flush()
+        os.fsync(f.fileno())
+
+
+def merge_results(records, store, csv_path):
+    """
+    Write every finished video's visits to the plate store (once per video version, settings
+    and result; a new one replaces the video's old rows) and rebuild the merged CSV. Both are
+    ordered by video name, then entry time, so the result doesn't depend on which worker
+    finished first.
+    """
+    added = 0
+    rows = []
+    for rec in sorted(records, key=lambda r: r["video"]):
+        # A rerun with other settings (or --restart with changed results) replaces the video's rows
+        scope = f"main1:{rec['video']}:"
+        settings = json.dumps(rec.get("settings"), sort_keys=True)
+        digest = zlib.crc32(json.dumps(rec["visits"]).encode())
+        key = f"{scope}{rec['size']}:{rec['mtime']}:{settings}:{digest:08x}"
+        added += store.import_visits(key, rec["visits"], location=rec["video"], source="main1", replaces=scope)
+        rows.extend([rec["video"]] + visit for visit in rec["visits"])
+
+    tmp = csv_path + ".tmp"
+    with open(tmp, "w", newline="", encoding="utf-8") as f:
+        writer = csv.writer(f)
+        writer.writerow(["video", "plate_number", "entry_time", "exit_time"])
+        writer.writerows(rows)
+    os.replace(tmp, csv_path)
+    return added, len(rows)
+
+
+def format_eta(seconds):
+    m, s = divmod(int(seconds), 60)
+    h, m = divmod(m, 60)
+    return f"{h}h{m:02d}m" if h else f"{m}m{s:02d}s"
+
+
+# ----------------- BATCH ENGINE -----------------
+def main():
+    ap = argparse.ArgumentParser(description="Detect and log number plates in every video of a folder")
+    ap.add_argument("--video-dir", default=VIDEO_DIR)
+    ap.add_argument("--workers", type=int, default=WORKERS, help="Videos processed in parallel")
+    ap.add_argument("--threads", type=int, default=THREADS_PER_WORKER, help="Threads per worker")
+    ap.add_argument("--restart", action="store_true", help="Ignore the manifest and process every video again")
+    ap.add_argument("--clip-start", default=CLIP_START,
+                    help='Wall-clock time of the first frame, "YYYY-mm-dd HH:MM:SS" (default: from the file name)')
+    ap.add_argument("--frame-step", type=int, default=FRAME_STEP, help="Process every Nth frame")
+    args = ap.parse_args()
+
+    os.makedirs(PROCESSED_DIR, exist_ok=True)
+    manifest_path = os.path.join(PROCESSED_DIR, MANIFEST_FILE)
+    if args.restart and os.path.exists(manifest_path):
+        os.remove(manifest_path)
+    done = load_manifest(manifest_path)
+
+    videos = sorted(os.path.join(args.video_dir, f) for f in os.listdir(args.video_dir)
+                    if f.lower().endswith(VIDEO_EXTS))
+    settings = {"clip_start": args.clip_start, "frame_step": args.frame_step}
+    todo = [v for v in videos if not is_done(done.get(os.path.basename(v)), v, settings)]
+    print(f"[INFO] {len(videos)} videos, {len(videos) - len(todo)} already done, {len(todo)} to process "
+          f"with {args.workers} workers x {args.threads} threads")
+
+    # Children inherit this before any of them loads a runtime
+    os.environ["OMP_NUM_THREADS"] = str(args.threads)
+
+    # Export the ONNX model once here, so the workers don't all export it at the same time
+    if todo and resolve_backend(DETECTOR_BACKEND) != "torch":
+        try:
+            export_onnx(MODEL_PATH)
+        except Exception as e:
+            print(f"[ERROR] Could not prepare {MODEL_PATH}: {type(e).__name__}: {e}")
+            return 1
+
+    start = time.time()
+    total_frames = 0
+    failed = 0
+    if todo:
+        with Pool(args.workers, initializer=init_worker, initargs=(args.threads,)) as pool:
+            work = partial(process_video, clip_start=args.clip_start, frame_step=args.frame_step)
+            for i, rec in enumerate(pool.imap_unordered(work, todo), 1):
+                elapsed = time.time() - start
+                if "error" in rec:
+                    failed += 1
+                    print(f"[ERROR] [{i}/{len(todo)}] {rec['video']}: {rec['error']}")
+                    continue
+                append_manifest(manifest_path, rec)
+                done[rec["video"]] = rec
+                total_frames += rec["frames"]
+                eta = elapsed / i * (len(todo) - i)
+                print(f"[INFO] [{i}/{len(todo)}] {rec['video']}: {rec['frames']} frames in {rec['seconds']:.1f}s "
+                      f"({rec['frames'] / max(rec['seconds'], 1e-6):.1f} fps), {len(rec['visits'])} plates | "
+                      f"total {total_frames / max(elapsed, 1e-6):.1f} fps, ETA {format_eta(eta)}")
+
+    plate_store = PlateStore(DB_PATH)
+    current = [done[os.path.basename(v)] for v in videos if os.path.basename(v) in done]
+    added, rows = merge_results(current, plate_store, os.path.join(PROCESSED_DIR, MERGED_CSV))
+    plate_store.close()
+
+    elapsed = time.time() - start
+    print(f"\n[INFO] Processed {len(todo) - failed}/{len(todo)} videos ({failed} failed), "
+          f"{total_frames} frames in {format_eta(elapsed)} ({total_frames / max(elapsed, 1e-6):.1f} fps)")
+    print(f"[INFO] {added} new visits saved to {DB_PATH}; {rows} visits in {MERGED_CSV}")
+
+
+if __name__ == "__main__":
+    freeze_support()
+    raise SystemExit(main())
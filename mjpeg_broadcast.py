@@ -0,0 +1,106 @@
+import threading
+import time
+import cv2
+
+# --------------------------
+# ENCODE-ONCE MJPEG FAN-OUT
+# --------------------------
+# One broadcaster per road reads the newest frame from its FrameRing, encodes it
+# once for every (quality, width) variant that currently has viewers, and wakes
+# all subscribers. Subscribers always jump to the newest encoded frame, so a slow
+# client simply skips frames instead of holding anybody else back.
+
+DEFAULT_QUALITY = 80
+BOUNDARY = b'--frame\r\nContent-Type: image/jpeg\r\n\r\n'
+
+
+class MjpegBroadcaster:
+    def __init__(self, ring, poll_interval=0.01):
+        self.ring = ring
+        self.poll_interval = poll_interval
+        self._cond = threading.Condition()
+        self._subscribers = {}  # (quality, width) -> number of connected clients
+        self._encoded = {}      # (quality, width) -> (seq, jpeg bytes)
+        self._thread = None
+        self._running = False
+        self.frames_encoded = 0
+
+    def stream(self, quality=DEFAULT_QUALITY, width=None):
+        """Generator of multipart MJPEG chunks for one HTTP client."""
+        key = (quality, width)
+        with self._cond:
+            self._subscribers[key] = self._subscribers.get(key, 0) + 1
+            self._ensure_thread()
+        last_seq = 0
+        try:
+            while True:
+                with self._cond:
+                    self._cond.wait_for(
+                        lambda: not self._running or self._encoded.get(key, (0, None))[0] > last_seq,
+                        timeout=1.0)
+                    if not self._running:
+                        return
+                    seq, jpeg = self._encoded.get(key, (0, None))
+                if seq <= last_seq:
+                    continue
+                last_seq = seq
+                yield BOUNDARY + jpeg + b'\r\n'
+        finally:
+            with self._cond:
+                self._subscribers[key] -= 1
+                if self._subscribers[key] == 0:
+                    del self._subscribers[key]
+                    self._encoded.pop(key, None)
+
+    def stop(self):
+        """Stop the encoder thread and release every subscriber."""
+        with self._cond:
+            self._running = False
+            self._cond.notify_all()
+        if self._thread is not None:
+            self._thread.join(timeout=1.0)
+            self._thread = None
+
+    def _ensure_thread(self):
+        if self._thread is None or not self._thread.is_alive():
+            self._running = True
+            self._thread = threading.Thread(target=self._encode_loop, daemon=True)
+            self._thread.start()
+
+    def _encode_loop(self):
+        last_seq = 0
+        while self._running:
+            with self._cond:
+                variants = list(self._subscribers.keys())
+            if not variants:
+                # Nobody is watching; let the thread exit until the next subscriber
+                with self._cond:
+                    if not self._subscribers:
+                        self._thread = None
+                        return
+                continue
+
+            seq, frame = self.ring.latest(last_seq, copy=False)
+            if frame is None:
+                time.sleep(self.poll_interval)
+                continue
+
+            encoded = {}
+            for quality, width in variants:
+                img = frame
+                if width and width < frame.shape[1]:
+                    height = int(frame.shape[0] * width / frame.shape[1])
+                    img = cv2.resize(frame, (width, height), interpolation=cv2.INTER_AREA)
+                ret, buffer = cv2.imencode('.jpg', img, [int(cv2.IMWRITE_JPEG_QUALITY), quality])
+                if ret:
+                    encoded[(quality, width)] = (seq, buffer.tobytes())
+
+            # Producer lapped the ring while we were encoding from the shared view
+            if not self.ring.still_valid(seq):
+                continue
+
+            last_seq = seq
+            self.frames_encoded += 1
+            with self._cond:
+                self._encoded.update(encoded)
+                self._cond.notify_all()
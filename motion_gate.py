@@ -0,0 +1,114 @@
+import cv2
+import numpy as np
+
+# --------------------------
+# MOTION GATE IN FRONT OF THE DETECTOR
+# --------------------------
+# Gate cameras show an empty road most of the time. Before running YOLO, the
+# frame is shrunk to SCALE_WIDTH pixels wide, greyed, blurred and compared with
+# the last frame the detector actually saw ("diff"), or fed to a MOG2
+# background model ("mog2"). If fewer than `threshold` of the pixels changed
+# by more than `pixel_delta` grey levels, the detector is skipped and the
+# previous result is reused.
+#
+# Comparing against the last *processed* frame (not the previous one) means
+# slow changes still add up and trigger eventually. A full detection is forced
+# every `max_skip` frames anyway, so a reused result never gets too old.
+
+SCALE_WIDTH = 160
+PIXEL_DELTA = 25         # grey levels a pixel must change by to count as moving
+THRESHOLD = 0.005        # fraction of moving pixels that wakes the detector
+MAX_SKIP = 150           # force a detection after this many skipped frames (0 = never)
+BLUR = 5
+
+SENSITIVITY = {          # presets: (threshold, pixel_delta)
+    "high": (0.002, 15),
+    "medium": (THRESHOLD, PIXEL_DELTA),
+    "low": (0.02, 35),
+}
+
+
+class MotionGate:
+    def __init__(self, threshold=THRESHOLD, pixel_delta=PIXEL_DELTA, method="diff",
+                 max_skip=MAX_SKIP, scale_width=SCALE_WIDTH, sensitivity=None):
+        if sensitivity is not None:
+            threshold, pixel_delta = SENSITIVITY[sensitivity]
+        self.threshold = threshold
+        self.pixel_delta = pixel_delta
+        self.method = method
+        self.max_skip = max_skip
+        self.scale_width = scale_width
+        self._reference = None
+        self._since_processed = 0
+        self._last_result = None
+        self._has_result = False
+        self._subtractor = None
+        if method == "mog2":
+            self._subtractor = cv2.createBackgroundSubtractorMOG2(history=500, varThreshold=pixel_delta,
+                                                                  detectShadows=False)
+
+        # Counters
+        self.processed = 0
+        self.skipped = 0
+        self.last_motion = 0.0   # fraction of moving pixels in the last checked frame
+
+    def _small(self, frame):
+        h, w = frame.shape[:2]
+        scale = self.scale_width / float(w)
+        small = cv2.resize(frame, (self.scale_width, max(1, int(h * scale))), interpolation=cv2.INTER_AREA)
+        if small.ndim == 3:
+            small = cv2.cvtColor(small, cv2.COLOR_BGR2GRAY)
+        return cv2.GaussianBlur(small, (BLUR, BLUR), 0)
+
+    def check(self, frame):
+        """True if the detector should run on this frame (and counts it as processed/skipped)."""
+        small = self._small(frame)
+        if self._subtractor is not None:
+            fg = self._subtractor.apply(small)
+            self.last_motion = np.count_nonzero(fg) / float(fg.size)
+        elif self._reference is None or self._reference.shape != small.shape:
+            self.last_motion = 1.0
+        else:
+            diff = cv2.absdiff(small, self._reference)
+            self.last_motion = np.count_nonzero(diff > self.pixel_delta) / float(diff.size)
+
+        run = (not self._has_result or self.last_motion >= self.threshold
+               or (self.max_skip and self._since_processed >= self.max_skip))
+        if run:
+            self._reference = small
+            self._since_processed = 0
+            self.processed += 1
+        else:
+            self._since_processed += 1
+            self.skipped += 1
+        return run
+
+    def update(self, result):
+        """Remember the detector's result for frames that get skipped."""
+        self._last_result = result
+        self._has_result = True
+
+    @property
+    def last_result(self):
+        return self._last_result
+
+    def process(self, frame, detect):
+        """detect(frame) when something moved, otherwise the previous result."""
+        if self.check(frame):
+            self.update(detect(frame))
+        return self._last_result
+
+    def reset(self):
+        self._reference = None
+        self._last_result = None
+        self._has_result = False
+        self._since_processed = 0
+
+    def stats(self):
+        total = self.processed + self.skipped
+        return {
+            "processed": self.processed,
+            "skipped": self.skipped,
+            "skip_rate": round(self.skipped / total, 3) if total else 0.0,
+            "motion": round(float(self.last_motion), 4),
+        }
@@ -1,15 +1,24 @@
 import cv2
 import pytesseract
-import pandas as pd
 import numpy as np
 import os
 import re
-from datetime import datetime
+import atexit
+import time
+from plate_store import PlateStore
+from ocr_pool import get_pool
+from roi import load_roi
+from fast_cascade import FastPlateCascade
 
 # --------------------------
 # CONFIGURATION
 # --------------------------
-CSV_PATH = "plate_log.csv"
+DB_PATH = "plate_events.db"
+ROI_FILE = None  # gate-lane points from setplatearea.py (e.g. "gate1.txt"); None = whole frame
+ROI_RECTIFY = False  # warp the lane quadrilateral upright instead of cropping its bounding box
+FAST_CASCADE = False  # True = downscaled scan + search near last hits (fast_cascade.py); default full scan every frame
+RESCAN_EVERY = 10  # frames between full scans in fast mode
+MIN_PLATE_WIDTH = 100  # px; fast mode ignores narrower plates
 pytesseract.pytesseract.tesseract_cmd = r"C:/Program Files/Tesseract-OCR/tesseract.exe"
 
 # Load Haar cascade for number plate detection
@@ -20,11 +29,13 @@ if plate_cascade.empty():
     print("[ERROR] Haar cascade not found! Check your OpenCV installation.")
     exit()
 
-# Create CSV if not exists or empty
-if not os.path.exists(CSV_PATH) or os.stat(CSV_PATH).st_size == 0:
-    df = pd.DataFrame(columns=["Plate Number", "Entry Time", "Exit Time", "Location"])
-    df.to_csv(CSV_PATH, index=False)
-    print("[INFO] Created new CSV file with headers.")
+# Shared plate event store (batched writes, flushed on exit)
+plate_store = PlateStore(DB_PATH)
+atexit.register(plate_store.close)
+
+plate_roi = load_roi(ROI_FILE, rectify=ROI_RECTIFY)
+plate_finder = (FastPlateCascade(plate_cascade, rescan_every=RESCAN_EVERY, min_plate_width=MIN_PLATE_WIDTH)
+                if FAST_CASCADE else None)
 
 
 # --------------------------
@@ -51,12 +62,20 @@ def looks_like_plate(text):
 
 def detect_number_plate(frame):
     """Detect number plates using Haar Cascade and OCR validation."""
-    gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
-    plates = plate_cascade.detectMultiScale(
-        gray, scaleFactor=1.1, minNeighbors=5, minSize=(50, 20)
-    )
-
-    detected_plates = []
+    # Scan the gate lane only, then map boxes back to full-frame coordinates
+    search = plate_roi.crop(frame) if plate_roi is not None else frame
+    gray = cv2.cvtColor(search, cv2.COLOR_BGR2GRAY)
+    if plate_finder is not None:
+        plates = plate_finder.detect(gray)
+    else:
+        plates = plate_cascade.detectMultiScale(
+            gray, scaleFactor=1.1, minNeighbors=5, minSize=(50, 20)
+        )
+    if plate_roi is not None and len(plates):
+        xyxy = plate_roi.to_frame([(x, y, x + w, y + h) for (x, y, w, h) in plates]).astype(int)
+        plates = [(x1, y1, x2 - x1, y2 - y1) for x1, y1, x2, y2 in xyxy if x2 > x1 and y2 > y1]
+
+    crops = []
     for (x, y, w, h) in plates:
         # Crop region of interest
         plate_img = frame[y:y + h, x:x + w]
@@ -65,10 +84,14 @@ def detect_number_plate(frame):
         gray_plate = cv2.cvtColor(plate_img, cv2.COLOR_BGR2GRAY)
         gray_plate = cv2.bilateralFilter(gray_plate, 11, 17, 17)
         _, thresh = cv2.threshold(gray_plate, 120, 255, cv2.THRESH_BINARY)
+        crops.append(thresh)
 
-        # Run OCR
-        text = pytesseract.image_to_string(thresh, config='--oem 3 --psm 7')
-        text = normalize_text(text)
+    # Run OCR for all plates of this frame on the persistent worker pool
+    results = get_pool(psm=7).recognize_batch(crops) if crops else []
+
+    detected_plates = []
+    for (x, y, w, h), result in zip(plates, results):
+        text = normalize_text(result.text)
 
         # Only accept boxes with realistic plate-like text
         if looks_like_plate(text):
@@ -77,43 +100,14 @@ def detect_number_plate(frame):
     return detected_plates
 
 
-def log_or_update_csv(plate_number, location="Camera-1"):
-    """Log new plate immediately or update its exit time if it exists."""
-    now = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+def log_plate_sighting(plate_number, location="Camera-1"):
+    """Log a new plate or extend its current visit in the plate store."""
     plate_number = plate_number.upper()
 
     if not looks_like_plate(plate_number):
         return  # skip invalid readings
 
-    # Ensure CSV exists and has headers
-    if not os.path.exists(CSV_PATH) or os.stat(CSV_PATH).st_size == 0:
-        df = pd.DataFrame(columns=["Plate Number", "Entry Time", "Exit Time", "Location"])
-        df.to_csv(CSV_PATH, index=False)
-    else:
-        try:
-            df = pd.read_csv(CSV_PATH)
-        except pd.errors.EmptyDataError:
-            df = pd.DataFrame(columns=["Plate Number", "Entry Time", "Exit Time", "Location"])
-            df.to_csv(CSV_PATH, index=False)
-
-    # Add or update record
-    if plate_number not in df["Plate Number"].values:
-        # New plate → add a new row
-        new_row = pd.DataFrame([{
-            "Plate Number": plate_number,
-            "Entry Time": now,
-            "Exit Time": now,
-            "Location": location
-        }])
-        df = pd.concat([df, new_row], ignore_index=True)
-        print(f"[INFO] New Entry logged: {plate_number} at {now}")
-    else:
-        # Existing plate → update exit time
-        df.loc[df["Plate Number"] == plate_number, "Exit Time"] = now
-        print(f"[INFO] Exit time updated: {plate_number} at {now}")
-
-    # Save CSV back to disk
-    df.to_csv(CSV_PATH, index=False)
+    plate_store.log_sighting(plate_number, location, source="plate_captures")
 
 
 # --------------------------
@@ -141,10 +135,12 @@ if __name__ == "__main__":
 
     print("\n[INFO] Detecting plates... Press 'q' to quit.\n")
 
+    frames, start = 0, time.perf_counter()
     while True:
         ret, frame = cap.read()
         if not ret:
             break
+        frames += 1
 
         detected_plates = detect_number_plate(frame)
 
@@ -152,11 +148,15 @@ if __name__ == "__main__":
             cv2.rectangle(frame, (x, y), (x + w, y + h), (0, 255, 0), 3)
             cv2.putText(frame, plate_text, (x, y - 10),
                         cv2.FONT_HERSHEY_SIMPLEX, 1, (0, 255, 0), 3)
-            log_or_update_csv(plate_text, location)
+            log_plate_sighting(plate_text, location)
 
         cv2.imshow("Vehicle Number Plate Detection", cv2.resize(frame, (1280, 720)))
         if cv2.waitKey(1) & 0xFF == ord('q'):
             break
 
     cap.release()
+    elapsed = time.perf_counter() - start
+    print(f"[INFO] {frames} frames at {frames / elapsed if elapsed else 0.0:.1f} fps")
+    if plate_finder is not None:
+        print(f"[INFO] Fast cascade: {plate_finder.stats()}")
     cv2.destroyAllWindows()
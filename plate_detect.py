@@ -1,12 +1,13 @@
 import cv2
 import numpy as np
-import pytesseract
 import imutils
 import argparse
 import csv
 from datetime import datetime
+from ocr_pool import get_pool, PLATE_WHITELIST
 
-# Uncomment if Tesseract is not in PATH:
+# Uncomment if Tesseract is not in PATH (ocr_pool picks up pytesseract's tesseract_cmd):
+# import pytesseract
 # pytesseract.pytesseract.tesseract_cmd = r'C:\Program Files\Tesseract-OCR\tesseract.exe'
 
 def preprocess_image(image):
@@ -89,10 +90,9 @@ def recognize_number(roi):
     gray = cv2.bilateralFilter(gray, 9, 75, 75)
     _, binary = cv2.threshold(gray, 0, 255, cv2.THRESH_BINARY + cv2.THRESH_OTSU)
 
-    config = "--psm 6 -c tessedit_char_whitelist=0123456789ABCDEFGHIJKLMNOPQRSTUVWXYZ"
-    text = pytesseract.image_to_string(binary, config=config)
-    text = ''.join(filter(str.isalnum, text))
-    confidence = 0.9 if len(text) > 2 else 0.5
+    result = get_pool(psm=6, whitelist=PLATE_WHITELIST).recognize(binary)
+    text = ''.join(filter(str.isalnum, result.text))
+    confidence = result.confidence
     return text, confidence
 
 def log_result(filename, text, confidence, log_path):
@@ -0,0 +1,65 @@
+import heapq
+import itertools
+
+# --------------------------
+# LAST-SEEN EXPIRY HEAP
+# --------------------------
+# Finds plates that have not been seen for `timeout` without walking every
+# plate on every frame. Each sighting pushes (last_seen, plate) onto a min-heap;
+# older entries for the same plate stay in the heap and are skipped when they
+# surface (lazy deletion). expired(now) only pops entries that are due, so a
+# frame costs O(expired log n) instead of O(plates ever seen). The heap is
+# rebuilt from the live entries when stale ones outnumber them, which keeps
+# memory proportional to the plates currently in view.
+
+COMPACT_MIN = 1024
+
+
+class ExpiryHeap:
+    def __init__(self, timeout):
+        """timeout: anything that can be added to a last_seen value (seconds, timedelta)."""
+        self.timeout = timeout
+        self._heap = []
+        self._last_seen = {}
+        self._order = itertools.count()   # tie-break so plates themselves are never compared
+
+    def __len__(self):
+        return len(self._last_seen)
+
+    def __contains__(self, plate):
+        return plate in self._last_seen
+
+    def touch(self, plate, last_seen):
+        """Record a sighting; a plate's deadline only ever moves forward."""
+        current = self._last_seen.get(plate)
+        if current is not None and last_seen <= current:
+            return
+        self._last_seen[plate] = last_seen
+        heapq.heappush(self._heap, (last_seen, next(self._order), plate))
+        if len(self._heap) > max(COMPACT_MIN, 2 * len(self._last_seen)):
+            self._compact()
+
+    def discard(self, plate):
+        self._last_seen.pop(plate, None)
+
+    def expired(self, now):
+        """Remove and return [(plate, last_seen)] for plates not seen since now - timeout, oldest first."""
+        out = []
+        heap = self._heap
+        while heap and heap[0][0] + self.timeout <= now:
+            last_seen, _, plate = heapq.heappop(heap)
+            if self._last_seen.get(plate) == last_seen:
+                del self._last_seen[plate]
+                out.append((plate, last_seen))
+        return out
+
+    def drain(self):
+        """Remove and return every remaining plate, oldest sighting first (e.g. at end of stream)."""
+        out = sorted(self._last_seen.items(), key=lambda item: item[1])
+        self._heap.clear()
+        self._last_seen.clear()
+        return out
+
+    def _compact(self):
+        self._heap = [(t, next(self._order), p) for p, t in self._last_seen.items()]
+        heapq.heapify(self._heap)
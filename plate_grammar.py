@@ -0,0 +1,274 @@
+import math
+import re
+import numpy as np
+
+# --------------------------
+# INDIAN PLATE GRAMMAR DECODER
+# --------------------------
+# A plate is 2 letters (state), 1-2 digits (district), 1-2 letters (series)
+# and 4 digits. Applying one global mapping (O->0, S->5, B->8, ...) to the
+# whole reading turns real letters in the state/series positions into digits,
+# so e.g. "MH12SB1234" can never become valid. The decoder instead aligns the
+# OCR characters to each of the four layouts (LLDLDDDD ... LLDDLLDDDD) with a
+# DP and keeps the best-scoring one. The first two slots must be a known
+# state code (STATE_CODES), read from two adjacent characters:
+#
+#   emit  - a character fills a slot with the log-probability of its best
+#           candidate of that slot's class (Tesseract's choice or one of its
+#           per-character alternatives); if only the other class was read, a
+#           look-alike (O<->0, B<->8, ...) is used at CONFUSION_PENALTY
+#   skip  - a stray character before the state code ("IND" strip, border
+#           read as "1") is dropped at LEAD_SKIP_PENALTY; any other one at
+#           SKIP_PENALTY, and at most MAX_SKIPS of those
+#
+# The confidence is exp(penalties) times the geometric mean of the emitted
+# characters' probabilities, so every look-alike swap and skip costs its full
+# penalty however long the plate is. A truncated reading that only fits the
+# grammar through a swap ("MH12AB123" -> "MH12A8123") stays near the
+# threshold instead of looking certain.
+#
+# Readings are decoded in batches: the DP runs over all of them at once with
+# NumPy, only the backtrack is per reading.
+
+PLATE_PATTERN = re.compile(r'^[A-Z]{2}[0-9]{1,2}[A-Z]{1,2}[0-9]{4}$')
+STATE_CODES = ["AN", "AP", "AR", "AS", "BR", "CG", "CH", "DD", "DL", "DN", "GA", "GJ", "HP", "HR", "JH", "JK",
+               "KA", "KL", "LA", "LD", "MH", "ML", "MN", "MP", "MZ", "NL", "OD", "OR", "PB", "PY", "RJ", "SK",
+               "TN", "TR", "TS", "UK", "UP", "WB"]
+LAYOUTS = ["LLDLDDDD", "LLDDLDDDD", "LLDLLDDDD", "LLDDLLDDDD"]
+
+LOOKALIKES = {
+    'O': '0', 'D': '0', 'Q': '0', 'I': '1', 'L': '1', 'Z': '2', 'S': '5', 'B': '8', 'G': '6', 'T': '7', 'A': '4',
+    '0': 'O', '1': 'I', '2': 'Z', '5': 'S', '8': 'B', '6': 'G', '7': 'T', '4': 'A',
+}
+CONFUSION_PENALTY = math.log(0.4)
+SKIP_PENALTY = math.log(0.05)
+LEAD_SKIP_PENALTY = math.log(0.8)
+MAX_SKIPS = 1            # skips after the first plate character; leading skips are not capped
+MIN_PROB = 0.01          # floor for a candidate's probability
+MIN_CONFIDENCE = 0.3     # decodes below this are rejected
+
+# The global mapping main1.py used before; kept to measure what the decoder recovers
+LEGACY_MAPPING = {'O': '0', 'I': '1', 'L': '1', 'Z': '2', 'S': '5', 'B': '8', 'G': '6'}
+
+
+def legacy_correct(text):
+    text = ''.join(ch for ch in text if ch.isalnum()).upper()
+    return ''.join(LEGACY_MAPPING.get(c, c) for c in text)
+
+
+def _observations(reading):
+    """OcrResult (or plain string) -> [[(char, prob), ...] per alphanumeric character]."""
+    if isinstance(reading, str):
+        return [[(ch, 1.0)] for ch in reading.upper() if ch.isalnum()]
+    # Lines from the tesseract CLI (char_level False) carry their word's confidence on every
+    # character and no alternatives; the geometric mean over the slots is then the word's
+    obs = []
+    for line in reading.lines:
+        for ch, conf, alternatives in line.chars:
+            cands = [(ch, conf)] + list(alternatives)
+            cands = [(c.upper(), max(float(p) / 100.0, MIN_PROB)) for c, p in cands if c and c.isalnum()]
+            if cands:
+                obs.append(cands)
+    return obs
+
+
+def _emissions(obs):
+    """Best (score, char, swapped) for a letter slot and for a digit slot."""
+    best = {"L": (-math.inf, "", False), "D": (-math.inf, "", False)}
+    for ch, p in obs:
+        score = math.log(min(p, 1.0))
+        cls = "D" if ch.isdigit() else "L"
+        if score > best[cls][0]:
+            best[cls] = (score, ch, False)
+        other = LOOKALIKES.get(ch)
+        if other is not None:
+            ocls = "D" if other.isdigit() else "L"
+            if score + CONFUSION_PENALTY > best[ocls][0]:
+                best[ocls] = (score + CONFUSION_PENALTY, other, True)
+    return best
+
+
+def _letter_scores(obs, out, swapped):
+    """Fill out[26] with each letter's score (read directly or as a look-alike) and swapped[26]."""
+    for ch, p in obs:
+        score = math.log(min(p, 1.0))
+        letter, penalty = (ch, 0.0) if ch.isalpha() else (LOOKALIKES.get(ch), CONFUSION_PENALTY)
+        if letter is not None and letter.isalpha():
+            k = ord(letter) - 65
+            if score + penalty > out[k]:
+                out[k] = score + penalty
+                swapped[k] = penalty != 0.0
+
+
+class PlateDecoder:
+    def __init__(self, layouts=LAYOUTS, min_confidence=MIN_CONFIDENCE, max_skips=MAX_SKIPS, states=STATE_CODES):
+        self.layouts = layouts
+        self.min_confidence = min_confidence
+        self.max_skips = max_skips
+        self.states = sorted(states)
+        self._state_idx = (np.array([ord(s[0]) - 65 for s in self.states]),
+                           np.array([ord(s[1]) - 65 for s in self.states]))
+        self._letter_masks = [np.array([c == "L" for c in layout[2:]]) for layout in layouts]
+
+        # Stats
+        self.readings = 0
+        self.decoded = 0
+        self.recovered = 0       # valid now, but not with the legacy global mapping
+
+    def decode(self, reading):
+        return self.decode_batch([reading])[0]
+
+    def decode_batch(self, readings):
+        """[OcrResult or str] -> [(plate, confidence) or (None, 0.0)]."""
+        if not readings:
+            return []
+        observations = [_observations(r) for r in readings]
+        b, n = len(readings), max(2, max(len(o) for o in observations))
+
+        emit_l = np.full((b, n), -np.inf)
+        emit_d = np.full((b, n), -np.inf)
+        letter = np.full((b, n, 26), -np.inf)
+        letter_swapped = np.zeros((b, n, 26), dtype=bool)
+        pad = np.ones((b, n), dtype=bool)            # padding is skipped for free and not counted
+        chars_l = [[None] * n for _ in range(b)]     # (char, swapped)
+        chars_d = [[None] * n for _ in range(b)]
+        for bi, obs in enumerate(observations):
+            for i, cands in enumerate(obs):
+                best = _emissions(cands)
+                emit_l[bi, i], *chars_l[bi][i] = best["L"]
+                emit_d[bi, i], *chars_d[bi][i] = best["D"]
+                _letter_scores(cands, letter[bi, i], letter_swapped[bi, i])
+                pad[bi, i] = False
+        skip = np.where(pad, 0.0, SKIP_PENALTY)
+
+        # state[b, i]: best known state code read from characters i-1 and i, after i-1 leading skips
+        first, second = self._state_idx
+        pairs = letter[:, :-1, first] + letter[:, 1:, second]                  # (b, n-1, states)
+        state_pick = pairs.argmax(axis=2)
+        state = np.full((b, n), -np.inf)
+        state[:, 1:] = np.take_along_axis(pairs, state_pick[..., None], axis=2)[..., 0]
+        state[:, 1:] += np.arange(n - 1) * LEAD_SKIP_PENALTY
+
+        # After the state code: score[b, k, j] = best log-score with j more slots filled and k skips
+        k_max = self.max_skips
+        best_score = np.full(b, -np.inf)
+        best_plate = [None] * b
+        for layout, letters in zip(self.layouts, self._letter_masks):
+            m = len(letters)
+            score = np.full((b, k_max + 1, m + 1), -np.inf)
+            took = np.zeros((b, n, k_max + 1, m), dtype=bool)
+            started = np.zeros((b, n), dtype=bool)
+            for i in range(n):
+                inner = score + skip[:, i, None, None]
+                stay = np.full_like(score, -np.inf)
+                stay[:, 1:] = inner[:, :-1]
+                stay[pad[:, i]] = inner[pad[:, i]]
+                take = score[:, :, :-1] + np.where(letters, emit_l[:, i, None, None], emit_d[:, i, None, None])
+                took[:, i] = take > stay[:, :, 1:]
+                stay[:, :, 1:] = np.maximum(stay[:, :, 1:], take)
+                started[:, i] = state[:, i] > stay[:, 0, 0]
+                stay[:, 0, 0] = np.maximum(stay[:, 0, 0], state[:, i])
+                score = stay
+
+            k_best = score[:, :, m].argmax(axis=1)
+            final = score[np.arange(b), k_best, m]
+            for bi in np.nonzero(final > best_score)[0]:
+                out, j, k, penalty = [], m, k_best[bi], 0.0
+                for i in range(n - 1, -1, -1):
+                    if j > 0 and took[bi, i, k, j - 1]:
+                        j -= 1
+                        ch, swapped = chars_l[bi][i] if letters[j] else chars_d[bi][i]
+                        out.append(ch)
+                        penalty += CONFUSION_PENALTY if swapped else 0.0
+                    elif j == 0 and k == 0 and started[bi, i]:
+                        code = self.states[state_pick[bi, i - 1]]
+                        out.append(code)
+                        penalty += (i - 1) * LEAD_SKIP_PENALTY
+                        penalty += CONFUSION_PENALTY * (letter_swapped[bi, i - 1, first[state_pick[bi, i - 1]]]
+                                                        + letter_swapped[bi, i, second[state_pick[bi, i - 1]]])
+                        break
+                    elif not pad[bi, i]:
+                        k -= 1
+                        penalty += SKIP_PENALTY
+                plate = "".join(reversed(out))
+                best_score[bi] = final[bi]
+                # Penalties count in full; the emissions as a geometric mean over the slots
+                best_plate[bi] = (plate, math.exp(penalty + (final[bi] - penalty) / len(layout)))
+
+        results = []
+        for bi, reading in enumerate(readings):
+            self.readings += 1
+            plate, confidence = best_plate[bi] or (None, 0.0)
+            if not plate or confidence < self.min_confidence or not PLATE_PATTERN.match(plate):
+                results.append((None, 0.0))
+                continue
+            self.decoded += 1
+            text = reading if isinstance(reading, str) else reading.text
+            if not PLATE_PATTERN.match(legacy_correct(text)):
+                self.recovered += 1
+            results.append((plate, confidence))
+        return results
+
+    def stats(self):
+        n = max(self.readings, 1)
+        return {
+            "readings": self.readings,
+            "decoded": self.decoded,
+            "recovered": self.recovered,
+            "recovered_per_call": round(self.recovered / n, 3),
+        }
+
+
+# --------------------------
+# BENCHMARK: grammar decoder vs the global mapping on simulated misreads
+# --------------------------
+if __name__ == "__main__":
+    import random
+    import time
+    from ocr_pool import OcrLine, OcrResult
+
+    STATES = ["MH", "DL", "KA", "TN", "UP", "GJ", "RJ", "WB", "HR", "PB", "GA", "OD"]
+    LETTERS = "ABCDEFGHJKLMNPRSTUVWXYZ"
+    rng = random.Random(0)
+
+    def random_plate():
+        return (rng.choice(STATES) + str(rng.randint(1, 99)) + "".join(rng.choices(LETTERS, k=rng.randint(1, 2)))
+                + f"{rng.randint(0, 9999):04d}")
+
+    def misread(plate):
+        """Swap some characters for look-alikes (the truth kept as a low alternative) and maybe add a stray."""
+        chars = []
+        for ch in plate:
+            if ch in LOOKALIKES and rng.random() < 0.15:
+                chars.append((LOOKALIKES[ch], rng.uniform(55, 80), [(ch, rng.uniform(10, 40))]))
+            else:
+                chars.append((ch, rng.uniform(75, 99), []))
+        if rng.random() < 0.2:
+            chars.insert(0, ("1", rng.uniform(30, 60), []))   # plate border read as "1"
+        return OcrResult([OcrLine("".join(c for c, _, _ in chars), None, chars)])
+
+    truth = [random_plate() for _ in range(5000)]
+    readings = [misread(p) for p in truth]
+
+    legacy = [legacy_correct(r.text) for r in readings]
+    legacy_valid = sum(bool(PLATE_PATTERN.match(t)) for t in legacy)
+    legacy_right = sum(t == p for t, p in zip(legacy, truth))
+
+    decoder = PlateDecoder()
+    start = time.perf_counter()
+    decoded = []
+    for i in range(0, len(readings), 64):
+        decoded.extend(decoder.decode_batch(readings[i:i + 64]))
+    batch_us = (time.perf_counter() - start) / len(readings) * 1e6
+    start = time.perf_counter()
+    for r in readings[:1000]:
+        PlateDecoder().decode(r)
+    single_us = (time.perf_counter() - start) / 1000 * 1e6
+
+    valid = sum(p is not None for p, _ in decoded)
+    right = sum(p == t for (p, _), t in zip(decoded, truth))
+    n = len(readings)
+    print(f"[INFO] Global mapping : {legacy_valid / n:6.1%} valid, {legacy_right / n:6.1%} correct")
+    print(f"[INFO] Grammar decoder: {valid / n:6.1%} valid, {right / n:6.1%} correct")
+    print(f"[INFO] Extra plates per OCR call: {decoder.stats()['recovered_per_call']}")
+    print(f"[INFO] Decode time: {batch_us:.0f} us/reading in batches of 64, {single_us:.0f} us one at a time")
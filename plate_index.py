@@ -0,0 +1,175 @@
+import csv
+import io
+import os
+import threading
+import zlib
+
+# --------------------------
+# IN-MEMORY PLATE INDEX OVER plate_log.csv
+# --------------------------
+# Loaded once, then kept up to date incrementally: when the file only grew we
+# parse just the new bytes after the last offset; when it was rewritten (the
+# loggers update exit times in place) we reload from scratch. A rewrite is
+# noticed when the file changed without growing, or when the CRC32 of the bytes
+# before our offset no longer matches the running CRC of what we parsed (one
+# fast pass over the prefix, far cheaper than parsing it). Lookups are a single
+# dict access.
+
+COLUMNS = ["plate_number", "entry_time", "exit_time", "location"]
+HEADER_PLATES = {"PLATE NUMBER", "PLATE_NUMBER", "NUMBERPLATE"}
+CRC_CHUNK = 1 << 20
+
+
+class PlateIndex:
+    def __init__(self, csv_path):
+        self.csv_path = csv_path
+        self._lock = threading.Lock()
+        self._clear()
+
+    def _clear(self):
+        self._by_plate = {}
+        self._offset = 0
+        self._mtime = None
+        self._crc = 0
+        self.rows = 0
+        self.reloads = 0
+
+    def exists(self):
+        return os.path.exists(self.csv_path)
+
+    def lookup(self, plate):
+        """Return all records for an exact (case-insensitive) plate number."""
+        self.refresh()
+        return [
+            {
+                "plate_number": p,
+                "entry_time": entry_time,
+                "exit_time": exit_time,
+                "date": entry_time.split(" ")[0],
+                "location": location,
+            }
+            for p, entry_time, exit_time, location in self._by_plate.get(plate.strip().upper(), ())
+        ]
+
+    def refresh(self):
+        """Pick up appended rows, or reload if the file was rewritten."""
+        with self._lock:
+            try:
+                st = os.stat(self.csv_path)
+            except FileNotFoundError:
+                self._clear()
+                return
+            if st.st_mtime == self._mtime and st.st_size == self._offset:
+                return
+
+            with open(self.csv_path, "rb") as f:
+                if self._offset and (st.st_size <= self._offset or not self._prefix_matches(f)):
+                    self._by_plate = {}
+                    self._offset = 0
+                    self._crc = 0
+                    self.rows = 0
+                    self.reloads += 1
+                f.seek(self._offset)
+                data = f.read()
+
+            # Only consume complete lines; a writer may be mid-row
+            end = data.rfind(b"\n") + 1
+            if end:
+                self._ingest(data[:end])
+                self._offset += end
+                self._crc = zlib.crc32(data[:end], self._crc)
+            self._mtime = st.st_mtime
+
+    def _prefix_matches(self, f):
+        """True if the first _offset bytes are still the ones we parsed."""
+        f.seek(0)
+        crc, left = 0, self._offset
+        while left:
+            chunk = f.read(min(CRC_CHUNK, left))
+            if not chunk:
+                return False
+            crc = zlib.crc32(chunk, crc)
+            left -= len(chunk)
+        return crc == self._crc
+
+    def _ingest(self, chunk):
+        reader = csv.reader(io.StringIO(chunk.decode("utf-8", errors="replace")))
+        by_plate = self._by_plate
+        pad = [""] * len(COLUMNS)
+        for row in reader:
+            if len(row) < len(COLUMNS):
+                if not row:
+                    continue
+                row = row + pad
+            plate = row[0].strip().upper()
+            if not plate or plate in HEADER_PLATES:
+                continue
+            record = (plate, row[1], row[2], row[3])
+            records = by_plate.get(plate)
+            if records is None:
+                by_plate[plate] = [record]
+            else:
+                records.append(record)
+            self.rows += 1
+
+
+# --------------------------
+# BENCHMARK: search latency vs log size
+# --------------------------
+if __name__ == "__main__":
+    import random
+    import string
+    import tempfile
+    import time
+
+    try:
+        import pandas as pd
+    except ImportError:
+        pd = None
+
+    def pandas_search(path, plate):
+        # The previous /search_plate implementation
+        df = pd.read_csv(path, header=None)
+        df.columns = COLUMNS
+        df["plate_number"] = df["plate_number"].astype(str).str.upper()
+        matches = df[df["plate_number"] == plate]
+        return [row["plate_number"] for _, row in matches.iterrows()]
+
+    def random_plate():
+        return ("".join(random.choices(string.ascii_uppercase, k=2)) + f"{random.randint(1, 99):02d}"
+                + "".join(random.choices(string.ascii_uppercase, k=2)) + f"{random.randint(0, 9999):04d}")
+
+    print(f"{'rows':>8} | {'pandas/search':>14} | {'index load':>10} | {'index/search':>12} | {'append+search':>13}")
+    for size in (1_000, 10_000, 100_000, 300_000):
+        path = os.path.join(tempfile.mkdtemp(), "plate_log.csv")
+        plates = [random_plate() for _ in range(size)]
+        with open(path, "w", newline="") as f:
+            writer = csv.writer(f)
+            for p in plates:
+                writer.writerow([p, "2025-11-06 23:09:13", "2025-11-06 23:10:02", "Camera-1"])
+        probes = random.sample(plates, 20)
+
+        pandas_ms = float("nan")
+        if pd is not None:
+            t = time.perf_counter()
+            for p in probes[:3]:
+                pandas_search(path, p)
+            pandas_ms = (time.perf_counter() - t) / 3 * 1000
+
+        index = PlateIndex(path)
+        t = time.perf_counter()
+        index.refresh()
+        load_ms = (time.perf_counter() - t) * 1000
+
+        t = time.perf_counter()
+        for p in probes:
+            index.lookup(p)
+        search_ms = (time.perf_counter() - t) / len(probes) * 1000
+
+        with open(path, "a", newline="") as f:
+            csv.writer(f).writerow(["NEW0001", "2025-11-07 00:00:00", "2025-11-07 00:01:00", "Camera-2"])
+        t = time.perf_counter()
+        assert index.lookup("NEW0001")
+        append_ms = (time.perf_counter() - t) * 1000
+
+        print(f"{size:>8} | {pandas_ms:>11.2f} ms | {load_ms:>7.1f} ms | {search_ms:>9.4f} ms | {append_ms:>10.3f} ms")
@@ -0,0 +1,286 @@
+import numpy as np
+
+# --------------------------
+# FUZZY PLATE MATCHING INDEX
+# --------------------------
+# Replaces main1.find_matching_plate's substring + SequenceMatcher scan over
+# every plate seen so far. Plates are indexed by the bigrams of their
+# "confusion-canonical" form (O/0, I/1/L, B/8, S/5, Z/2, G/6 folded to one
+# character, ^ and $ marking the ends):
+#
+#   1. An OCR reading only needs comparing with plates that share enough
+#      bigrams with it: k edits can destroy at most 2k of the reading's
+#      distinct bigrams (count filter). The posting lists are NumPy arrays,
+#      so counting is one np.bincount.
+#   2. The few survivors are checked with a weighted edit distance computed
+#      for all of them at once (DP vectorised over candidates). Confusable
+#      substitutions cost CONFUSION_COST, other edits 1.
+#
+# The costs satisfy the triangle inequality, so the distance is a metric and
+# the filter never drops a plate that is within max_distance. Removed plates
+# are tombstoned and the index is rebuilt once they outnumber the live ones.
+
+CONFUSABLE_GROUPS = ["O0", "I1L", "B8", "S5", "Z2", "G6"]
+CONFUSION_COST = 0.5
+MAX_DISTANCE = 2.0
+MAX_LEN = 12
+COMPACT_MIN = 1024       # removed plates tolerated before the index is rebuilt
+ALPHABET = "ABCDEFGHIJKLMNOPQRSTUVWXYZ0123456789"
+
+_CODE = {ch: i + 1 for i, ch in enumerate(ALPHABET)}          # 0 = padding / unknown
+_CANON = {ch: ch for ch in ALPHABET}
+for _group in CONFUSABLE_GROUPS:
+    for _ch in _group:
+        _CANON[_ch] = _group[-1]
+_N_SYMBOLS = len(ALPHABET) + 3                                   # + padding, ^, $
+_START, _END = len(ALPHABET) + 1, len(ALPHABET) + 2
+
+
+def canonical(text):
+    return "".join(_CANON.get(ch, ch) for ch in text.upper())
+
+
+def _codes(text):
+    return [_CODE.get(ch, 0) for ch in text]
+
+
+def _bigrams(text):
+    codes = [_START] + [_CODE.get(ch, 0) for ch in canonical(text)] + [_END]
+    return {a * _N_SYMBOLS + b for a, b in zip(codes, codes[1:])}
+
+
+def weighted_distance(a, b):
+    """Scalar reference of the confusion-aware edit distance."""
+    a, b = a.upper(), b.upper()
+    prev = [float(j) for j in range(len(b) + 1)]
+    for i, ca in enumerate(a, 1):
+        cur = [float(i)] + [0.0] * len(b)
+        for j, cb in enumerate(b, 1):
+            sub = 0.0 if ca == cb else (CONFUSION_COST if _CANON.get(ca, ca) == _CANON.get(cb, cb) else 1.0)
+            cur[j] = min(prev[j] + 1, cur[j - 1] + 1, prev[j - 1] + sub)
+        prev = cur
+    return prev[-1]
+
+
+class _Postings:
+    """Growable int32 array of plate ids."""
+
+    def __init__(self):
+        self.ids = np.empty(8, dtype=np.int32)
+        self.n = 0
+
+    def append(self, pid):
+        if self.n == len(self.ids):
+            self.ids = np.resize(self.ids, self.n * 2)
+        self.ids[self.n] = pid
+        self.n += 1
+
+    def view(self):
+        return self.ids[:self.n]
+
+
+class PlateMatcher:
+    def __init__(self, max_distance=MAX_DISTANCE, max_len=MAX_LEN):
+        self.max_distance = max_distance
+        self.max_len = max_len
+        self._reset()
+
+        # Stats
+        self.queries = 0
+        self.candidates = 0
+
+    def _reset(self):
+        self.plates = []                 # id -> plate text
+        self._ids = {}                   # plate text -> id
+        self._postings = {}              # bigram -> _Postings
+        self._raw = np.zeros((1024, self.max_len), dtype=np.uint8)
+        self._canon = np.zeros((1024, self.max_len), dtype=np.uint8)
+        self._len = np.zeros(1024, dtype=np.int16)
+        self._alive = np.zeros(1024, dtype=bool)
+        self.alive = 0
+
+    def __len__(self):
+        return self.alive
+
+    def __contains__(self, plate):
+        pid = self._ids.get(plate.upper())
+        return pid is not None and self._alive[pid]
+
+    def add(self, plate):
+        """Index a canonical plate (no-op if it is already there)."""
+        plate = plate.upper()[:self.max_len]
+        pid = self._ids.get(plate)
+        if pid is not None:
+            if not self._alive[pid]:
+                self._alive[pid] = True
+                self.alive += 1
+            return pid
+        pid = len(self.plates)
+        if pid == len(self._len):
+            grow = pid * 2
+            self._raw = np.resize(self._raw, (grow, self.max_len))
+            self._canon = np.resize(self._canon, (grow, self.max_len))
+            self._len = np.resize(self._len, grow)
+            self._alive = np.resize(self._alive, grow)
+        self.plates.append(plate)
+        self._ids[plate] = pid
+        self._raw[pid] = 0
+        self._canon[pid] = 0
+        self._raw[pid, :len(plate)] = _codes(plate)
+        self._canon[pid, :len(plate)] = _codes(canonical(plate))
+        self._len[pid] = len(plate)
+        self._alive[pid] = True
+        self.alive += 1
+        for gram in _bigrams(plate):
+            self._postings.setdefault(gram, _Postings()).append(pid)
+        return pid
+
+    def remove(self, plate):
+        """Stop matching a plate (e.g. once its visit is finalised)."""
+        pid = self._ids.get(plate.upper())
+        if pid is not None and self._alive[pid]:
+            self._alive[pid] = False
+            self.alive -= 1
+            if len(self.plates) - self.alive > max(COMPACT_MIN, self.alive):
+                self._compact()
+
+    def _compact(self):
+        live = [p for pid, p in enumerate(self.plates) if self._alive[pid]]
+        self._reset()
+        for plate in live:
+            self.add(plate)
+
+    def match(self, candidate, max_distance=None):
+        """Nearest indexed plate within max_distance (ties: first added), or None."""
+        found = self.match_with_distance(candidate, max_distance)
+        return found[0] if found else None
+
+    def match_with_distance(self, candidate, max_distance=None):
+        candidate = candidate.upper()[:self.max_len]
+        if not candidate or not self.alive:
+            return None
+        max_distance = self.max_distance if max_distance is None else max_distance
+        self.queries += 1
+
+        pid = self._ids.get(candidate)
+        if pid is not None and self._alive[pid]:
+            return candidate, 0.0
+
+        ids = self._filter(candidate, int(max_distance))
+        if not len(ids):
+            return None
+        self.candidates += len(ids)
+        dist = self._distances(candidate, ids)
+        best = int(np.argmin(dist))                      # argmin keeps the lowest id on ties
+        if dist[best] > max_distance:
+            return None
+        return self.plates[ids[best]], float(dist[best])
+
+    def _filter(self, candidate, k):
+        """Ids that can be within k edits: shared-bigram count and length filters."""
+        n = len(self.plates)
+        grams = _bigrams(candidate)
+        need = len(grams) - 2 * k
+        if need <= 0:
+            ids = np.arange(n)
+        else:
+            lists = [self._postings[g].view() for g in grams if g in self._postings]
+            if not lists:
+                return np.zeros(0, dtype=np.int64)
+            counts = np.bincount(np.concatenate(lists), minlength=n)
+            ids = np.nonzero(counts >= need)[0]
+        keep = self._alive[ids] & (np.abs(self._len[ids] - len(candidate)) <= k)
+        return ids[keep]
+
+    def _distances(self, candidate, ids):
+        """Weighted edit distance from candidate to every plate in ids (DP vectorised over ids)."""
+        q_raw = np.array(_codes(candidate), dtype=np.uint8)
+        q_canon = np.array(_codes(canonical(candidate)), dtype=np.uint8)
+        raw, canon = self._raw[ids], self._canon[ids]
+        m = self.max_len
+        prev = np.tile(np.arange(m + 1, dtype=np.float32), (len(ids), 1))
+        for i in range(len(candidate)):
+            cur = np.empty_like(prev)
+            cur[:, 0] = i + 1
+            sub = np.where(raw == q_raw[i], 0.0,
+                           np.where(canon == q_canon[i], CONFUSION_COST, 1.0)).astype(np.float32)
+            diag = prev[:, :-1] + sub
+            up = prev[:, 1:] + 1
+            best = np.minimum(diag, up)
+            # Insertions run left to right along the row
+            for j in range(1, m + 1):
+                cur[:, j] = np.minimum(best[:, j - 1], cur[:, j - 1] + 1)
+            prev = cur
+        return prev[np.arange(len(ids)), self._len[ids]]
+
+    def stats(self):
+        per_query = self.candidates / self.queries if self.queries else 0.0
+        return {"plates": self.alive, "queries": self.queries, "candidates_per_query": round(per_query, 1)}
+
+
+# --------------------------
+# BENCHMARK: index vs SequenceMatcher scan
+# --------------------------
+if __name__ == "__main__":
+    import random
+    import time
+    from difflib import SequenceMatcher
+
+    def find_matching_plate(candidate, plates_info):
+        # The previous main1.py implementation
+        for plate in plates_info.keys():
+            if candidate in plate or plate in candidate:
+                return plate
+        best, best_score = None, 0.0
+        for plate in plates_info.keys():
+            score = SequenceMatcher(None, candidate, plate).ratio()
+            if score > best_score:
+                best_score = score
+                best = plate
+        return best if best_score >= 0.6 else None
+
+    STATES = ["MH", "DL", "KA", "TN", "UP", "GJ", "RJ", "WB", "HR", "PB"]
+    LETTERS = "ABCDEFGHJKLMNPRSTUVWXYZ"
+    CONFUSE = {"0": "O", "1": "I", "8": "B", "5": "S", "2": "Z", "6": "G",
+               "O": "0", "I": "1", "B": "8", "S": "5", "Z": "2", "G": "6"}
+    rng = random.Random(0)
+
+    def random_plate():
+        return (rng.choice(STATES) + f"{rng.randint(1, 99):02d}" + "".join(rng.choices(LETTERS, k=2))
+                + f"{rng.randint(0, 9999):04d}")
+
+    def misread(plate):
+        chars = list(plate)
+        for _ in range(2):                      # two OCR confusions ...
+            i = rng.randrange(len(chars))
+            chars[i] = CONFUSE.get(chars[i], chars[i])
+        if rng.random() < 0.5:                  # ... and sometimes one dropped character
+            del chars[rng.randrange(len(chars))]
+        return "".join(chars)
+
+    print(f"{'plates':>9} | {'build s':>7} | {'index ms/q':>10} | {'cand/q':>7} | {'found':>6} | {'scan ms/q':>9}")
+    for size in (10_000, 100_000, 1_000_000):
+        plates = list(dict.fromkeys(random_plate() for _ in range(size)))
+        start = time.perf_counter()
+        matcher = PlateMatcher()
+        for p in plates:
+            matcher.add(p)
+        build = time.perf_counter() - start
+
+        targets = rng.sample(plates, 200)
+        queries = [misread(p) for p in targets] + [random_plate() for _ in range(50)]
+        start = time.perf_counter()
+        answers = [matcher.match(q) for q in queries]
+        index_ms = (time.perf_counter() - start) / len(queries) * 1000
+        found = sum(a == t for a, t in zip(answers, targets))
+
+        scan_ms = float("nan")
+        if size <= 100_000:
+            info = dict.fromkeys(plates)
+            start = time.perf_counter()
+            for q in queries[:5]:
+                find_matching_plate(q, info)
+            scan_ms = (time.perf_counter() - start) / 5 * 1000
+
+        print(f"{len(plates):>9} | {build:>7.1f} | {index_ms:>10.3f} | "
+              f"{matcher.candidates / matcher.queries:>7.1f} | {found:>3}/{len(targets)} | {scan_ms:>9.1f}")
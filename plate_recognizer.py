@@ -0,0 +1,304 @@
+import csv
+import glob
+import json
+import os
+import re
+import time
+import zlib
+from concurrent.futures import Future
+import cv2
+import numpy as np
+from ocr_pool import OcrLine, OcrResult
+
+# --------------------------
+# CRNN + CTC PLATE RECOGNISER (ONNX RUNTIME)
+# --------------------------
+# A small conv + BiLSTM network trained with CTC on the plate crops we
+# already collect (train_recognizer.py), as a faster alternative to
+# Tesseract --psm 7. A whole batch of crops goes through one forward pass.
+# Results are ocr_pool.OcrResult objects: the text, a confidence per
+# character and the runner-up characters at that step as alternatives. So
+# the recogniser can stand in for an OcrPool, and plate_grammar.PlateDecoder
+# can use the alternatives.
+#
+# Crops are grayscale, resized to INPUT_W x INPUT_H. A two-row plate
+# (bikes, autos) is cut at the gap between its rows and the rows are put side
+# by side, so the network only ever reads one line. A crop counts as two-row
+# when it is not much wider than tall and its row projection (ink per pixel
+# row) has a clear gap near the middle; an aspect test alone also cuts tight
+# single-row crops.
+#
+# Labelled crops are gathered from:
+#   * verified.csv in the folder (file,text) - hand-checked labels
+#   * labels.csv in the folder (file,text) - corrections / pseudo-labels
+#   * appp.py's file names: <PLATE>_<YYYY-mm-dd>_<HH-MM-SS>.jpg
+# The last two are Tesseract readings, so accuracy is only ever measured on
+# the hand-checked labels.
+
+MODEL_PATH = "plate_crnn.onnx"
+CHARSET = "0123456789ABCDEFGHIJKLMNOPQRSTUVWXYZ"   # class 0 is the CTC blank
+INPUT_H = 32
+INPUT_W = 128
+TWO_ROW_ASPECT = 2.5     # width / height above this is always a single row
+TWO_ROW_BAND = (0.3, 0.7)   # where (fraction of height) the gap between two rows is looked for
+TWO_ROW_GAP = 0.25       # gap row ink below this fraction of the mean row ink -> two rows
+BATCH_SIZE = 64
+TOP_ALTERNATIVES = 3
+DEFAULT_THREADS = max(1, (os.cpu_count() or 2) // 2)
+
+DATA_DIRS = ["plates_captured", "vehicle_numberplates", "plates_yolo_format"]
+LABEL_FILE = "labels.csv"
+VERIFIED_FILE = "verified.csv"
+IMAGE_EXTS = (".jpg", ".jpeg", ".png", ".bmp")
+NAME_LABEL_PATTERN = re.compile(r'^([A-Z0-9]+)_\d{4}-\d{2}-\d{2}_\d{2}-\d{2}-\d{2}')
+VAL_EVERY = 10           # every 10th crop (by file-name hash) is held out for validation
+
+try:
+    import onnxruntime as ort
+except ImportError:
+    ort = None
+
+
+# --------------------------
+# Pre-processing
+# --------------------------
+def row_split(gray):
+    """Row between the two text rows of a two-row plate, or None for a single-row crop."""
+    h, w = gray.shape[:2]
+    if h < 8 or w > TWO_ROW_ASPECT * h:
+        return None
+    ink = cv2.threshold(gray, 0, 1, cv2.THRESH_BINARY + cv2.THRESH_OTSU)[1]
+    if ink.mean() > 0.5:          # dark text on a light plate -> count the dark pixels
+        ink = 1 - ink
+    rows = ink.mean(axis=1)
+    lo, hi = int(h * TWO_ROW_BAND[0]), int(h * TWO_ROW_BAND[1])
+    gap = lo + int(np.argmin(rows[lo:hi]))
+    if rows.mean() == 0 or rows[gap] > TWO_ROW_GAP * rows.mean():
+        return None
+    if rows[:gap].max() <= rows.mean() or rows[gap:].max() <= rows.mean():
+        return None               # ink on one side only, e.g. a single row sitting low in the crop
+    return gap
+
+
+def preprocess(crop, height=INPUT_H, width=INPUT_W):
+    """BGR or gray crop -> float32 (1, height, width) in -1..1."""
+    gray = cv2.cvtColor(crop, cv2.COLOR_BGR2GRAY) if crop.ndim == 3 else crop
+    h, w = gray.shape[:2]
+    gap = row_split(gray)
+    if gap is not None:
+        top, bottom = gray[:gap], gray[gap:]
+        rows = max(top.shape[0], bottom.shape[0])
+        gray = np.hstack([cv2.resize(top, (w, rows)), cv2.resize(bottom, (w, rows))])
+        h, w = gray.shape[:2]
+    gray = cv2.resize(gray, (width, height), interpolation=cv2.INTER_AREA if w > width else cv2.INTER_LINEAR)
+    return (gray.astype(np.float32) / 127.5 - 1.0)[None]
+
+
+def encode_label(text):
+    return [CHARSET.index(ch) + 1 for ch in text]
+
+
+def ctc_decode(probs, top=TOP_ALTERNATIVES):
+    """
+    Greedy CTC decode of softmax output (T, C) -> OcrResult. Each character's
+    confidence is its peak probability over the steps it spans; the alternatives
+    are the other non-blank classes at that peak step.
+    """
+    best = probs.argmax(axis=1)
+    chars, prev, peak = [], 0, None
+    for t, k in enumerate(best):
+        if k != 0 and k == prev and peak is not None and probs[t, k] > probs[peak, k]:
+            peak = t
+        if k != 0 and k != prev:
+            if peak is not None:
+                chars.append(peak)
+            peak = t
+        elif k == 0 and peak is not None:
+            chars.append(peak)
+            peak = None
+        prev = k
+    if peak is not None:
+        chars.append(peak)
+
+    out = []
+    for t in chars:
+        k = best[t]
+        order = np.argsort(probs[t, 1:])[::-1][:top + 1] + 1
+        alternatives = [(CHARSET[a - 1], float(probs[t, a] * 100)) for a in order if a != k][:top]
+        out.append((CHARSET[k - 1], float(probs[t, k] * 100), alternatives))
+    text = "".join(ch for ch, _, _ in out)
+    return OcrResult([OcrLine(text, None, out)] if out else [])
+
+
+# --------------------------
+# Inference
+# --------------------------
+class CrnnRecognizer:
+    def __init__(self, model_path=MODEL_PATH, threads=DEFAULT_THREADS, batch_size=BATCH_SIZE):
+        if ort is None:
+            raise ImportError("onnxruntime is required for the CRNN recogniser (pip install onnxruntime)")
+        info = {}
+        sidecar = os.path.splitext(model_path)[0] + ".json"
+        if os.path.exists(sidecar):
+            with open(sidecar) as f:
+                info = json.load(f)
+        self.charset = info.get("charset", CHARSET)
+        self.height = info.get("height", INPUT_H)
+        self.width = info.get("width", INPUT_W)
+        self.batch_size = batch_size
+
+        opts = ort.SessionOptions()
+        opts.intra_op_num_threads = threads
+        opts.inter_op_num_threads = 1
+        opts.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        self.session = ort.InferenceSession(model_path, opts, providers=["CPUExecutionProvider"])
+        self.input_name = self.session.get_inputs()[0].name
+
+        # Stats
+        self.crops = 0
+        self.batches = 0
+        self.total_time = 0.0
+
+    def recognize(self, image):
+        return self.recognize_batch([image])[0]
+
+    def recognize_batch(self, images):
+        """Crops -> [OcrResult], one forward pass per batch_size crops."""
+        results = []
+        for i in range(0, len(images), self.batch_size):
+            chunk = images[i:i + self.batch_size]
+            start = time.perf_counter()
+            blob = np.stack([preprocess(img, self.height, self.width) for img in chunk])
+            logits = self.session.run(None, {self.input_name: blob})[0]          # (B, T, C)
+            logits = logits - logits.max(axis=2, keepdims=True)
+            probs = np.exp(logits)
+            probs /= probs.sum(axis=2, keepdims=True)
+            results.extend(ctc_decode(p) for p in probs)
+            self.total_time += time.perf_counter() - start
+            self.crops += len(chunk)
+            self.batches += 1
+        return results
+
+    def submit(self, image):
+        """OcrPool-compatible: recognised right away (a crop takes ~1 ms), returned as a done Future."""
+        future = Future()
+        future.set_result(self.recognize(image))
+        return future
+
+    def stats(self):
+        return {
+            "crops": self.crops,
+            "batches": self.batches,
+            "ms_per_crop": round(self.total_time / max(self.crops, 1) * 1000, 3),
+        }
+
+    def close(self):
+        pass
+
+
+# --------------------------
+# Labelled crops
+# --------------------------
+def _read_labels(d, name):
+    label_file = os.path.join(d, name)
+    if not os.path.exists(label_file):
+        return {}
+    with open(label_file, newline="", encoding="utf-8") as f:
+        return {os.path.abspath(os.path.join(d, row[0])): row[1].strip().upper()
+                for row in csv.reader(f) if len(row) >= 2 and row[1].strip()}
+
+
+def load_samples(dirs=DATA_DIRS, pattern=None, verified_only=False):
+    """
+    [(path, label)] from verified.csv, labels.csv and appp.py-style file names (in that order
+    of precedence). verified_only keeps only the hand-checked verified.csv labels. pattern (a
+    compiled regex, e.g. plate_grammar.PLATE_PATTERN) drops labels that don't match it.
+    """
+    samples = {}
+    for d in dirs:
+        if not os.path.isdir(d):
+            continue
+        if not verified_only:
+            for path in sorted(glob.glob(os.path.join(d, "*"))):
+                if not path.lower().endswith(IMAGE_EXTS):
+                    continue
+                m = NAME_LABEL_PATTERN.match(os.path.basename(path))
+                if m:
+                    samples[os.path.abspath(path)] = m.group(1)
+            samples.update(_read_labels(d, LABEL_FILE))
+        samples.update(_read_labels(d, VERIFIED_FILE))
+
+    out = []
+    for path, label in samples.items():
+        label = "".join(ch for ch in label if ch in CHARSET)
+        if label and os.path.exists(path) and (pattern is None or pattern.match(label)):
+            out.append((path, label))
+    return out
+
+
+def is_validation(path):
+    """Stable train/val split on the file name, so it survives new crops being added."""
+    return zlib.crc32(os.path.basename(path).encode()) % VAL_EVERY == 0
+
+
+def edit_distance(a, b):
+    prev = list(range(len(b) + 1))
+    for i, ca in enumerate(a, 1):
+        cur = [i] + [0] * len(b)
+        for j, cb in enumerate(b, 1):
+            cur[j] = min(prev[j] + 1, cur[j - 1] + 1, prev[j - 1] + (ca != cb))
+        prev = cur
+    return prev[-1]
+
+
+# --------------------------
+# BENCHMARK: CRNN vs Tesseract on the held-out, hand-checked crops
+# --------------------------
+if __name__ == "__main__":
+    import argparse
+    from ocr_pool import get_pool, PLATE_WHITELIST
+    from plate_grammar import PlateDecoder, PLATE_PATTERN
+
+    ap = argparse.ArgumentParser(description="CRNN plate recogniser vs Tesseract --psm 7: throughput and accuracy")
+    ap.add_argument("--model", default=MODEL_PATH)
+    ap.add_argument("--dirs", nargs="+", default=DATA_DIRS)
+    ap.add_argument("--all", action="store_true", help="Use every verified crop, not only the validation split")
+    ap.add_argument("--any-label", action="store_true", help="Keep labels that don't match the plate grammar")
+    ap.add_argument("--threads", type=int, default=DEFAULT_THREADS)
+    ap.add_argument("--batch", type=int, default=BATCH_SIZE)
+    args = ap.parse_args()
+
+    # File names and labels.csv hold Tesseract's readings; scoring Tesseract against them is circular
+    samples = load_samples(args.dirs, None if args.any_label else PLATE_PATTERN, verified_only=True)
+    if not args.all:
+        samples = [s for s in samples if is_validation(s[0])]
+    if not samples:
+        print(f"[ERROR] No hand-checked crops ({VERIFIED_FILE}: file,text) found in {args.dirs}")
+        raise SystemExit(1)
+    crops = [cv2.imread(path) for path, _ in samples]
+    labels = [label for _, label in samples]
+
+    def tesseract_crop(crop):
+        # Same preprocessing as appp.py's Tesseract path
+        gray = cv2.bilateralFilter(cv2.cvtColor(crop, cv2.COLOR_BGR2GRAY), 11, 17, 17)
+        return cv2.threshold(gray, 120, 255, cv2.THRESH_BINARY)[1]
+
+    engines = {}
+    recognizer = CrnnRecognizer(args.model, threads=args.threads, batch_size=args.batch)
+    recognizer.recognize_batch(crops[:args.batch])  # warm-up
+    engines["crnn"] = lambda: recognizer.recognize_batch(crops)
+    pool = get_pool(psm=7, whitelist=PLATE_WHITELIST)
+    engines["tesseract"] = lambda: pool.recognize_batch([tesseract_crop(c) for c in crops])
+
+    print(f"[INFO] {len(crops)} hand-checked crops")
+    print(f"{'engine':>10} | {'crops/s':>8} | {'exact':>6} | {'char acc':>8} | {'+grammar':>8}")
+    for name, run in engines.items():
+        start = time.perf_counter()
+        results = run()
+        rate = len(crops) / (time.perf_counter() - start)
+        texts = ["".join(ch for ch in r.text if ch.isalnum()).upper() for r in results]
+        exact = np.mean([t == l for t, l in zip(texts, labels)])
+        char_acc = 1 - sum(edit_distance(t, l) for t, l in zip(texts, labels)) / sum(len(l) for l in labels)
+        decoded = PlateDecoder().decode_batch(results)
+        grammar = np.mean([p == l for (p, _), l in zip(decoded, labels)])
+        print(f"{name:>10} | {rate:8.1f} | {exact:6.1%} | {char_acc:8.1%} | {grammar:8.1%}")
@@ -0,0 +1,259 @@
+import csv
+import os
+import sqlite3
+import threading
+import time
+from datetime import datetime, timedelta
+
+# --------------------------
+# SQLITE PLATE EVENT STORE
+# --------------------------
+# One store for every plate logger (plate_captures.py, appp.py, main1.py) and
+# for app.py's /search_plate. The database runs in WAL mode so the Flask app can
+# read while a detector writes, and writes are buffered and committed in
+# batches - when BATCH_SIZE rows are pending, and by a background thread every
+# FLUSH_INTERVAL seconds, so a lone sighting is searchable within about a
+# second even if nothing else is logged after it. Each sighting is an indexed lookup of the plate's latest event
+# followed by an UPDATE or an INSERT, so it costs O(log n) however large the
+# log grows.
+
+DB_PATH = "plate_events.db"
+TIME_FORMAT = "%Y-%m-%d %H:%M:%S"
+VISIT_GAP = 600          # seconds without a sighting before the same plate counts as a new visit
+BATCH_SIZE = 50
+FLUSH_INTERVAL = 1.0     # seconds
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS plate_events (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    plate TEXT NOT NULL,
+    entry_time TEXT NOT NULL,
+    exit_time TEXT,
+    location TEXT,
+    source TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_plate_events_plate ON plate_events(plate, id);
+CREATE INDEX IF NOT EXISTS idx_plate_events_entry ON plate_events(entry_time);
+CREATE TABLE IF NOT EXISTS imported_files (
+    path TEXT PRIMARY KEY,
+    size INTEGER,
+    mtime REAL,
+    rows INTEGER,
+    imported_at TEXT
+);
+"""
+
+
+def format_time(when):
+    return when.strftime(TIME_FORMAT) if isinstance(when, datetime) else str(when)
+
+
+class PlateStore:
+    def __init__(self, db_path=DB_PATH, batch_size=BATCH_SIZE, flush_interval=FLUSH_INTERVAL,
+                 visit_gap=VISIT_GAP):
+        self.db_path = db_path
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.visit_gap = timedelta(seconds=visit_gap)
+        self._lock = threading.Lock()
+        self._pending = []
+        self._first_pending = None
+
+        self.conn = sqlite3.connect(db_path, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.executescript(SCHEMA)
+        self.conn.commit()
+
+        self._closed = threading.Event()
+        self._flusher = threading.Thread(target=self._flush_loop, daemon=True)
+        self._flusher.start()
+
+    # --------------------------
+    # Writes (buffered)
+    # --------------------------
+    def log_sighting(self, plate, location="Camera-1", when=None, source=None):
+        """Record that a plate was seen: extends its current visit or opens a new one."""
+        when = when or datetime.now()
+        self._queue(("sighting", plate.upper(), when, location, source))
+
+    def log_visit(self, plate, entry_time, exit_time, location=None, source=None):
+        """Record a finished visit with known entry and exit times."""
+        self._queue(("visit", plate.upper(), entry_time, exit_time, location, source))
+
+    def _queue(self, op):
+        with self._lock:
+            self._pending.append(op)
+            if self._first_pending is None:
+                self._first_pending = time.time()
+            due = (len(self._pending) >= self.batch_size
+                   or time.time() - self._first_pending >= self.flush_interval)
+        if due:
+            self.flush()
+
+    def _flush_loop(self):
+        """Commit pending rows every flush_interval, so they don't wait for the next write."""
+        while not self._closed.wait(self.flush_interval):
+            if self._pending:
+                try:
+                    self.flush()
+                except Exception as e:
+                    print(f"[ERROR] Plate store flush failed: {e}")
+
+    def flush(self):
+        """Commit all buffered writes in one transaction."""
+        with self._lock:
+            ops, self._pending = self._pending, []
+            self._first_pending = None
+            if not ops:
+                return 0
+            with self.conn:
+                for op in ops:
+                    if op[0] == "sighting":
+                        self._apply_sighting(*op[1:])
+                    else:
+                        _, plate, entry_time, exit_time, location, source = op
+                        self.conn.execute(
+                            "INSERT INTO plate_events (plate, entry_time, exit_time, location, source) "
+                            "VALUES (?, ?, ?, ?, ?)",
+                            (plate, format_time(entry_time), format_time(exit_time) if exit_time else None,
+                             location, source))
+            return len(ops)
+
+    def _apply_sighting(self, plate, when, location, source):
+        now = format_time(when)
+        cutoff = format_time(when - self.visit_gap) if isinstance(when, datetime) else now
+        row = self.conn.execute(
+            "SELECT id, exit_time FROM plate_events WHERE plate = ? ORDER BY id DESC LIMIT 1",
+            (plate,)).fetchone()
+        if row is not None and (row[1] or "") >= cutoff:
+            # MAX keeps the exit time monotonic if sightings arrive slightly out of order
+            self.conn.execute("UPDATE plate_events SET exit_time = MAX(COALESCE(exit_time, ''), ?) WHERE id = ?",
+                              (now, row[0]))
+        else:
+            self.conn.execute(
+                "INSERT INTO plate_events (plate, entry_time, exit_time, location, source) "
+                "VALUES (?, ?, ?, ?, ?)",
+                (plate, now, now, location, source))
+            print(f"[INFO] New Entry logged: {plate} at {now}")
+
+    # --------------------------
+    # Reads
+    # --------------------------
+    def search(self, plate):
+        """All events for an exact plate, in the same shape as PlateIndex.lookup()."""
+        self.flush()
+        with self._lock:
+            rows = self.conn.execute(
+                "SELECT plate, entry_time, exit_time, location FROM plate_events WHERE plate = ? ORDER BY id",
+                (plate.strip().upper(),)).fetchall()
+        return [
+            {
+                "plate_number": p,
+                "entry_time": entry_time,
+                "exit_time": exit_time,
+                "date": entry_time.split(" ")[0],
+                "location": location,
+            }
+            for p, entry_time, exit_time, location in rows
+        ]
+
+    def import_visits(self, key, visits, location=None, source=None, replaces=None):
+        """
+        Insert finished (plate, entry_time, exit_time) visits once per key, e.g. one processed
+        video. The rows and the key are committed together, so re-running after a crash never
+        duplicates them. Returns the number of rows added (0 if the key was imported before).
+
+        replaces is a key prefix (e.g. one video's): earlier imports under it are superseded,
+        and their rows (same location and source) are deleted in the same transaction.
+        """
+        self.flush()
+        with self._lock, self.conn:
+            if self.conn.execute("SELECT 1 FROM imported_files WHERE path = ?", (key,)).fetchone():
+                return 0
+            if replaces is not None:
+                old = self.conn.execute("SELECT 1 FROM imported_files WHERE substr(path, 1, ?) = ?",
+                                        (len(replaces), replaces)).fetchone()
+                if old:
+                    self.conn.execute("DELETE FROM plate_events WHERE location IS ? AND source IS ?",
+                                      (location, source))
+                    self.conn.execute("DELETE FROM imported_files WHERE substr(path, 1, ?) = ?",
+                                      (len(replaces), replaces))
+            self.conn.executemany(
+                "INSERT INTO plate_events (plate, entry_time, exit_time, location, source) VALUES (?, ?, ?, ?, ?)",
+                [(plate.upper(), format_time(entry), format_time(exit) if exit else None, location, source)
+                 for plate, entry, exit in visits])
+            self.conn.execute(
+                "INSERT INTO imported_files (path, size, mtime, rows, imported_at) VALUES (?, NULL, NULL, ?, ?)",
+                (key, len(visits), format_time(datetime.now())))
+        return len(visits)
+
+    def is_imported(self, path):
+        """True if the CSV file has been imported with import_csv()."""
+        with self._lock:
+            return self.conn.execute("SELECT 1 FROM imported_files WHERE path = ?",
+                                     (os.path.abspath(path),)).fetchone() is not None
+
+    def close(self):
+        self._closed.set()
+        self._flusher.join(timeout=self.flush_interval * 2)
+        self.flush()
+        self.conn.close()
+
+    # --------------------------
+    # One-time CSV import
+    # --------------------------
+    def import_csv(self, csv_path, source=None, force=False):
+        """
+        Import an existing plate CSV (plate_log.csv: plate, entry, exit, location;
+        car_plate_data.csv: plate, entry, exit). Files imported before are skipped unless force=True.
+        """
+        st = os.stat(csv_path)
+        key = os.path.abspath(csv_path)
+        with self._lock:
+            seen = self.conn.execute("SELECT rows FROM imported_files WHERE path = ?", (key,)).fetchone()
+        if seen is not None and not force:
+            print(f"[INFO] Already imported ({seen[0]} rows): {csv_path} - use --force to import again")
+            return 0
+
+        source = source or os.path.basename(csv_path)
+        rows = []
+        with open(csv_path, newline="", encoding="utf-8", errors="replace") as f:
+            for row in csv.reader(f):
+                if len(row) < 2 or not row[0].strip():
+                    continue
+                plate = row[0].strip().upper()
+                if plate.replace(" ", "").replace("_", "") in ("PLATENUMBER", "NUMBERPLATE"):
+                    continue  # header
+                exit_time = row[2] if len(row) > 2 and row[2] else None
+                location = row[3] if len(row) > 3 else None
+                rows.append((plate, row[1], exit_time, location, source))
+
+        self.flush()
+        with self._lock, self.conn:
+            self.conn.executemany(
+                "INSERT INTO plate_events (plate, entry_time, exit_time, location, source) VALUES (?, ?, ?, ?, ?)",
+                rows)
+            self.conn.execute(
+                "INSERT OR REPLACE INTO imported_files (path, size, mtime, rows, imported_at) VALUES (?, ?, ?, ?, ?)",
+                (key, st.st_size, st.st_mtime, len(rows), format_time(datetime.now())))
+        print(f"[INFO] Imported {len(rows)} rows from {csv_path}")
+        return len(rows)
+
+
+if __name__ == "__main__":
+    import argparse
+
+    ap = argparse.ArgumentParser(description="Import existing plate CSV logs into the SQLite plate store")
+    ap.add_argument("csv", nargs="+", help="CSV files to import (e.g. plate_log.csv car_plate_data.csv)")
+    ap.add_argument("--db", default=DB_PATH, help="Path to the plate event database")
+    ap.add_argument("--force", action="store_true", help="Import files again even if already imported")
+    args = ap.parse_args()
+
+    store = PlateStore(args.db)
+    for path in args.csv:
+        if not os.path.exists(path):
+            print(f"[ERROR] Not found: {path}")
+            continue
+        store.import_csv(path, force=args.force)
+    store.close()
@@ -0,0 +1,153 @@
+import cv2
+import numpy as np
+
+# --------------------------
+# PLATE TRACKER (skip redundant OCR)
+# --------------------------
+# Gives every plate box a track ID by greedy IoU matching against the tracks of
+# the previous frames (falling back to centroid distance for small, fast boxes).
+# OCR only needs to run when a track is new or when its crop is noticeably
+# better (sharper and/or larger) than the best one OCR'd so far. Readings are
+# merged per track by confidence-weighted voting.
+
+IOU_THRESHOLD = 0.3
+CENTROID_FACTOR = 0.5     # max centroid shift, as a fraction of the box diagonal
+MAX_MISSED = 15           # frames a track survives without a matching box
+QUALITY_GAIN = 1.25       # re-OCR only when the crop quality improves by this factor
+
+
+def box_iou(a, b):
+    """IoU matrix between two (N, 4) / (M, 4) arrays of x1, y1, x2, y2 boxes."""
+    a = np.asarray(a, dtype=np.float32).reshape(-1, 4)
+    b = np.asarray(b, dtype=np.float32).reshape(-1, 4)
+    x1 = np.maximum(a[:, None, 0], b[None, :, 0])
+    y1 = np.maximum(a[:, None, 1], b[None, :, 1])
+    x2 = np.minimum(a[:, None, 2], b[None, :, 2])
+    y2 = np.minimum(a[:, None, 3], b[None, :, 3])
+    inter = np.clip(x2 - x1, 0, None) * np.clip(y2 - y1, 0, None)
+    area_a = (a[:, 2] - a[:, 0]) * (a[:, 3] - a[:, 1])
+    area_b = (b[:, 2] - b[:, 0]) * (b[:, 3] - b[:, 1])
+    return inter / np.maximum(area_a[:, None] + area_b[None, :] - inter, 1e-6)
+
+
+def crop_quality(crop):
+    """Sharpness (variance of the Laplacian) weighted by crop size."""
+    if crop is None or crop.size == 0:
+        return 0.0
+    gray = cv2.cvtColor(crop, cv2.COLOR_BGR2GRAY) if crop.ndim == 3 else crop
+    sharpness = cv2.Laplacian(gray, cv2.CV_64F).var()
+    return float(sharpness * np.sqrt(gray.shape[0] * gray.shape[1]))
+
+
+class PlateTrack:
+    def __init__(self, track_id, box, frame_index):
+        self.id = track_id
+        self.box = tuple(box)
+        self.last_frame = frame_index
+        self.hits = 1
+        self.best_quality = 0.0
+        self.ocr_requests = 0   # crops handed to OCR (results may still be in flight)
+        self.ocr_calls = 0      # readings received
+        self.votes = {}  # text -> accumulated confidence
+
+    @property
+    def text(self):
+        """Best reading so far (highest accumulated confidence), or None."""
+        if not self.votes:
+            return None
+        return max(self.votes.items(), key=lambda kv: kv[1])[0]
+
+    @property
+    def confidence(self):
+        if not self.votes:
+            return 0.0
+        return self.votes[self.text] / sum(self.votes.values())
+
+
+class PlateTracker:
+    def __init__(self, iou_threshold=IOU_THRESHOLD, max_missed=MAX_MISSED, quality_gain=QUALITY_GAIN):
+        self.iou_threshold = iou_threshold
+        self.max_missed = max_missed
+        self.quality_gain = quality_gain
+        self.tracks = []
+        self.frame_index = 0
+        self._next_id = 1
+
+        # Stats
+        self.boxes_seen = 0
+        self.ocr_calls = 0
+
+    def update(self, boxes):
+        """Match this frame's boxes to tracks. Returns one PlateTrack per box, in order."""
+        self.frame_index += 1
+        boxes = [tuple(int(v) for v in b) for b in boxes]
+        self.boxes_seen += len(boxes)
+        assigned = [None] * len(boxes)
+
+        if boxes and self.tracks:
+            iou = box_iou(boxes, [t.box for t in self.tracks])
+            used = set()
+            # Greedy: best IoU pairs first
+            for flat in np.argsort(-iou, axis=None):
+                bi, ti = divmod(int(flat), len(self.tracks))
+                if iou[bi, ti] < self.iou_threshold:
+                    break
+                if assigned[bi] is None and ti not in used:
+                    assigned[bi] = self.tracks[ti]
+                    used.add(ti)
+            # Centroid fallback for boxes that moved too far for IoU
+            for bi, box in enumerate(boxes):
+                if assigned[bi] is not None:
+                    continue
+                cx, cy = (box[0] + box[2]) / 2, (box[1] + box[3]) / 2
+                diag = np.hypot(box[2] - box[0], box[3] - box[1])
+                best, best_d = None, CENTROID_FACTOR * diag
+                for ti, t in enumerate(self.tracks):
+                    if ti in used:
+                        continue
+                    tx, ty = (t.box[0] + t.box[2]) / 2, (t.box[1] + t.box[3]) / 2
+                    d = np.hypot(cx - tx, cy - ty)
+                    if d < best_d:
+                        best, best_d = ti, d
+                if best is not None:
+                    assigned[bi] = self.tracks[best]
+                    used.add(best)
+
+        for bi, box in enumerate(boxes):
+            track = assigned[bi]
+            if track is None:
+                track = PlateTrack(self._next_id, box, self.frame_index)
+                self._next_id += 1
+                self.tracks.append(track)
+                assigned[bi] = track
+            else:
+                track.box = box
+                track.last_frame = self.frame_index
+                track.hits += 1
+
+        self.tracks = [t for t in self.tracks if self.frame_index - t.last_frame <= self.max_missed]
+        return assigned
+
+    def needs_ocr(self, track, crop):
+        """True for new tracks, or when this crop beats the best OCR'd crop by quality_gain."""
+        quality = crop_quality(crop)
+        if track.ocr_requests == 0 or quality > track.best_quality * self.quality_gain:
+            track.best_quality = max(track.best_quality, quality)
+            track.ocr_requests += 1
+            return True
+        return False
+
+    def add_reading(self, track, text, confidence=1.0):
+        """Record one OCR result for a track (empty/invalid readings just count the call)."""
+        track.ocr_calls += 1
+        self.ocr_calls += 1
+        if text:
+            track.votes[text] = track.votes.get(text, 0.0) + confidence
+
+    def reset(self):
+        self.tracks = []
+        self.frame_index = 0
+
+    def stats(self):
+        saved = 1 - self.ocr_calls / self.boxes_seen if self.boxes_seen else 0.0
+        return {"boxes": self.boxes_seen, "ocr_calls": self.ocr_calls, "ocr_skipped": f"{saved:.0%}"}
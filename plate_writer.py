@@ -0,0 +1,163 @@
+import queue
+import threading
+import time
+from datetime import datetime
+
+# --------------------------
+# WRITE-BEHIND PLATE LOGGING
+# --------------------------
+# The video loop calls submit() and returns immediately. A background thread
+# saves plate crops/labels and writes sightings to the PlateStore in batches.
+#
+# Repeated sightings of the same plate within COALESCE_WINDOW seconds don't go
+# through the queue at all: only the newest time is remembered and written with
+# the next batch, so the exit time stays current without a crop per frame.
+# When the queue is full the writer either drops the item ("drop", default -
+# the video loop never waits) or blocks the caller for up to BLOCK_TIMEOUT
+# seconds ("block", backpressure).
+#
+# Only the background thread touches the store: flush() queues an Event that
+# the thread sets once everything queued before it has been written.
+
+MAX_QUEUE = 256
+COALESCE_WINDOW = 2.0
+BATCH_SIZE = 32
+FLUSH_INTERVAL = 0.5
+BLOCK_TIMEOUT = 1.0
+FLUSH_TIMEOUT = 10.0
+
+
+class PlateWriter:
+    def __init__(self, store, save_image=None, max_queue=MAX_QUEUE, coalesce_window=COALESCE_WINDOW,
+                 batch_size=BATCH_SIZE, flush_interval=FLUSH_INTERVAL, overflow="drop"):
+        self.store = store
+        self.save_image = save_image
+        self.coalesce_window = coalesce_window
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.overflow = overflow
+        self._queue = queue.Queue(maxsize=max_queue)
+        self._lock = threading.Lock()
+        self._recent = {}         # plate -> time its last full item was queued
+        self._pending_seen = {}   # plate -> (when, location) of the newest coalesced sighting
+        self._running = True
+
+        # Counters
+        self.submitted = 0
+        self.coalesced = 0
+        self.written = 0
+        self.dropped = 0
+
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def submit(self, plate_number, location, plate_img=None, box=None, frame_shape=None):
+        """Queue a sighting (and its crop) for writing. Returns False if it was dropped."""
+        now = time.time()
+        when = datetime.now()
+        self.submitted += 1
+        with self._lock:
+            last = self._recent.get(plate_number)
+            if last is not None and now - last < self.coalesce_window:
+                self._pending_seen[plate_number] = (when, location)
+                self.coalesced += 1
+                return True
+            self._recent[plate_number] = now
+
+        crop = plate_img.copy() if plate_img is not None else None
+        item = (plate_number, location, when, crop, box, frame_shape)
+        try:
+            if self.overflow == "block":
+                self._queue.put(item, timeout=BLOCK_TIMEOUT)
+            else:
+                self._queue.put_nowait(item)
+            return True
+        except queue.Full:
+            self.dropped += 1
+            with self._lock:
+                # Let the next sighting of this plate try again instead of being coalesced away
+                self._recent.pop(plate_number, None)
+            return False
+
+    def stats(self):
+        return {
+            "queue_depth": self._queue.qsize(),
+            "submitted": self.submitted,
+            "coalesced": self.coalesced,
+            "written": self.written,
+            "dropped": self.dropped,
+        }
+
+    def flush(self, timeout=FLUSH_TIMEOUT):
+        """Wait until everything queued so far has been written. False if the writer is dead or too slow."""
+        if not self._thread.is_alive():
+            print("[WARNING] Plate writer thread is not running; nothing was flushed")
+            return False
+        deadline = time.time() + timeout
+        done = threading.Event()
+        try:
+            self._queue.put(done, timeout=timeout)
+        except queue.Full:
+            print(f"[WARNING] Plate writer flush timed out after {timeout}s (queue full)")
+            return False
+        if not done.wait(max(0.0, deadline - time.time())):
+            print(f"[WARNING] Plate writer flush timed out after {timeout}s")
+            return False
+        return True
+
+    def close(self):
+        """Flush-on-exit hook: drain the queue, write pending sightings and stop the thread."""
+        if not self._running:
+            return
+        self.flush()
+        self._running = False
+        self._thread.join(timeout=self.flush_interval * 4)
+        print(f"[INFO] Plate writer stats: {self.stats()}")
+
+    # --------------------------
+    # Background thread
+    # --------------------------
+    def _run(self):
+        batch = []
+        deadline = time.time() + self.flush_interval
+        while self._running:
+            flushed = None
+            try:
+                item = self._queue.get(timeout=max(0.0, deadline - time.time()))
+                if isinstance(item, threading.Event):
+                    flushed = item
+                else:
+                    batch.append(item)
+            except queue.Empty:
+                pass
+            if flushed is not None or len(batch) >= self.batch_size or time.time() >= deadline:
+                try:
+                    self._write_batch(batch)
+                except Exception as e:
+                    print(f"[ERROR] Plate writer batch failed: {e}")
+                if flushed is not None:
+                    flushed.set()
+                batch = []
+                deadline = time.time() + self.flush_interval
+
+    def _write_batch(self, batch):
+        with self._lock:
+            pending, self._pending_seen = self._pending_seen, {}
+            # Forget plates that left the window so the dict doesn't grow forever
+            cutoff = time.time() - self.coalesce_window
+            self._recent = {p: t for p, t in self._recent.items() if t >= cutoff}
+
+        for plate_number, location, when, crop, box, frame_shape in batch:
+            try:
+                self.store.log_sighting(plate_number, location, when=when)
+                if self.save_image is not None and crop is not None:
+                    self.save_image(crop, plate_number, box, frame_shape)
+                self.written += 1
+            except Exception as e:
+                print(f"[ERROR] Plate writer failed for {plate_number}: {e}")
+
+        for plate_number, (when, location) in pending.items():
+            self.store.log_sighting(plate_number, location, when=when)
+
+        if batch or pending:
+            self.store.flush()
@@ -0,0 +1,284 @@
+import argparse
+import glob
+import os
+import re
+import shutil
+import time
+import cv2
+import numpy as np
+from onnxruntime.quantization import (CalibrationDataReader, CalibrationMethod, QuantFormat, QuantType,
+                                      quantize_static)
+from onnxruntime.quantization.shape_inference import quant_pre_process
+from detector_backend import export_onnx, int8_path, letterbox, load_detector
+from plate_tracker import box_iou
+
+# --------------------------
+# STATIC INT8 QUANTISATION + ACCURACY / SPEED REPORT
+# --------------------------
+# Takes a trained plate model (e.g. numberplate_training_960_12n2.pt), exports
+# the FP32 ONNX through detector_backend's cache, calibrates activation ranges
+# on our own plate images and writes a static-INT8 (QDQ) model next to it, so
+# the detection scripts can use it with DETECTOR_BACKEND = "onnx-int8".
+#
+# The box/score decode at the end of the YOLO head is left in FP32: pixel
+# coordinates (0..imgsz) and class scores (0..1) go through the same Concat,
+# and sharing one INT8 scale between them destroys the scores.
+#
+# The report runs FP32 and INT8 at every --sizes entry over a held-out set of
+# full gate frames with YOLO labels (--eval) and prints mAP@0.5, mAP@0.5:0.95
+# and CPU latency per frame. Images that are also used for calibration are
+# skipped, so the report never scores the model on its own calibration data:
+#
+#   python quantize_detector.py --weights numberplate_training_960_12n2.pt --eval gate_frames_val --sizes 640 800 960
+
+CALIB_DIRS = ["plates_yolo_format", "freedomtech"]
+CALIB_IMAGES = 200
+IMAGE_EXTS = (".jpg", ".jpeg", ".png", ".bmp")
+IOU_THRESHOLDS = np.linspace(0.5, 0.95, 10)
+EVAL_CONF = 0.001
+LATENCY_FRAMES = 50
+
+
+# --------------------------
+# Dataset
+# --------------------------
+def find_images(dirs):
+    paths = []
+    for d in dirs:
+        for path in glob.glob(os.path.join(d, "**", "*"), recursive=True):
+            if path.lower().endswith(IMAGE_EXTS):
+                paths.append(path)
+    return sorted(paths)
+
+
+def label_path(image_path):
+    """YOLO label next to the image, or in the matching labels/ folder (images/ -> labels/)."""
+    stem = os.path.splitext(image_path)[0] + ".txt"
+    if os.path.exists(stem):
+        return stem
+    parts = re.split(r"([\\/])images([\\/])", stem, maxsplit=1)
+    if len(parts) == 4:
+        candidate = parts[0] + parts[1] + "labels" + parts[2] + parts[3]
+        if os.path.exists(candidate):
+            return candidate
+    return None
+
+
+def load_labels(path, shape):
+    """YOLO txt (cls cx cy w h, normalised) -> (classes, xyxy pixels)."""
+    h, w = shape[:2]
+    rows = []
+    with open(path) as f:
+        for line in f:
+            parts = line.split()
+            if len(parts) >= 5:
+                rows.append([float(v) for v in parts[:5]])
+    if not rows:
+        return np.zeros(0, int), np.zeros((0, 4), np.float32)
+    rows = np.array(rows, dtype=np.float32)
+    cx, cy, bw, bh = rows[:, 1] * w, rows[:, 2] * h, rows[:, 3] * w, rows[:, 4] * h
+    xyxy = np.stack([cx - bw / 2, cy - bh / 2, cx + bw / 2, cy + bh / 2], axis=1)
+    return rows[:, 0].astype(int), xyxy
+
+
+class LetterboxCalibrationReader(CalibrationDataReader):
+    """Feeds calibration images through the same letterbox as inference."""
+
+    def __init__(self, paths, input_name, imgsz):
+        self.paths = paths
+        self.input_name = input_name
+        self.imgsz = imgsz
+        self.rewind()
+
+    def get_next(self):
+        for path in self._iter:
+            image = cv2.imread(path)
+            if image is None:
+                continue
+            blob, _ = letterbox([image], self.imgsz)
+            return {self.input_name: blob}
+        return None
+
+    def rewind(self):
+        self._iter = iter(self.paths)
+
+
+# --------------------------
+# Quantisation
+# --------------------------
+def head_nodes(model_path):
+    """Non-Conv nodes of the last YOLO module (the Detect head's decode)."""
+    import onnx
+    graph = onnx.load(model_path).graph
+    modules = [int(m.group(1)) for n in graph.node for m in [re.match(r"/model\.(\d+)/", n.name)] if m]
+    if not modules:
+        return []
+    prefix = f"/model.{max(modules)}/"
+    return [n.name for n in graph.node if n.name.startswith(prefix) and n.op_type != "Conv"]
+
+
+def quantize(weights, calib_dirs=CALIB_DIRS, n_images=CALIB_IMAGES, imgsz=None,
+             method="minmax", keep_head_fp32=True):
+    """Write the static-INT8 model for `weights`; returns its path."""
+    fp32_path, info = export_onnx(weights)
+    imgsz = imgsz or info.get("imgsz", 640)
+    out_path = int8_path(fp32_path)
+
+    images = find_images(calib_dirs)
+    if not images:
+        raise FileNotFoundError(f"No calibration images under {calib_dirs}")
+    rng = np.random.default_rng(0)
+    if len(images) > n_images:
+        images = sorted(rng.choice(images, n_images, replace=False))
+    print(f"[INFO] Calibrating on {len(images)} images at {imgsz}px ({method})")
+
+    prepped = os.path.splitext(fp32_path)[0] + "_prep.onnx"
+    quant_pre_process(fp32_path, prepped)
+
+    import onnxruntime as ort
+    input_name = ort.InferenceSession(prepped, providers=["CPUExecutionProvider"]).get_inputs()[0].name
+    methods = {"minmax": CalibrationMethod.MinMax, "entropy": CalibrationMethod.Entropy,
+               "percentile": CalibrationMethod.Percentile}
+    exclude = head_nodes(prepped) if keep_head_fp32 else []
+
+    start = time.perf_counter()
+    quantize_static(
+        prepped, out_path, LetterboxCalibrationReader(images, input_name, imgsz),
+        quant_format=QuantFormat.QDQ,
+        activation_type=QuantType.QUInt8,
+        weight_type=QuantType.QInt8,
+        per_channel=True,
+        calibrate_method=methods[method],
+        nodes_to_exclude=exclude,
+    )
+    os.remove(prepped)
+    if os.path.exists(fp32_path + ".json"):
+        shutil.copy(fp32_path + ".json", out_path + ".json")
+    print(f"[INFO] INT8 model written to {out_path} in {time.perf_counter() - start:.1f}s "
+          f"({len(exclude)} head nodes kept FP32, "
+          f"{os.path.getsize(fp32_path) / 1e6:.1f} MB -> {os.path.getsize(out_path) / 1e6:.1f} MB)")
+    return out_path
+
+
+# --------------------------
+# Evaluation
+# --------------------------
+def match_predictions(pred_xyxy, pred_cls, gt_xyxy, gt_cls):
+    """(n_pred, n_thresholds) bool: prediction is a true positive at each IoU threshold."""
+    correct = np.zeros((len(pred_xyxy), len(IOU_THRESHOLDS)), dtype=bool)
+    if not len(pred_xyxy) or not len(gt_xyxy):
+        return correct
+    iou = box_iou(gt_xyxy, pred_xyxy) * (gt_cls[:, None] == pred_cls[None, :])
+    for i, t in enumerate(IOU_THRESHOLDS):
+        gi, pi = np.nonzero(iou >= t)
+        if not gi.size:
+            continue
+        matches = np.stack([gi, pi, iou[gi, pi]], axis=1)
+        matches = matches[matches[:, 2].argsort()[::-1]]
+        matches = matches[np.unique(matches[:, 1], return_index=True)[1]]
+        matches = matches[np.unique(matches[:, 0], return_index=True)[1]]
+        correct[matches[:, 1].astype(int), i] = True
+    return correct
+
+
+def average_precision(correct, conf, n_gt):
+    """COCO-style 101-point AP per IoU threshold for one class."""
+    if n_gt == 0 or not len(conf):
+        return np.zeros(correct.shape[1])
+    order = np.argsort(-conf)
+    tp = np.cumsum(correct[order], axis=0)
+    fp = np.cumsum(~correct[order], axis=0)
+    recall = tp / n_gt
+    precision = tp / np.maximum(tp + fp, 1e-9)
+    points = np.linspace(0, 1, 101)
+    ap = np.zeros(correct.shape[1])
+    for j in range(correct.shape[1]):
+        mrec = np.concatenate(([0.0], recall[:, j], [1.0]))
+        mpre = np.concatenate(([1.0], precision[:, j], [0.0]))
+        mpre = np.flip(np.maximum.accumulate(np.flip(mpre)))
+        ap[j] = np.interp(points, mrec, mpre).mean()
+    return ap
+
+
+def evaluate(detector, samples):
+    """mAP@0.5 and mAP@0.5:0.95 over [(image, gt_cls, gt_xyxy), ...]."""
+    correct, conf, pred_cls, gt_classes = [], [], [], []
+    for image, gt_cls, gt_xyxy in samples:
+        det = detector(image, conf=EVAL_CONF)[0]
+        correct.append(match_predictions(det.xyxy, det.cls, gt_xyxy, gt_cls))
+        conf.append(det.conf)
+        pred_cls.append(det.cls)
+        gt_classes.append(gt_cls)
+    correct, conf = np.concatenate(correct), np.concatenate(conf)
+    pred_cls, gt_classes = np.concatenate(pred_cls), np.concatenate(gt_classes)
+
+    aps = [average_precision(correct[pred_cls == c], conf[pred_cls == c], int((gt_classes == c).sum()))
+           for c in np.unique(gt_classes)]
+    if not aps:
+        return 0.0, 0.0
+    aps = np.array(aps)
+    return float(aps[:, 0].mean()), float(aps.mean())
+
+
+def latency_ms(detector, images):
+    detector(images[0])  # warm-up
+    times = []
+    for image in images:
+        start = time.perf_counter()
+        detector(image)
+        times.append((time.perf_counter() - start) * 1000)
+    return float(np.mean(times)), float(np.percentile(times, 95))
+
+
+def report(weights, eval_dirs, sizes, threads, calib_dirs=CALIB_DIRS):
+    calib = {os.path.abspath(p) for p in find_images(calib_dirs)}
+    samples, skipped = [], 0
+    for path in find_images(eval_dirs):
+        if os.path.abspath(path) in calib:
+            skipped += 1
+            continue
+        labels = label_path(path)
+        image = cv2.imread(path)
+        if labels is None or image is None:
+            continue
+        gt_cls, gt_xyxy = load_labels(labels, image.shape)
+        samples.append((image, gt_cls, gt_xyxy))
+    if skipped:
+        print(f"[WARNING] Skipped {skipped} eval images that are also calibration images")
+    if not samples:
+        print(f"[ERROR] No held-out labelled images under {eval_dirs}")
+        return
+    print(f"[INFO] Evaluating on {len(samples)} held-out labelled images")
+    timing_images = [s[0] for s in samples[:LATENCY_FRAMES]]
+
+    print(f"{'model':>6} | {'imgsz':>5} | {'mAP50':>6} | {'mAP50-95':>8} | {'ms/frame':>8} | {'p95 ms':>7}")
+    for size in sizes:
+        for backend in ("onnx", "onnx-int8"):
+            det = load_detector(weights, backend=backend, imgsz=size, threads=threads)
+            map50, map5095 = evaluate(det, samples)
+            mean_ms, p95_ms = latency_ms(det, timing_images)
+            label = "INT8" if backend == "onnx-int8" else "FP32"
+            print(f"{label:>6} | {size:>5} | {map50:>6.3f} | {map5095:>8.3f} | {mean_ms:>8.1f} | {p95_ms:>7.1f}")
+
+
+if __name__ == "__main__":
+    from detector_backend import DEFAULT_THREADS
+
+    ap = argparse.ArgumentParser(description="Static INT8 quantisation of a YOLO plate detector")
+    ap.add_argument("--weights", default="numberplate_training_960_12n2.pt")
+    ap.add_argument("--calib", nargs="+", default=CALIB_DIRS, help="Folders with calibration images")
+    ap.add_argument("--calib-images", type=int, default=CALIB_IMAGES)
+    ap.add_argument("--calib-method", choices=["minmax", "entropy", "percentile"], default="minmax")
+    ap.add_argument("--calib-size", type=int, default=None, help="Calibration input size (default: training size)")
+    ap.add_argument("--quantize-head", action="store_true", help="Also quantise the Detect head's decode")
+    ap.add_argument("--eval", nargs="+", required=True,
+                    help="Held-out folders of full gate frames with YOLO labels (not the calibration crops)")
+    ap.add_argument("--sizes", nargs="+", type=int, default=[480, 640, 800, 960])
+    ap.add_argument("--threads", type=int, default=DEFAULT_THREADS)
+    ap.add_argument("--skip-quantize", action="store_true", help="Only run the report on an existing INT8 model")
+    args = ap.parse_args()
+
+    if not args.skip_quantize:
+        quantize(args.weights, args.calib, args.calib_images, args.calib_size, args.calib_method,
+                 keep_head_fp32=not args.quantize_head)
+    report(args.weights, args.eval, args.sizes, args.threads, args.calib)
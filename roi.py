@@ -0,0 +1,127 @@
+import os
+import cv2
+import numpy as np
+
+# --------------------------
+# GATE-LANE REGION OF INTEREST
+# --------------------------
+# setplatearea.py saves the four points an operator clicked (top-left,
+# top-right, bottom-left, bottom-right) as "x,y" lines in <image>.txt. The
+# plate pipelines load that file and run detection on the lane only:
+#
+#   * default   -> crop the frame to the polygon's bounding box (+ MARGIN)
+#   * rectify   -> warp the quadrilateral to an upright rectangle, which also
+#                  straightens plates seen at an angle
+#
+# Boxes found in the ROI image are mapped back to full-frame coordinates with
+# to_frame(), so logging, saved crops and drawing are unchanged.
+
+MARGIN = 0.05        # bounding-box padding, as a fraction of its width/height
+
+
+def load_roi_points(path):
+    """Read setplatearea.py's point file -> (4, 2) float32 array (TL, TR, BL, BR), or None."""
+    if not path or not os.path.exists(path):
+        return None
+    points = []
+    with open(path) as f:
+        for line in f:
+            parts = line.strip().split(",")
+            if len(parts) == 2:
+                try:
+                    points.append((float(parts[0]), float(parts[1])))
+                except ValueError:
+                    continue
+    if len(points) != 4:
+        print(f"[WARNING] ROI file {path} needs 4 'x,y' points, found {len(points)} - using the full frame")
+        return None
+    return np.array(points, dtype=np.float32)
+
+
+class Roi:
+    def __init__(self, points, rectify=False, margin=MARGIN, mask_outside=False):
+        tl, tr, bl, br = np.asarray(points, dtype=np.float32)
+        self.quad = np.array([tl, tr, br, bl], dtype=np.float32)   # clockwise, for drawing/warping
+        self.rectify = rectify
+        self.margin = margin
+        self.mask_outside = mask_outside
+        self._shape = None
+
+        # Stats
+        self.frames = 0
+        self.fraction = 1.0   # ROI pixels / frame pixels
+
+    def _prepare(self, shape):
+        """(Re)compute the crop window or warp for this frame size."""
+        h, w = shape[:2]
+        self._shape = shape[:2]
+        if self.rectify:
+            tl, tr, br, bl = self.quad
+            out_w = int(round(max(np.linalg.norm(tr - tl), np.linalg.norm(br - bl))))
+            out_h = int(round(max(np.linalg.norm(bl - tl), np.linalg.norm(br - tr))))
+            self.size = (max(out_w, 1), max(out_h, 1))
+            dst = np.array([[0, 0], [out_w - 1, 0], [out_w - 1, out_h - 1], [0, out_h - 1]], dtype=np.float32)
+            self.M = cv2.getPerspectiveTransform(self.quad, dst)
+            self.M_inv = np.linalg.inv(self.M)
+            self.fraction = self.size[0] * self.size[1] / float(w * h)
+        else:
+            x1, y1 = self.quad.min(axis=0)
+            x2, y2 = self.quad.max(axis=0)
+            pad_x, pad_y = (x2 - x1) * self.margin, (y2 - y1) * self.margin
+            self.x1 = int(max(0, np.floor(x1 - pad_x)))
+            self.y1 = int(max(0, np.floor(y1 - pad_y)))
+            self.x2 = int(min(w, np.ceil(x2 + pad_x)))
+            self.y2 = int(min(h, np.ceil(y2 + pad_y)))
+            if self.x2 <= self.x1 or self.y2 <= self.y1:
+                print("[WARNING] ROI lies outside the frame - using the full frame")
+                self.x1, self.y1, self.x2, self.y2 = 0, 0, w, h
+            self.fraction = (self.x2 - self.x1) * (self.y2 - self.y1) / float(w * h)
+            self.mask = None
+            if self.mask_outside:
+                self.mask = np.zeros((self.y2 - self.y1, self.x2 - self.x1), dtype=np.uint8)
+                offset = np.array([self.x1, self.y1], dtype=np.float32)
+                cv2.fillPoly(self.mask, [np.round(self.quad - offset).astype(np.int32)], 255)
+
+    def crop(self, frame):
+        """Image the detector should see for this frame."""
+        if self._shape != frame.shape[:2]:
+            self._prepare(frame.shape)
+        self.frames += 1
+        if self.rectify:
+            return cv2.warpPerspective(frame, self.M, self.size, flags=cv2.INTER_LINEAR)
+        roi = frame[self.y1:self.y2, self.x1:self.x2]
+        if self.mask is not None:
+            roi = cv2.bitwise_and(roi, roi, mask=self.mask)
+        return roi
+
+    def to_frame(self, boxes):
+        """Map (N, 4) x1, y1, x2, y2 boxes from ROI-image to full-frame coordinates."""
+        boxes = np.asarray(boxes, dtype=np.float32).reshape(-1, 4)
+        if not len(boxes) or self._shape is None:
+            return boxes
+        if not self.rectify:
+            return boxes + np.array([self.x1, self.y1, self.x1, self.y1], dtype=np.float32)
+
+        # Warp all four corners back and take their axis-aligned bounds
+        x1, y1, x2, y2 = boxes.T
+        corners = np.stack([np.stack([x1, y1], 1), np.stack([x2, y1], 1),
+                            np.stack([x2, y2], 1), np.stack([x1, y2], 1)], axis=1)   # (N, 4, 2)
+        mapped = cv2.perspectiveTransform(corners.reshape(-1, 1, 2), self.M_inv).reshape(-1, 4, 2)
+        h, w = self._shape
+        out = np.concatenate([mapped.min(axis=1), mapped.max(axis=1)], axis=1)
+        out[:, [0, 2]] = out[:, [0, 2]].clip(0, w)
+        out[:, [1, 3]] = out[:, [1, 3]].clip(0, h)
+        return out
+
+    def draw(self, frame, color=(255, 200, 0)):
+        cv2.polylines(frame, [np.round(self.quad).astype(np.int32)], True, color, 2)
+        return frame
+
+
+def load_roi(path, rectify=False, margin=MARGIN, mask_outside=False):
+    """Roi from a setplatearea.py point file, or None (full frame) if there is none."""
+    points = load_roi_points(path)
+    if points is None:
+        return None
+    print(f"[INFO] Using ROI from {path} ({'rectified' if rectify else 'bounding box'})")
+    return Roi(points, rectify=rectify, margin=margin, mask_outside=mask_outside)
@@ -0,0 +1,215 @@
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+import requests
+
+# --------------------------
+# ADAPTIVE SIGNAL CONTROLLER
+# --------------------------
+# Cycles green through the roads in order. A scheduler thread wakes every TICK
+# seconds, re-computes the current phase's green time from the live vehicle
+# count and ends the phase once green + clearance has elapsed. ESP commands are
+# sent on a small thread pool with timeouts and retries, so a slow or dead ESP
+# never stalls the cycle.
+#
+# ESP protocol (unchanged): GET {esp_ip}/{seconds} turns the road green for
+# `seconds`. When a mid-phase re-evaluation changes the plan, the remaining
+# green time is re-sent.
+#
+# Timing history: every command records when it was queued, when each attempt
+# went out, and when the ESP acknowledged it. The ESP starts counting when the
+# request arrives, so the signal's actual green runs from the first command's
+# ack to the last acknowledged command's ack plus its seconds. esp_delay is
+# how late green came on, and drift is how far the actual end of green was
+# from the planned one (phase start + planned green). Both include executor
+# queueing, retries and network latency, and drift also includes the protocol's
+# whole-second rounding. A phase whose commands are still in flight shows None
+# until they finish.
+
+TICK = 0.5
+MIN_GREEN = 10
+MAX_GREEN = 60
+SECONDS_PER_VEHICLE = 4
+CLEARANCE = 5.5          # yellow + all-red between phases
+RESEND_DELTA = 2.0       # only re-send when the plan moves by at least this much
+ESP_TIMEOUT = 2.0
+ESP_RETRIES = 2
+HISTORY_LEN = 200
+
+
+def green_time_for(vehicle_count):
+    return min(max(vehicle_count * SECONDS_PER_VEHICLE, MIN_GREEN), MAX_GREEN)
+
+
+class SignalController:
+    def __init__(self, roads, esp_ips, get_count, tick=TICK):
+        self.roads = list(roads)
+        self.esp_ips = dict(esp_ips)
+        self.get_count = get_count
+        self.tick = tick
+        self.history = deque(maxlen=HISTORY_LEN)
+        self.esp_failures = 0
+        self._pool = ThreadPoolExecutor(max_workers=max(1, len(self.roads)))
+        self._session = requests.Session()
+        self._running = False
+        self._thread = None
+        self._phase = None
+
+    def start(self):
+        if not self.roads:
+            return self
+        self._running = True
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._running = False
+        if self._thread is not None:
+            self._thread.join(timeout=self.tick * 2)
+            self._thread = None
+        self._pool.shutdown(wait=False)
+        self._session.close()
+
+    def current_phase(self):
+        phase = self._phase
+        if phase is None:
+            return None
+        return {
+            "road": phase["road"],
+            "planned_green": phase["green"],
+            "elapsed": round(time.monotonic() - phase["start"], 2),
+        }
+
+    def timing_report(self):
+        """Planned vs actual (ESP-acknowledged) phase timing, plus average drift over the recorded history."""
+        records = [_phase_record(phase) for phase in list(self.history)]
+        drifts = [r["drift"] for r in records if r["drift"] is not None]
+        return {
+            "current": self.current_phase(),
+            "phases": records,
+            "avg_drift": round(sum(drifts) / len(drifts), 3) if drifts else 0.0,
+            "max_drift": round(max(drifts, key=abs), 3) if drifts else 0.0,
+            "esp_failures": self.esp_failures,
+        }
+
+    # --------------------------
+    # Scheduler
+    # --------------------------
+    def _run(self):
+        index = 0
+        next_tick = time.monotonic()
+        self._begin_phase(self.roads[index], time.monotonic())
+
+        while self._running:
+            next_tick += self.tick
+            delay = next_tick - time.monotonic()
+            if delay > 0:
+                time.sleep(delay)
+            else:
+                next_tick = time.monotonic()  # fell behind; don't try to catch up
+
+            now = time.monotonic()
+            phase = self._phase
+            elapsed = now - phase["start"]
+
+            # Re-plan from the live count, but never end green before it was shown
+            green = max(green_time_for(self.get_count(phase["road"])), elapsed)
+            green = min(green, MAX_GREEN)
+            if elapsed < green and abs(green - phase["green"]) >= RESEND_DELTA:
+                phase["green"] = green
+                phase["replans"] += 1
+                self._send(phase["road"], green - elapsed)
+
+            if elapsed >= phase["green"] + CLEARANCE:
+                self._end_phase(phase, now)
+                index = (index + 1) % len(self.roads)
+                self._begin_phase(self.roads[index], now)
+
+    def _begin_phase(self, road, now):
+        green = green_time_for(self.get_count(road))
+        planned_start = now
+        if self._phase is not None:
+            prev = self._phase
+            planned_start = prev["start"] + prev["green"] + CLEARANCE
+        self._phase = {
+            "road": road,
+            "start": now,
+            "planned_start": planned_start,
+            "initial_green": green,
+            "green": green,
+            "replans": 0,
+            "wall_start": time.time(),
+            "commands": [],
+        }
+        self._send(road, green)
+
+    def _end_phase(self, phase, now):
+        phase["end"] = now
+        self.history.append(phase)
+
+    # --------------------------
+    # ESP commands
+    # --------------------------
+    def _send(self, road, seconds):
+        esp_ip = self.esp_ips.get(road)
+        if esp_ip:
+            command = {"seconds": int(round(seconds)), "queued": time.monotonic(), "sent": [], "acked": None,
+                       "ok": None}
+            self._phase["commands"].append(command)
+            self._pool.submit(self._send_blocking, road, esp_ip, command)
+
+    def _send_blocking(self, road, esp_ip, command):
+        seconds = command["seconds"]
+        for attempt in range(ESP_RETRIES + 1):
+            try:
+                command["sent"].append(time.monotonic())
+                response = self._session.get(f"{esp_ip}/{seconds}", timeout=ESP_TIMEOUT)
+                if response.status_code == 200:
+                    command["acked"] = time.monotonic()
+                    command["ok"] = True
+                    return True
+                print(f"Road {road}: ESP returned {response.status_code} (attempt {attempt + 1})")
+            except Exception as e:
+                print(f"Road {road}: Error triggering green light - {str(e)} (attempt {attempt + 1})")
+            time.sleep(0.2 * (attempt + 1))
+        self.esp_failures += 1
+        command["ok"] = False
+        return False
+
+
+def _phase_record(phase):
+    """History entry for a finished phase; actual green and drift come from the ESP acks."""
+    start = phase["start"]
+    commands = list(phase["commands"])
+    record = {
+        "road": phase["road"],
+        "wall_start": phase["wall_start"],
+        "initial_green": phase["initial_green"],
+        "planned_green": round(phase["green"], 2),
+        "actual_green": None,
+        "start_delay": round(start - phase["planned_start"], 3),
+        "esp_delay": None,
+        "drift": None,
+        "replans": phase["replans"],
+        "commands": [{
+            "seconds": c["seconds"],
+            "queued": round(c["queued"] - start, 3),
+            "attempts": len(c["sent"]),
+            "sent": round(c["sent"][-1] - start, 3) if c["sent"] else None,
+            "acked": round(c["acked"] - start, 3) if c["acked"] is not None else None,
+            "ok": c["ok"],
+        } for c in commands],
+    }
+    # No ESP for this road, commands still in flight, or none of them reached the signal
+    acked = [c for c in commands if c["ok"]]
+    if not acked or any(c["ok"] is None for c in commands):
+        return record
+    last = acked[-1]
+    green_on = acked[0]["acked"]
+    green_off = last["acked"] + last["seconds"]
+    record["actual_green"] = round(green_off - green_on, 2)
+    record["esp_delay"] = round(green_on - start, 3)
+    record["drift"] = round(green_off - (start + phase["green"]), 3)
+    return record
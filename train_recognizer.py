@@ -0,0 +1,267 @@
+import argparse
+import csv
+import json
+import os
+import random
+import cv2
+import numpy as np
+import torch
+from torch import nn
+from torch.utils.data import DataLoader, Dataset
+from plate_grammar import PlateDecoder, PLATE_PATTERN
+from plate_recognizer import (CHARSET, DATA_DIRS, IMAGE_EXTS, INPUT_H, INPUT_W, LABEL_FILE, MODEL_PATH,
+                              VERIFIED_FILE, ctc_decode, encode_label, is_validation, load_samples, preprocess)
+
+# --------------------------
+# TRAIN THE CRNN PLATE RECOGNISER
+# --------------------------
+# 1. Pseudo-label crops that have no label yet (e.g. vehicle_numberplates):
+#    Tesseract + the plate grammar decoder, written to <dir>/labels.csv.
+#    Rows checked by eye go to <dir>/verified.csv; they win over labels.csv
+#    and the file name, and only they are used for validation.
+#
+#      python train_recognizer.py label vehicle_numberplates plates_captured
+#
+# 2. Train on the labelled crops plus rendered synthetic plates, keep the
+#    best checkpoint on the held-out split and export it to ONNX with a
+#    dynamic batch axis (+ JSON sidecar) for plate_recognizer.CrnnRecognizer:
+#
+#      python train_recognizer.py train --epochs 60 --synthetic 20000
+#
+# Our crops carry Tesseract's own readings, many of them wrong, so by
+# default only labels that match the plate grammar are used.
+
+EPOCHS = 60
+BATCH = 64
+LR = 1e-3
+SYNTHETIC = 20000        # rendered plates per epoch on top of the real crops
+LABEL_CONFIDENCE = 0.6   # minimum decoder confidence for a pseudo-label
+STATES = ["AP", "AS", "BR", "CG", "DL", "GA", "GJ", "HR", "HP", "JH", "JK", "KA", "KL", "MH", "MP", "OD",
+          "PB", "RJ", "TN", "TS", "UK", "UP", "WB"]
+SERIES = "ABCDEFGHJKLMNPRSTUVWXYZ"
+
+
+# --------------------------
+# Model
+# --------------------------
+class Crnn(nn.Module):
+    """32x128 gray crop -> (B, 32, classes) logits; class 0 is the CTC blank."""
+
+    def __init__(self, n_classes=len(CHARSET) + 1, hidden=128):
+        super().__init__()
+
+        def block(cin, cout, pool):
+            layers = [nn.Conv2d(cin, cout, 3, padding=1, bias=False), nn.BatchNorm2d(cout), nn.ReLU(inplace=True)]
+            if pool:
+                layers.append(nn.MaxPool2d(pool))
+            return layers
+
+        # Height 32 -> 1, width 128 -> 32 time steps
+        self.cnn = nn.Sequential(*block(1, 32, (2, 2)), *block(32, 64, (2, 2)), *block(64, 128, None),
+                                 *block(128, 128, (2, 1)), *block(128, 256, (2, 1)), *block(256, 256, (2, 1)))
+        self.rnn = nn.LSTM(256, hidden, bidirectional=True, batch_first=True)
+        self.fc = nn.Linear(2 * hidden, n_classes)
+
+    def forward(self, x):
+        f = self.cnn(x).squeeze(2).permute(0, 2, 1)   # (B, T, 256)
+        f, _ = self.rnn(f)
+        return self.fc(f)
+
+
+# --------------------------
+# Data
+# --------------------------
+def random_plate():
+    return (random.choice(STATES) + str(random.randint(1, 99)) + "".join(random.choices(SERIES, k=random.randint(1, 2)))
+            + f"{random.randint(0, 9999):04d}")
+
+
+def render_plate(text):
+    """Black text on a white (private) or yellow (commercial) plate, one or two rows."""
+    font = random.choice([cv2.FONT_HERSHEY_SIMPLEX, cv2.FONT_HERSHEY_DUPLEX, cv2.FONT_HERSHEY_TRIPLEX])
+    background = random.choice([(255, 255, 255), (0, 210, 255)])
+    scale, thick = 1.6, random.randint(2, 4)
+    lines = [text[:-4], text[-4:]] if random.random() < 0.15 else [text]
+    sizes = [cv2.getTextSize(line, font, scale, thick)[0] for line in lines]
+    width = max(w for w, _ in sizes) + 24
+    line_h = max(h for _, h in sizes) + 18
+    img = np.full((line_h * len(lines) + 8, width, 3), background, np.uint8)
+    y = 6
+    for line, (w, h) in zip(lines, sizes):
+        cv2.putText(img, line, ((width - w) // 2, y + h + 6), font, scale, (0, 0, 0), thick, cv2.LINE_AA)
+        y += line_h
+    cv2.rectangle(img, (2, 2), (width - 3, img.shape[0] - 3), (0, 0, 0), 2)
+    return img
+
+
+def augment(img):
+    """Perspective, blur, lighting and noise like a gate camera's plate crops."""
+    h, w = img.shape[:2]
+    src = np.float32([[0, 0], [w, 0], [w, h], [0, h]])
+    jitter = np.float32([[random.uniform(-0.06, 0.06) * w, random.uniform(-0.08, 0.08) * h] for _ in range(4)])
+    img = cv2.warpPerspective(img, cv2.getPerspectiveTransform(src, src + jitter), (w, h),
+                              borderMode=cv2.BORDER_REPLICATE)
+    if random.random() < 0.5:
+        k = random.choice([3, 5])
+        img = cv2.GaussianBlur(img, (k, k), 0)
+    if random.random() < 0.3:
+        small = (max(8, int(w * random.uniform(0.3, 0.6))), max(8, int(h * random.uniform(0.3, 0.6))))
+        img = cv2.resize(cv2.resize(img, small), (w, h))
+    alpha, beta = random.uniform(0.6, 1.3), random.uniform(-40, 40)
+    img = cv2.convertScaleAbs(img, alpha=alpha, beta=beta)
+    if random.random() < 0.5:
+        noise = np.random.normal(0, random.uniform(2, 12), img.shape)
+        img = np.clip(img.astype(np.float32) + noise, 0, 255).astype(np.uint8)
+    return img
+
+
+class PlateCrops(Dataset):
+    def __init__(self, samples, train, synthetic=0):
+        self.images = [cv2.imread(path) for path, _ in samples]
+        self.labels = [label for _, label in samples]
+        self.train = train
+        self.synthetic = synthetic
+
+    def __len__(self):
+        return len(self.images) + self.synthetic
+
+    def __getitem__(self, i):
+        if i < len(self.images):
+            img, label = self.images[i], self.labels[i]
+        else:
+            label = random_plate()
+            img = render_plate(label)
+        if self.train:
+            img = augment(img)
+        return torch.from_numpy(preprocess(img)), label
+
+
+def collate(batch):
+    images = torch.stack([img for img, _ in batch])
+    targets = torch.tensor([k for _, label in batch for k in encode_label(label)], dtype=torch.long)
+    lengths = torch.tensor([len(label) for _, label in batch], dtype=torch.long)
+    return images, targets, lengths, [label for _, label in batch]
+
+
+# --------------------------
+# Train / evaluate / export
+# --------------------------
+def evaluate(model, loader, device):
+    model.eval()
+    right = total = 0
+    with torch.no_grad():
+        for images, _, _, labels in loader:
+            probs = model(images.to(device)).softmax(2).cpu().numpy()
+            right += sum(ctc_decode(p).text == label for p, label in zip(probs, labels))
+            total += len(labels)
+    return right / max(total, 1)
+
+
+def export(model, path):
+    model = model.cpu().eval()
+    torch.onnx.export(model, torch.zeros(1, 1, INPUT_H, INPUT_W), path, input_names=["images"],
+                      output_names=["logits"], dynamic_axes={"images": {0: "batch"}, "logits": {0: "batch"}},
+                      opset_version=17)
+    with open(os.path.splitext(path)[0] + ".json", "w") as f:
+        json.dump({"charset": CHARSET, "height": INPUT_H, "width": INPUT_W}, f)
+    print(f"[INFO] Exported {path}")
+
+
+def train(args):
+    samples = load_samples(args.dirs, None if args.any_label else PLATE_PATTERN)
+    train_set = [s for s in samples if not is_validation(s[0])]
+    val_set = [s for s in load_samples(args.dirs, None if args.any_label else PLATE_PATTERN, verified_only=True)
+               if is_validation(s[0])]
+    if not val_set:
+        print(f"[WARNING] No hand-checked validation crops ({VERIFIED_FILE}); keeping the last epoch")
+    print(f"[INFO] {len(train_set)} training crops, {len(val_set)} validation crops, "
+          f"{args.synthetic} synthetic plates per epoch")
+
+    device = "cuda" if torch.cuda.is_available() else "cpu"
+    loader = DataLoader(PlateCrops(train_set, train=True, synthetic=args.synthetic), batch_size=args.batch,
+                        shuffle=True, num_workers=args.workers, collate_fn=collate, drop_last=True)
+    val_loader = DataLoader(PlateCrops(val_set, train=False), batch_size=args.batch, collate_fn=collate)
+
+    model = Crnn().to(device)
+    opt = torch.optim.AdamW(model.parameters(), lr=args.lr, weight_decay=1e-4)
+    sched = torch.optim.lr_scheduler.OneCycleLR(opt, max_lr=args.lr, total_steps=args.epochs * len(loader))
+    ctc = nn.CTCLoss(blank=0, zero_infinity=True)
+    checkpoint = os.path.splitext(args.out)[0] + ".pt"
+    best = -1.0
+
+    for epoch in range(1, args.epochs + 1):
+        model.train()
+        total = 0.0
+        for images, targets, lengths, _ in loader:
+            log_probs = model(images.to(device)).log_softmax(2).permute(1, 0, 2)   # (T, B, C) for CTCLoss
+            steps = torch.full((images.shape[0],), log_probs.shape[0], dtype=torch.long)
+            loss = ctc(log_probs, targets, steps, lengths)
+            opt.zero_grad()
+            loss.backward()
+            nn.utils.clip_grad_norm_(model.parameters(), 5.0)
+            opt.step()
+            sched.step()
+            total += loss.item()
+
+        acc = evaluate(model, val_loader, device) if val_set else 0.0
+        print(f"[INFO] Epoch {epoch}/{args.epochs}: loss {total / len(loader):.4f}, val exact match {acc:.1%}")
+        if acc >= best:
+            best = acc
+            torch.save(model.state_dict(), checkpoint)
+
+    model.load_state_dict(torch.load(checkpoint, map_location="cpu"))
+    print(f"[INFO] Best validation exact match: {best:.1%} ({checkpoint})")
+    export(model, args.out)
+
+
+def pseudo_label(args):
+    """Label unlabelled crops with Tesseract + the plate grammar; appends to <dir>/labels.csv."""
+    from ocr_pool import get_pool, PLATE_WHITELIST
+
+    labelled = {path for path, _ in load_samples(args.dirs)}
+    pool = get_pool(psm=7, whitelist=PLATE_WHITELIST)
+    decoder = PlateDecoder()
+    for d in args.dirs:
+        if not os.path.isdir(d):
+            print(f"[WARNING] Not found: {d}")
+            continue
+        paths = [os.path.join(d, name) for name in sorted(os.listdir(d))
+                 if name.lower().endswith(IMAGE_EXTS) and os.path.abspath(os.path.join(d, name)) not in labelled]
+        rows = []
+        for i in range(0, len(paths), 64):
+            chunk = paths[i:i + 64]
+            crops = []
+            for path in chunk:
+                gray = cv2.bilateralFilter(cv2.cvtColor(cv2.imread(path), cv2.COLOR_BGR2GRAY), 11, 17, 17)
+                crops.append(cv2.threshold(gray, 120, 255, cv2.THRESH_BINARY)[1])
+            for path, (plate, conf) in zip(chunk, decoder.decode_batch(pool.recognize_batch(crops))):
+                if plate is not None and conf >= args.min_confidence:
+                    rows.append((os.path.basename(path), plate))
+        with open(os.path.join(d, LABEL_FILE), "a", newline="", encoding="utf-8") as f:
+            csv.writer(f).writerows(rows)
+        print(f"[INFO] {d}: labelled {len(rows)} of {len(paths)} crops -> {os.path.join(d, LABEL_FILE)}")
+
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser(description="Train the CRNN+CTC plate recogniser on our own plate crops")
+    sub = ap.add_subparsers(dest="command", required=True)
+
+    lab = sub.add_parser("label", help="Pseudo-label unlabelled crops with Tesseract + plate grammar")
+    lab.add_argument("dirs", nargs="+")
+    lab.add_argument("--min-confidence", type=float, default=LABEL_CONFIDENCE)
+
+    tr = sub.add_parser("train", help="Train and export to ONNX")
+    tr.add_argument("--dirs", nargs="+", default=DATA_DIRS)
+    tr.add_argument("--out", default=MODEL_PATH)
+    tr.add_argument("--epochs", type=int, default=EPOCHS)
+    tr.add_argument("--batch", type=int, default=BATCH)
+    tr.add_argument("--lr", type=float, default=LR)
+    tr.add_argument("--synthetic", type=int, default=SYNTHETIC)
+    tr.add_argument("--workers", type=int, default=2)
+    tr.add_argument("--any-label", action="store_true", help="Keep labels that don't match the plate grammar")
+    args = ap.parse_args()
+
+    if args.command == "label":
+        pseudo_label(args)
+    else:
+        train(args)
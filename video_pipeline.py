@@ -0,0 +1,202 @@
+import queue
+import threading
+import time
+
+# --------------------------
+# STAGED VIDEO PIPELINE
+# --------------------------
+# Runs e.g. decode -> detect -> OCR -> encode as one thread per stage joined by
+# bounded queues, so the stages overlap instead of taking turns. Items keep
+# their order (one thread per stage, FIFO queues), so the output is the same
+# as a plain loop. Throughput approaches the slowest stage; stats() shows which
+# one that is:
+#
+#   busy     - ms per item spent in the stage's own work
+#   wait_in  - time starved, waiting for the upstream stage
+#   wait_out - time blocked, waiting for room in the downstream queue
+#
+# An exception in any stage stops the whole pipeline and is re-raised by run().
+
+QUEUE_SIZE = 8
+POLL = 0.1
+
+_STOP = object()
+
+
+class _Aborted(Exception):
+    pass
+
+
+class Stage:
+    def __init__(self, name, fn):
+        self.name = name
+        self.fn = fn
+        self.items = 0
+        self.busy = 0.0
+        self.wait_in = 0.0
+        self.wait_out = 0.0
+
+    def stats(self):
+        n = max(self.items, 1)
+        return {
+            "stage": self.name,
+            "items": self.items,
+            "busy_ms": round(self.busy / n * 1000, 2),
+            "wait_in_s": round(self.wait_in, 2),
+            "wait_out_s": round(self.wait_out, 2),
+        }
+
+
+class Pipeline:
+    def __init__(self, source, stages, queue_size=QUEUE_SIZE, source_name="decode"):
+        """
+        source: iterable producing items (runs in its own thread).
+        stages: [(name, fn), ...]; fn(item) returns the item for the next stage,
+                or None to drop it. The last stage's return value is discarded.
+        """
+        self.source = source
+        self.source_stage = Stage(source_name, None)
+        self.stages = [Stage(name, fn) for name, fn in stages]
+        self.queues = [queue.Queue(maxsize=queue_size) for _ in self.stages]
+        self._abort = threading.Event()
+        self._error = None
+        self.elapsed = 0.0
+
+    # Queue operations that give up when another stage failed
+    def _put(self, q, item, stage):
+        start = time.perf_counter()
+        while True:
+            if self._abort.is_set():
+                raise _Aborted()
+            try:
+                q.put(item, timeout=POLL)
+                break
+            except queue.Full:
+                continue
+        stage.wait_out += time.perf_counter() - start
+
+    def _get(self, q, stage):
+        start = time.perf_counter()
+        while True:
+            if self._abort.is_set():
+                raise _Aborted()
+            try:
+                item = q.get(timeout=POLL)
+                break
+            except queue.Empty:
+                continue
+        stage.wait_in += time.perf_counter() - start
+        return item
+
+    def _fail(self, e):
+        if self._error is None:
+            self._error = e
+        self._abort.set()
+
+    def _run_source(self):
+        stage = self.source_stage
+        try:
+            it = iter(self.source)
+            while True:
+                start = time.perf_counter()
+                try:
+                    item = next(it)
+                except StopIteration:
+                    break
+                stage.busy += time.perf_counter() - start
+                stage.items += 1
+                self._put(self.queues[0], item, stage)
+            self._put(self.queues[0], _STOP, stage)
+        except _Aborted:
+            pass
+        except Exception as e:
+            self._fail(e)
+
+    def _run_stage(self, i):
+        stage = self.stages[i]
+        inbox = self.queues[i]
+        outbox = self.queues[i + 1] if i + 1 < len(self.queues) else None
+        try:
+            while True:
+                item = self._get(inbox, stage)
+                if item is _STOP:
+                    if outbox is not None:
+                        self._put(outbox, _STOP, stage)
+                    return
+                start = time.perf_counter()
+                result = stage.fn(item)
+                stage.busy += time.perf_counter() - start
+                stage.items += 1
+                if outbox is not None and result is not None:
+                    self._put(outbox, result, stage)
+        except _Aborted:
+            pass
+        except Exception as e:
+            self._fail(e)
+
+    def run(self):
+        """Run to completion; returns stats() or re-raises the first stage error."""
+        start = time.perf_counter()
+        threads = [threading.Thread(target=self._run_source, name=self.source_stage.name, daemon=True)]
+        threads += [threading.Thread(target=self._run_stage, args=(i,), name=s.name, daemon=True)
+                    for i, s in enumerate(self.stages)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        self.elapsed = time.perf_counter() - start
+        if self._error is not None:
+            raise self._error
+        return self.stats()
+
+    def stats(self):
+        stages = [self.source_stage] + self.stages
+        items = self.source_stage.items
+        bottleneck = max(stages, key=lambda s: s.busy)
+        return {
+            "items": items,
+            "seconds": round(self.elapsed, 2),
+            "fps": round(items / self.elapsed, 1) if self.elapsed else 0.0,
+            "bottleneck": bottleneck.name,
+            "stages": [s.stats() for s in stages],
+        }
+
+
+def format_stats(stats):
+    lines = [f"[INFO] Pipeline: {stats['items']} frames in {stats['seconds']}s ({stats['fps']} fps), "
+             f"bottleneck: {stats['bottleneck']}"]
+    for s in stats["stages"]:
+        lines.append(f"[INFO]   {s['stage']:>8}: {s['busy_ms']:8.2f} ms/frame busy, "
+                     f"starved {s['wait_in_s']:6.2f}s, blocked {s['wait_out_s']:6.2f}s")
+    return "\n".join(lines)
+
+
+# --------------------------
+# DEMO: serial loop vs pipeline with synthetic stage costs
+# --------------------------
+if __name__ == "__main__":
+    costs = {"decode": 0.004, "detect": 0.012, "ocr": 0.006, "encode": 0.005}
+    n = 200
+
+    def work(name):
+        def fn(item):
+            time.sleep(costs[name])
+            return item
+        return fn
+
+    def frames():
+        for i in range(n):
+            time.sleep(costs["decode"])
+            yield i
+
+    start = time.perf_counter()
+    for i in range(n):
+        for name in costs:
+            time.sleep(costs[name])
+    serial = time.perf_counter() - start
+
+    pipe = Pipeline(frames(), [(name, work(name)) for name in ("detect", "ocr", "encode")])
+    stats = pipe.run()
+    print(f"[INFO] Serial loop: {n / serial:.1f} fps (sum of stages {sum(costs.values()) * 1000:.0f} ms/frame)")
+    print(format_stats(stats))
+    print(f"[INFO] Slowest stage bound: {1 / max(costs.values()):.1f} fps")